@@ -1,14 +1,21 @@
-from adapters.postgresql_adapter import PostgresqlAdapter
-
-from dotenv import load_dotenv
 import os
+import sys
 from pathlib import Path
+
+from dotenv import load_dotenv
+
+# адаптер живёт в project_integration/src
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "project_integration"))
+from src.postgresql_adapter import PostgresqlAdapter  # noqa: E402
+
 env_path = Path(__file__).resolve().parent.parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
 uri = os.getenv('PSQL_URI')
 query = 'select * from public.daily_report dr'
 
-client = PostgresqlAdapter().extract(uri=uri, query=query)
+for batch in PostgresqlAdapter.extract(uri=uri, query=query, fetch_size=10000):
+    print(len(batch), batch[:1])
 
-print(client)
\ No newline at end of file
+# целиком в файл, без загрузки в память
+# PostgresqlAdapter.extract_to_file(uri=uri, query=query, file_path='daily_report.parquet', file_format='parquet')
\ No newline at end of file
@@ -0,0 +1,61 @@
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+from Keitaro.db.postgresql_adapter import PostgresqlAdapter
+
+# начало файла + размер отличают «тот же файл, прерванный импорт» от новой выгрузки
+_HEAD_BYTES = 1 << 20
+
+
+def file_key(csv_path: Path) -> str:
+    size = csv_path.stat().st_size
+    digest = hashlib.sha1()
+    with open(csv_path, "rb") as f:
+        digest.update(f.read(_HEAD_BYTES))
+    return f"{csv_path.name}:{size}:{digest.hexdigest()}"
+
+
+class CheckpointStore:
+    """
+    keitaro_import_checkpoints: сколько строк данных каждого файла уже обработано.
+    save() не коммитит — вызывается в той же транзакции, что и запись куска,
+    поэтому чекпоинт никогда не опережает данные.
+    """
+
+    def __init__(self, adapter: PostgresqlAdapter, table: str = "keitaro_import_checkpoints"):
+        self.adapter = adapter
+        self.table = table
+
+    def get(self, key: str) -> Optional[dict]:
+        row = self.adapter.fetchone(
+            f"SELECT rows_done, inserted, duplicates, completed FROM {self.table} WHERE file_key = %s",
+            (key,),
+        )
+        if row is None:
+            return None
+        return {"rows_done": row[0], "inserted": row[1], "duplicates": row[2], "completed": row[3]}
+
+    def save(
+        self,
+        key: str,
+        csv_path: Path,
+        rows_done: int,
+        inserted: int = 0,
+        duplicates: int = 0,
+        completed: bool = False,
+    ) -> None:
+        # inserted/duplicates — приращения за кусок, rows_done — абсолютная позиция
+        self.adapter.execute(
+            f"""
+            INSERT INTO {self.table} AS c (file_key, file_name, file_size, rows_done, inserted, duplicates, completed)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (file_key) DO UPDATE
+                SET rows_done  = EXCLUDED.rows_done,
+                    inserted   = c.inserted + EXCLUDED.inserted,
+                    duplicates = c.duplicates + EXCLUDED.duplicates,
+                    completed  = EXCLUDED.completed,
+                    updated_at = now()
+            """,
+            (key, csv_path.name, csv_path.stat().st_size, rows_done, inserted, duplicates, completed),
+        )
@@ -0,0 +1,218 @@
+import datetime as dt
+import io
+import struct
+import time
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from Keitaro.db.postgresql_adapter import PostgresqlAdapter
+
+
+# Колонки keitaro_clicks (sql/keitaro_clicks.sql) в порядке полей KeitaroRecord -> тип в БД
+KEITARO_COLUMNS: Dict[str, str] = {
+    "subid": "text",
+    "datetime": "timestamp",
+    "ip": "text",
+    "campaign": "text",
+    "stream": "text",
+    "stream_id": "int4",
+    "offer": "text",
+    "country": "text",
+    "country_flag": "text",
+    "sub_id_2": "text",
+    "sub_id_5": "text",
+    "os": "text",
+    "os_version": "text",
+    "browser": "text",
+    "connection_type": "text",
+    "device_type": "text",
+    "device_model": "text",
+    "is_bot": "bool",
+    "is_unique": "bool",
+    "sale": "int4",
+    "lead": "int4",
+    "user_agent": "text",
+    "isp": "text",
+    "operator": "text",
+    "campaign_group": "text",
+}
+
+# Цель ON CONFLICT для keitaro_clicks / keitaro_clicks_fact: уникальный индекс частичный
+# (строки без subid не дедуплицируются), и без его условия PostgreSQL индекс не подберёт
+CONFLICT_TARGET = "(subid, datetime) WHERE subid IS NOT NULL"
+
+_PG_EPOCH = dt.datetime(2000, 1, 1)
+_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_BINARY_TRAILER = struct.pack("!h", -1)
+_TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _is_null(v) -> bool:
+    # None, float NaN, pandas NaT
+    return v is None or (v != v)
+
+
+def _encode_text_value(v, pg_type: str) -> str:
+    if _is_null(v):
+        return "\\N"
+    if pg_type == "bool":
+        return "t" if v else "f"
+    if pg_type == "int4":
+        return str(int(v))
+    if pg_type == "timestamp":
+        return v.isoformat(sep=" ")
+    return str(v).translate(_TEXT_ESCAPES)
+
+
+def _encode_binary_value(v, pg_type: str) -> bytes:
+    if _is_null(v):
+        return b"\xff\xff\xff\xff"
+    if pg_type == "bool":
+        return b"\x00\x00\x00\x01" + (b"\x01" if v else b"\x00")
+    if pg_type == "int4":
+        return b"\x00\x00\x00\x04" + struct.pack("!i", int(v))
+    if pg_type == "timestamp":
+        delta = v - _PG_EPOCH
+        micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+        return b"\x00\x00\x00\x08" + struct.pack("!q", micros)
+    data = str(v).encode("utf-8")
+    return struct.pack("!i", len(data)) + data
+
+
+class _CopyStream(io.RawIOBase):
+    """
+    File-like поверх итератора строк: COPY читает read(size) кусками,
+    а строки кодируются по мере чтения — весь чанк целиком в памяти не собирается.
+    """
+
+    def __init__(self, rows: Iterator[Sequence], types: List[str], copy_format: str):
+        self._rows = rows
+        self._types = types
+        self._binary = copy_format == "binary"
+        self._buffer = bytearray(_BINARY_HEADER if self._binary else b"")
+        self._done = False
+        self.rows = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def _encode(self, row: Sequence) -> bytes:
+        if self._binary:
+            parts = [struct.pack("!h", len(self._types))]
+            parts.extend(_encode_binary_value(v, t) for v, t in zip(row, self._types))
+            return b"".join(parts)
+        return ("\t".join(_encode_text_value(v, t) for v, t in zip(row, self._types)) + "\n").encode("utf-8")
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._done and (size < 0 or len(self._buffer) < size):
+            row = next(self._rows, None)
+            if row is None:
+                self._done = True
+                if self._binary:
+                    self._buffer += _BINARY_TRAILER
+                break
+            self._buffer += self._encode(row)
+            self.rows += 1
+
+        if size < 0:
+            size = len(self._buffer)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+
+class KeitaroCopyWriter:
+    """
+    Потоковая запись строк в keitaro_clicks через COPY FROM STDIN.
+    copy_format: 'text' | 'binary'. Commit после каждых chunk_rows строк.
+    Строки — последовательности значений в порядке columns (по умолчанию KEITARO_COLUMNS).
+    column_types — колонка -> тип в БД для другой целевой таблицы (например, FACT_COLUMNS).
+    """
+
+    def __init__(
+        self,
+        adapter: Optional[PostgresqlAdapter] = None,
+        *,
+        table: str = "keitaro_clicks",
+        columns: Optional[List[str]] = None,
+        column_types: Optional[Dict[str, str]] = None,
+        copy_format: str = "text",
+        chunk_rows: int = 100_000,
+    ):
+        if copy_format not in ("text", "binary"):
+            raise ValueError(f"Unsupported copy_format: {copy_format}")
+
+        self.adapter = adapter or PostgresqlAdapter()
+        self.table = table
+        column_types = column_types or KEITARO_COLUMNS
+        self.columns = columns or list(column_types)
+        self.types = [column_types[c] for c in self.columns]
+        self.copy_format = copy_format
+        self.chunk_rows = chunk_rows
+
+        self.rows = 0
+        self.seconds = 0.0
+
+    @property
+    def copy_sql(self) -> str:
+        return (
+            f"COPY {self.table} ({', '.join(self.columns)}) "
+            f"FROM STDIN WITH (FORMAT {self.copy_format})"
+        )
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def copy_chunk(self, rows: Iterable[Sequence]) -> int:
+        """Один COPY из rows без commit — транзакцией управляет вызывающий."""
+        stream = _CopyStream(iter(rows), self.types, self.copy_format)
+        started = time.perf_counter()
+        self.adapter.copy_expert(self.copy_sql, stream)
+        elapsed = time.perf_counter() - started
+
+        self.rows += stream.rows
+        self.seconds += elapsed
+        return stream.rows
+
+    def _check_target(self) -> None:
+        # после sql/keitaro_dimensions.sql keitaro_clicks — view, COPY в него невозможен
+        row = self.adapter.fetchone("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (self.table,))
+        self.adapter.rollback()
+        if row and row[0] == "v":
+            raise RuntimeError(
+                f"{self.table} is a view, COPY into it is not possible; "
+                f"use KeitaroRepository.import_chunks (writes keitaro_clicks_fact)"
+            )
+
+    def write_rows(self, rows: Iterable[Sequence]) -> int:
+        """Пишет строки чанками по chunk_rows, каждый чанк — отдельный COPY + commit."""
+        self._check_target()
+        iterator = iter(rows)
+        written = 0
+        while True:
+            first = next(iterator, None)
+            if first is None:
+                break
+            chunk = chain([first], islice(iterator, self.chunk_rows - 1))
+            started = time.perf_counter()
+            try:
+                count = self.copy_chunk(chunk)
+                self.adapter.commit()
+            except Exception:
+                self.adapter.rollback()
+                raise
+            elapsed = time.perf_counter() - started
+
+            written += count
+            print(f"[COPY] +{count} rows ({count / elapsed:,.0f} rows/s)")
+
+        return written
+
+    def stats(self) -> dict:
+        return {
+            "rows": self.rows,
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+            "format": self.copy_format,
+        }
@@ -0,0 +1,167 @@
+import time
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import pandas as pd
+
+from Keitaro.db.checkpoints import CheckpointStore
+from Keitaro.db.copy_writer import CONFLICT_TARGET, KEITARO_COLUMNS, KeitaroCopyWriter
+from Keitaro.db.dimensions import FACT_COLUMNS, FACT_TABLE, DimensionEncoder
+from Keitaro.db.postgresql_adapter import PostgresqlAdapter
+from Keitaro.rollups import timeseries
+from Keitaro.rollups.uniques import UniquesRollup
+
+
+class ImportChunk(NamedTuple):
+    """
+    Кусок файла для KeitaroDedupWriter.
+    rows_done — сколько строк данных файла прочитано с учётом этого куска;
+    last=True (frame=None) — файл дочитан до конца.
+    """
+
+    csv_path: str
+    key: str
+    frame: Optional[pd.DataFrame]
+    rows_done: int
+    last: bool = False
+
+
+class KeitaroDedupWriter:
+    """
+    Идемпотентная запись кусков в keitaro_clicks.
+
+    Каждый кусок: COPY во временную staging-таблицу -> INSERT ... ON CONFLICT DO NOTHING
+    по (subid, datetime) -> обновление чекпоинта файла -> commit. Всё в одной транзакции,
+    так что после падения импорт продолжается с rows_done, а повторно прочитанные
+    строки просто отбрасываются как дубли.
+
+    dictionary_encoding=True — писать в keitaro_clicks_fact: строки-справочники
+    перед COPY заменяются на id (DimensionEncoder), keitaro_clicks — это view.
+    uniques=True — в той же транзакции дополнять HLL-скетчи keitaro_uniques_daily.
+    timeseries=True — вставка заодно добавляет новые клики к почасовым и дневным бакетам.
+    bridge=True — после вставки пересчитать campaign_day_bridge по (кампания, день) куска
+    (нужны дневные бакеты, т.е. timeseries=True).
+    """
+
+    def __init__(
+        self,
+        adapter: Optional[PostgresqlAdapter] = None,
+        *,
+        dictionary_encoding: bool = False,
+        uniques: bool = False,
+        timeseries: bool = False,
+        bridge: bool = False,
+        copy_format: str = "text",
+    ):
+        if bridge and not timeseries:
+            raise ValueError("campaign bridge is built from keitaro_clicks_daily, timeseries=True required")
+        self.adapter = adapter or PostgresqlAdapter()
+        self.dictionary_encoding = dictionary_encoding
+        self.timeseries = timeseries
+        self.bridge = None
+        if bridge:
+            # общая с AppsFlyer-интеграцией связка кампаний (project_integration/src) —
+            # импортируется только когда нужна, без неё Keitaro от src не зависит
+            from src import campaign_bridge
+            self.bridge = campaign_bridge
+        self.encoder = DimensionEncoder(self.adapter) if dictionary_encoding else None
+        self.uniques = UniquesRollup(self.adapter) if uniques else None
+        self.table = FACT_TABLE if dictionary_encoding else "keitaro_clicks"
+        self.stage_table = f"{self.table}_stage"
+        self.copy = KeitaroCopyWriter(
+            self.adapter,
+            table=self.stage_table,
+            column_types=FACT_COLUMNS if dictionary_encoding else KEITARO_COLUMNS,
+            copy_format=copy_format,
+        )
+        self.columns = self.copy.columns
+        self.checkpoints = CheckpointStore(self.adapter)
+
+        self.inserted = 0
+        self.duplicates = 0
+        self.files: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def insert_sql(self) -> str:
+        if self.timeseries:
+            return timeseries.insert_sql(self.table, self.stage_table, self.columns, self.dictionary_encoding)
+        columns = ", ".join(self.columns)
+        return (
+            f"INSERT INTO {self.table} ({columns}) "
+            f"SELECT {columns} FROM {self.stage_table} "
+            f"ON CONFLICT {CONFLICT_TARGET} DO NOTHING"
+        )
+
+    def _ensure_stage(self) -> None:
+        # временная таблица живёт до конца сессии, строки чистятся на каждом commit
+        self.adapter.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {self.stage_table} ON COMMIT DELETE ROWS AS "
+            f"SELECT {', '.join(self.columns)} FROM {self.table} WITH NO DATA"
+        )
+        self.adapter.commit()
+
+    def write(self, chunks: Iterable[ImportChunk]) -> dict:
+        self._ensure_stage()
+        if self.encoder:
+            self.encoder.warm()
+
+        for chunk in chunks:
+            started = time.perf_counter()
+            copied = inserted = 0
+            try:
+                if chunk.frame is not None and not chunk.frame.empty:
+                    frame = self.encoder.encode(chunk.frame) if self.encoder else chunk.frame
+                    copied = self.copy.copy_chunk(frame[self.columns].itertuples(index=False, name=None))
+                    if self.timeseries:
+                        inserted = self.adapter.fetchone(self.insert_sql)[0]
+                    else:
+                        inserted = self.adapter.execute(self.insert_sql)
+                    if self.uniques:
+                        # по всему куску, а не только по новым строкам: скетч к дублям нечувствителен
+                        self.uniques.update(chunk.frame)
+                    if self.bridge:
+                        touched = self.bridge.touched_campaign_days(
+                            zip(chunk.frame["campaign"], chunk.frame["datetime"])
+                        )
+                        self.bridge.refresh_bridge(self.adapter.connection, self.bridge.KEITARO, touched)
+                self.checkpoints.save(
+                    chunk.key,
+                    Path(chunk.csv_path),
+                    chunk.rows_done,
+                    inserted=inserted,
+                    duplicates=copied - inserted,
+                    completed=chunk.last,
+                )
+                self.adapter.commit()
+            except Exception:
+                self.adapter.rollback()
+                if self.encoder:
+                    self.encoder.discard()
+                raise
+            if self.encoder:
+                self.encoder.confirm()
+
+            file_stats = self.files.setdefault(chunk.csv_path, {"inserted": 0, "duplicates": 0})
+            file_stats["inserted"] += inserted
+            file_stats["duplicates"] += copied - inserted
+            self.inserted += inserted
+            self.duplicates += copied - inserted
+
+            if copied:
+                elapsed = time.perf_counter() - started
+                print(
+                    f"[COPY] {Path(chunk.csv_path).name}: +{inserted} rows, {copied - inserted} duplicates "
+                    f"({copied / elapsed:,.0f} rows/s), checkpoint {chunk.rows_done}"
+                )
+
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {
+            **self.copy.stats(),
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "dimension_values_added": self.encoder.added if self.encoder else 0,
+            "uniques_keys_updated": self.uniques.keys_updated if self.uniques else 0,
+            "files": self.files,
+        }
@@ -0,0 +1,100 @@
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from Keitaro.db.copy_writer import KEITARO_COLUMNS
+from Keitaro.db.postgresql_adapter import PostgresqlAdapter
+
+# Длинные повторяющиеся строки кликов хранятся в справочниках keitaro_dim_<колонка>,
+# в keitaro_clicks_fact — только <колонка>_id (sql/keitaro_dimensions.sql)
+DIMENSIONS: List[str] = ["campaign", "offer", "browser", "device_model", "user_agent", "isp", "operator"]
+
+FACT_TABLE = "keitaro_clicks_fact"
+
+# колонки факта в порядке KEITARO_COLUMNS: строка справочника -> её id
+FACT_COLUMNS: Dict[str, str] = {
+    (f"{name}_id" if name in DIMENSIONS else name): ("int4" if name in DIMENSIONS else pg_type)
+    for name, pg_type in KEITARO_COLUMNS.items()
+}
+
+
+def dimension_table(name: str) -> str:
+    return f"keitaro_dim_{name}"
+
+
+class DimensionEncoder:
+    """
+    Кодирует колонки-справочники куска в суррогатные id.
+    Кэш строка -> id на процесс, прогревается из БД один раз; новые значения
+    куска вставляются в справочник одним запросом на колонку, в транзакции куска.
+    После commit куска вызывается confirm(), после rollback — discard(): id вставок
+    откаченной транзакции убираются из кэша.
+    """
+
+    def __init__(self, adapter: PostgresqlAdapter):
+        self.adapter = adapter
+        self.cache: Dict[str, Dict[str, int]] = {name: {} for name in DIMENSIONS}
+        self.added = 0
+        # значения, вставленные в ещё не закоммиченной транзакции
+        self.pending: List[Tuple[str, str]] = []
+
+    def warm(self) -> int:
+        with self.adapter.connection.cursor() as cursor:
+            for name in DIMENSIONS:
+                cursor.execute(f"SELECT value, id FROM {dimension_table(name)}")
+                self.cache[name] = dict(cursor.fetchall())
+        self.adapter.rollback()  # только чтение
+        total = sum(len(c) for c in self.cache.values())
+        print(f"[DIM] Cache warmed: {total} values in {len(DIMENSIONS)} dimensions")
+        return total
+
+    def _register(self, name: str, values: List[str]) -> None:
+        table = dimension_table(name)
+        cache = self.cache[name]
+        # один порядок вставки у всех воркеров: ждут друг друга на индексе, но не по кругу
+        values = sorted(values)
+        with self.adapter.connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (value) SELECT unnest(%s::text[]) ON CONFLICT (md5(value)) DO NOTHING "
+                f"RETURNING value, id",
+                (values,),
+            )
+            inserted = cursor.fetchall()
+            cache.update(inserted)
+            # ON CONFLICT: значение мог добавить параллельный импорт — его id забираем по md5(value)
+            taken = [v for v in values if v not in cache]
+            if taken:
+                cursor.execute(
+                    f"SELECT d.value, d.id FROM {table} d JOIN unnest(%s::text[]) AS t(value) "
+                    f"ON md5(d.value) = md5(t.value) AND d.value = t.value",
+                    (taken,),
+                )
+                cache.update(cursor.fetchall())
+        self.pending.extend((name, value) for value, _ in inserted)
+        self.added += len(inserted)
+
+    def confirm(self) -> None:
+        """Транзакция куска закоммичена — вставленные значения остаются в кэше."""
+        self.pending.clear()
+
+    def discard(self) -> None:
+        """Транзакция куска откатилась — её значений в справочниках нет, id из кэша убираем."""
+        for name, value in self.pending:
+            self.cache[name].pop(value, None)
+        self.added -= len(self.pending)
+        self.pending.clear()
+
+    def encode(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Кусок с колонками KeitaroRecord -> кусок с колонками FACT_COLUMNS.
+        Без commit: новые значения справочников коммитятся вместе с куском и его чекпоинтом.
+        """
+        encoded = frame.copy()
+        for name in DIMENSIONS:
+            cache = self.cache[name]
+            unseen = [v for v in frame[name].dropna().unique() if v not in cache]
+            if unseen:
+                self._register(name, unseen)
+            ids = frame[name].map(cache)
+            encoded[f"{name}_id"] = ids.astype(object).where(ids.notna(), None)
+        return encoded[list(FACT_COLUMNS)]
@@ -1,13 +1,37 @@
 import psycopg2
 import psycopg2.extras
-from config import config  # Убедись, что config возвращает словарь с параметрами подключения
+
+from Keitaro.config import load_config
 
 
 class PostgresqlAdapter:
-    def __init__(self):
-        self.connection = psycopg2.connect(**config())
+    def __init__(self, dsn: str | None = None):
+        self.connection = psycopg2.connect(dsn or load_config()["POSTGRESQL_URL"])
 
     def execute_batch(self, query: str, values: list[tuple]):
         with self.connection.cursor() as cursor:
             psycopg2.extras.execute_batch(cursor, query, values)
         self.connection.commit()
+
+    def execute(self, query: str, params=None) -> int:
+        """Один запрос без commit. Возвращает rowcount."""
+        with self.connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.rowcount
+
+    def fetchone(self, query: str, params=None):
+        with self.connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchone()
+
+    def copy_expert(self, query: str, stream) -> int:
+        """COPY ... FROM STDIN из file-like объекта (без commit). Возвращает rowcount."""
+        with self.connection.cursor() as cursor:
+            cursor.copy_expert(query, stream)
+            return cursor.rowcount
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
@@ -1,15 +1,27 @@
+from typing import Iterable, Optional
+
 from Keitaro.models.keitaro_record import KeitaroRecord
 from Keitaro.db.postgresql_adapter import PostgresqlAdapter
-
+from Keitaro.db.checkpoints import CheckpointStore
+from Keitaro.db.dedup_writer import ImportChunk, KeitaroDedupWriter
+from Keitaro.db.dimensions import FACT_TABLE
+from Keitaro.rollups.timeseries import HOURLY_TABLE
+from Keitaro.rollups.uniques import UNIQUES_TABLE
 
 
 class KeitaroRepository:
-    def __init__(self):
-        self.adapter = PostgresqlAdapter()
+    def __init__(self, adapter: Optional[PostgresqlAdapter] = None):
+        self.adapter = adapter or PostgresqlAdapter()
 
     def insert_many(self, records: list[KeitaroRecord]):
         if not records:
             return
+        if self.has_dimensions():
+            # INSERT во view без INSTEAD OF триггера PostgreSQL не выполнит
+            raise RuntimeError(
+                "keitaro_clicks is a view over keitaro_clicks_fact (sql/keitaro_dimensions.sql), "
+                "use import_chunks"
+            )
 
         rows = [record.model_dump() for record in records]
 
@@ -31,3 +43,41 @@ class KeitaroRepository:
         print(f"[DB] Inserting {len(values)} rows into keitaro_clicks...")
         self.adapter.execute_batch(sql, values)
         print(f"[DB] Insert completed ✅")
+
+    def checkpoint(self, key: str) -> Optional[dict]:
+        """Чекпоинт файла из keitaro_import_checkpoints или None, если файл ещё не импортировали."""
+        state = CheckpointStore(self.adapter).get(key)
+        self.adapter.rollback()  # только чтение, не держим транзакцию открытой
+        return state
+
+    def table_exists(self, table: str) -> bool:
+        exists = self.adapter.fetchone("SELECT to_regclass(%s) IS NOT NULL", (table,))[0]
+        self.adapter.rollback()
+        return exists
+
+    def has_dimensions(self) -> bool:
+        """Применён ли sql/keitaro_dimensions.sql (keitaro_clicks — view над фактом)."""
+        return self.table_exists(FACT_TABLE)
+
+    def import_chunks(self, chunks: Iterable[ImportChunk], copy_format: str = "text") -> dict:
+        """
+        Идемпотентный импорт: дубли по (subid, datetime) пропускаются,
+        после каждого куска в той же транзакции сохраняется чекпоинт файла.
+        """
+        timeseries = self.table_exists(HOURLY_TABLE)
+        writer = KeitaroDedupWriter(
+            self.adapter,
+            dictionary_encoding=self.has_dimensions(),
+            uniques=self.table_exists(UNIQUES_TABLE),
+            timeseries=timeseries,
+            bridge=timeseries and self.table_exists("campaign_day_bridge"),
+            copy_format=copy_format,
+        )
+
+        print(f"[DB] COPY into {writer.table} via staging ({copy_format})...")
+        stats = writer.write(chunks)
+        print(
+            f"[DB] COPY completed ✅ {stats['inserted']} new rows, "
+            f"{stats['duplicates']} duplicates skipped, {stats['rows_per_sec']:,.0f} rows/s"
+        )
+        return stats
@@ -0,0 +1,140 @@
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from Keitaro.models.keitaro_record import KeitaroRecord
+
+
+# Колоночный аналог валидаторов KeitaroRecord: на входе кусок CSV,
+# уже переименованный в поля модели, на выходе те же значения, что дала бы модель.
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATETIME_FIELDS = ["datetime"]
+BOOL_FIELDS = ["is_bot", "is_unique"]
+INT_FIELDS = ["sale", "lead", "stream_id"]
+STR_FIELDS = [
+    name for name in KeitaroRecord.model_fields
+    if name not in DATETIME_FIELDS + BOOL_FIELDS + INT_FIELDS
+]
+
+# как в parse_datetime / parse_bool / parse_int
+NULL_TOKENS = ["", "null", "NULL"]
+# как в empty_or_nan_to_none
+STR_NULL_TOKENS = ["", "null", "NULL", "N/A", "NA"]
+
+BOOL_MAP = {
+    "1": True, "true": True, "yes": True, "y": True,
+    "0": False, "false": False, "no": False, "n": False,
+}
+
+INT_RE = r"\s*[+-]?\d+\s*"
+
+
+def _drop_tokens(col: pd.Series, tokens: List[str]) -> pd.Series:
+    # токены бывают только в строковых колонках; where() на int64 превратил бы её во float
+    if pd.api.types.is_object_dtype(col) or pd.api.types.is_string_dtype(col):
+        return col.where(~col.isin(tokens))
+    return col
+
+
+def _coerce_datetime(col: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return col
+    # strptime(str(v)) в модели: всё, что не разобралось по формату -> None
+    return pd.to_datetime(col.astype(str), format=DATETIME_FORMAT, errors="coerce")
+
+
+def _coerce_bool(col: pd.Series) -> pd.Series:
+    # str(v).lower() в модели: 1.0 -> "1.0" -> None, nan -> "nan" -> None
+    return col.astype(str).str.lower().map(BOOL_MAP)
+
+
+def _coerce_int(col: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(col):
+        return col.astype("Int64")
+    if pd.api.types.is_numeric_dtype(col):
+        # int(float) в модели отбрасывает дробную часть; nan/inf -> None
+        values = col.where(np.isfinite(col))
+        return np.trunc(values).astype("Int64")
+
+    # object: строки — только целые литералы (int("1.5") падает), числа — как выше
+    try:
+        is_int_literal = col.str.fullmatch(INT_RE)
+    except AttributeError:
+        # .str недоступен, когда в колонке нет ни одной строки
+        is_int_literal = pd.Series(np.nan, index=col.index, dtype=object)
+    from_str = pd.to_numeric(col.where(is_int_literal == True).str.strip(), errors="coerce")  # noqa: E712
+    non_str = col.where(is_int_literal.isna() & col.notna())
+    from_num = pd.to_numeric(non_str, errors="coerce")
+    from_num = np.trunc(from_num.where(np.isfinite(from_num)))
+    return from_str.fillna(from_num).astype("Int64")
+
+
+def _coerce_str(col: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Возвращает (значения, маска строк, которые модель бы отклонила: не-строка в str-поле)."""
+    if not pd.api.types.is_object_dtype(col) and not pd.api.types.is_string_dtype(col):
+        rejected = col.notna()
+        return col.where(~rejected), rejected
+
+    try:
+        is_str = col.str.len().notna()
+    except AttributeError:
+        is_str = pd.Series(False, index=col.index)
+    rejected = col.notna() & ~is_str
+    values = col.where(is_str & ~col.isin(STR_NULL_TOKENS))
+    return values, rejected
+
+
+def coerce_typed(frame: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Как coerce_frame, но колонки остаются типизированными (datetime64, Int64, object)
+    и пропуски не заменены на None — в таком виде кусок дёшево передать между процессами.
+    """
+    frame = frame.reindex(columns=list(KeitaroRecord.model_fields))
+    out = {}
+    rejected = pd.Series(False, index=frame.index)
+
+    for name in DATETIME_FIELDS:
+        out[name] = _coerce_datetime(_drop_tokens(frame[name], NULL_TOKENS))
+    for name in BOOL_FIELDS:
+        out[name] = _coerce_bool(_drop_tokens(frame[name], NULL_TOKENS))
+    for name in INT_FIELDS:
+        out[name] = _coerce_int(_drop_tokens(frame[name], NULL_TOKENS))
+    for name in STR_FIELDS:
+        out[name], bad = _coerce_str(frame[name])
+        rejected |= bad
+
+    result = pd.DataFrame(out, index=frame.index)[list(KeitaroRecord.model_fields)]
+    return result[~rejected], rejected
+
+
+def to_model_frame(typed: pd.DataFrame) -> pd.DataFrame:
+    """Результат coerce_typed -> значения как у модели: object и None вместо пропусков."""
+    return typed.astype(object).where(typed.notna(), None)
+
+
+def coerce_frame(frame: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Приводит кусок (колонки = поля KeitaroRecord) к типам модели за один проход по колонкам.
+    Возвращает (frame с колонками в порядке полей модели и None вместо пропусков,
+    маска отклонённых строк — их модель не пропустила бы, в БД они не идут).
+    """
+    typed, rejected = coerce_typed(frame)
+    return to_model_frame(typed), rejected
+
+
+def rejected_report(frame: pd.DataFrame, rejected: pd.Series, row_offset: int = 0) -> List[str]:
+    """
+    Текст ошибок по отклонённым строкам — только для них строим модель поштучно.
+    row_offset — номер первой строки куска в файле (для сообщений как в старом загрузчике).
+    """
+    messages: List[str] = []
+    fields = list(KeitaroRecord.model_fields)
+    subset = frame.reindex(columns=fields)[rejected]
+    for pos, row in zip(np.flatnonzero(rejected.to_numpy()), subset.to_dict(orient="records")):
+        try:
+            KeitaroRecord(**row)
+        except Exception as e:
+            messages.append(f"[CSV][ROW {row_offset + pos + 1}] parse error: {e}")
+    return messages
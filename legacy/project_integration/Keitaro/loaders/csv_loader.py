@@ -1,8 +1,9 @@
 import pandas as pd
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterator, List
 
 from Keitaro.models.keitaro_record import KeitaroRecord
+from Keitaro.loaders.coercion import STR_FIELDS, coerce_frame, rejected_report
 
 
 # ЯВНЫЙ МАППИНГ: CSV -> модель
@@ -36,35 +37,95 @@ CSV_COLUMNS_MAP: Dict[str, str] = {
 
 
 class KeitaroCSVLoader:
-    def __init__(self, csv_path: Path):
+    def __init__(self, csv_path: Path, chunk_size: int = 50_000):
         self.csv_path = csv_path
+        self.chunk_size = chunk_size
+        # итог последнего прохода iter_frames (для манифеста импорта)
+        self.loaded = 0
+        self.rejected = 0
+        # сколько строк данных файла прочитано (с учётом пропущенных при возобновлении)
+        self.position = 0
 
-    def load(self) -> List[KeitaroRecord]:
+    def _read_chunks(self, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
         if not self.csv_path.exists():
             raise FileNotFoundError(f"CSV file not found: {self.csv_path}")
 
-        df = pd.read_csv(
+        # строковые поля читаем как str: иначе pandas сделает "123" в Sub ID 5 числом,
+        # а str-поле модели число не примет и строка отвалится
+        str_columns = {col: str for col, field in CSV_COLUMNS_MAP.items() if field in STR_FIELDS}
+
+        return pd.read_csv(
             self.csv_path,
             sep=";",
             quotechar='"',
             encoding="utf-8",
+            dtype=str_columns,
+            # заголовок (строка 0) оставляем, пропускаем уже импортированные строки данных
+            skiprows=range(1, skip_rows + 1) if skip_rows else None,
+            chunksize=self.chunk_size,
         )
 
-        records: List[KeitaroRecord] = []
+    def iter_batches(self) -> Iterator[List[KeitaroRecord]]:
+        """
+        Читает CSV кусками по chunk_size строк и отдаёт батчи KeitaroRecord.
+        В памяти одновременно живёт только текущий кусок, размер файла не важен.
+        """
+        idx = 0
+        loaded = 0
+        for chunk in self._read_chunks():
+            records: List[KeitaroRecord] = []
+
+            for row in chunk.to_dict(orient="records"):
+                idx += 1
+                try:
+                    mapped: Dict[str, Any] = {}
+
+                    for csv_col, model_field in CSV_COLUMNS_MAP.items():
+                        mapped[model_field] = row.get(csv_col)
+
+                    record = KeitaroRecord(**mapped)
+                    records.append(record)
 
-        for idx, row in enumerate(df.to_dict(orient="records"), start=1):
-            try:
-                mapped: Dict[str, Any] = {}
+                except Exception as e:
+                    # Принципиально НЕ роняем весь процесс
+                    print(f"[CSV][ROW {idx}] parse error: {e}")
 
-                for csv_col, model_field in CSV_COLUMNS_MAP.items():
-                    mapped[model_field] = row.get(csv_col)
+            loaded += len(records)
+            yield records
 
-                record = KeitaroRecord(**mapped)
-                records.append(record)
+        print(f"[CSV] Loaded {loaded} records from {self.csv_path.name}")
 
-            except Exception as e:
-                # Принципиально НЕ роняем весь процесс
-                print(f"[CSV][ROW {idx}] parse error: {e}")
+    def iter_frames(self, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+        """
+        То же, что iter_batches, но без модели на каждую строку: кусок приводится
+        к типам KeitaroRecord поколоночно (coercion.coerce_frame).
+        Колонки — поля модели по порядку, пропуски — None. Модель строится
+        только для отклонённых строк, чтобы напечатать ошибку.
+        skip_rows — продолжить с этой строки данных (чекпоинт прерванного импорта);
+        после каждого куска self.position указывает на следующую непрочитанную строку.
+        """
+        offset = skip_rows
+        self.loaded = 0
+        self.rejected = 0
+        self.position = skip_rows
+        for chunk in self._read_chunks(skip_rows):
+            chunk = chunk.rename(columns=CSV_COLUMNS_MAP)
+            frame, rejected = coerce_frame(chunk)
 
-        print(f"[CSV] Loaded {len(records)} records from {self.csv_path.name}")
+            if rejected.any():
+                self.rejected += int(rejected.sum())
+                for message in rejected_report(chunk, rejected, row_offset=offset):
+                    print(message)
+
+            offset += len(chunk)
+            self.loaded += len(frame)
+            self.position = offset
+            yield frame
+
+        print(f"[CSV] Loaded {self.loaded} records from {self.csv_path.name}")
+
+    def load(self) -> List[KeitaroRecord]:
+        records: List[KeitaroRecord] = []
+        for batch in self.iter_batches():
+            records.extend(batch)
         return records
@@ -0,0 +1,32 @@
+import glob
+from pathlib import Path
+from typing import Iterable, List
+
+_GLOB_CHARS = set("*?[")
+
+
+def resolve_csv_paths(patterns: Iterable[str]) -> List[Path]:
+    """
+    Разворачивает аргументы командной строки в список CSV-файлов:
+    файл — как есть, каталог — все *.csv в нём, шаблон — glob (** рекурсивно).
+    Повторы убираются, порядок — как в аргументах.
+    """
+    paths: List[Path] = []
+    seen = set()
+
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            found = sorted(path.glob("*.csv"))
+        elif _GLOB_CHARS & set(pattern):
+            found = sorted(Path(p) for p in glob.glob(pattern, recursive=True) if Path(p).is_file())
+        else:
+            found = [path]
+
+        for p in found:
+            key = p.resolve()
+            if key not in seen:
+                seen.add(key)
+                paths.append(p)
+
+    return paths
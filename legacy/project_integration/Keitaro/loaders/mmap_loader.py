@@ -0,0 +1,253 @@
+import io
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from Keitaro.loaders.coercion import STR_FIELDS, coerce_typed, rejected_report, to_model_frame
+from Keitaro.loaders.csv_loader import CSV_COLUMNS_MAP, KeitaroCSVLoader
+
+_QUOTE = b'"'
+_NEWLINE = b"\n"
+_BLOCK = 64 << 20
+
+
+def _open_mmap(csv_path: str) -> mmap.mmap:
+    with open(csv_path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _count_quotes(csv_path: str, start: int, end: int) -> int:
+    """Проход 1: число кавычек в [start, end) — по нему считается чётность на границах."""
+    mm = _open_mmap(csv_path)
+    try:
+        return sum(mm[off:min(off + _BLOCK, end)].count(_QUOTE) for off in range(start, end, _BLOCK))
+    finally:
+        mm.close()
+
+
+def _record_end(mm: mmap.mmap, pos: int, in_quotes: bool) -> int:
+    """
+    Первый конец записи не раньше pos: перевод строки вне кавычек.
+    in_quotes — открыта ли кавычка на позиции pos. "" внутри поля меняет чётность дважды.
+    """
+    while True:
+        nl = mm.find(_NEWLINE, pos)
+        if nl == -1:
+            return len(mm)
+        in_quotes ^= mm[pos:nl].count(_QUOTE) % 2 == 1
+        if not in_quotes:
+            return nl + 1
+        pos = nl + 1
+
+
+# колонка куска между процессами: ("codes", int32-коды, уникальные значения) для object/str,
+# ("masked", int64, маска пропусков) для Int64, ("array", numpy-массив) для остального
+PackedColumn = Tuple
+PackedFrame = Tuple[np.ndarray, Dict[str, PackedColumn]]
+
+
+def _pack(typed: pd.DataFrame) -> PackedFrame:
+    """
+    Типизированный кусок -> numpy-массивы. Pickle object-DataFrame'а сериализует каждую
+    строку отдельно; коды + словарь повторяющихся значений и числовые буферы
+    передаются почти копированием памяти.
+    """
+    packed: Dict[str, PackedColumn] = {}
+    for name, col in typed.items():
+        # str — dtype строк по умолчанию в pandas 3, его тоже кодируем
+        if pd.api.types.is_object_dtype(col) or pd.api.types.is_string_dtype(col):
+            codes, uniques = pd.factorize(col)
+            packed[name] = ("codes", codes.astype(np.int32), np.asarray(uniques, dtype=object))
+        elif isinstance(col.dtype, pd.Int64Dtype):
+            packed[name] = ("masked", col.to_numpy(dtype=np.int64, na_value=0), col.isna().to_numpy())
+        else:
+            packed[name] = ("array", col.to_numpy())
+    return typed.index.to_numpy(), packed
+
+
+def _unpack(index: np.ndarray, packed: Dict[str, PackedColumn]) -> pd.DataFrame:
+    """Обратно в DataFrame — в родительском процессе, уже со значениями как у coerce_frame."""
+    data = {}
+    for name, (kind, *parts) in packed.items():
+        if kind == "codes":
+            codes, uniques = parts
+            values = np.full(len(codes), None, dtype=object)
+            known = codes >= 0
+            values[known] = uniques[codes[known]]
+            data[name] = values
+        elif kind == "masked":
+            values, mask = parts
+            data[name] = pd.arrays.IntegerArray(values, mask)
+        else:
+            data[name] = parts[0]
+    return to_model_frame(pd.DataFrame(data, index=index))
+
+
+def _parse_range(csv_path: str, start: int, end: int, columns: List[str]) -> Tuple[PackedFrame, List[str], int]:
+    """
+    Проход 2, в процессе пула: разбирает записи из [start, end) и приводит типы.
+    Возвращает (упакованный кусок без отклонённых строк, ошибки по отклонённым,
+    сколько строк в диапазоне). Индекс куска — номер строки внутри диапазона.
+    """
+    mm = _open_mmap(csv_path)
+    try:
+        data = mm[start:end]
+    finally:
+        mm.close()
+
+    str_columns = {col: str for col in columns if CSV_COLUMNS_MAP.get(col) in STR_FIELDS}
+    chunk = pd.read_csv(
+        io.BytesIO(data),
+        sep=";",
+        quotechar='"',
+        encoding="utf-8",
+        header=None,
+        names=columns,
+        dtype=str_columns,
+    )
+    chunk = chunk.rename(columns=CSV_COLUMNS_MAP)
+    typed, rejected = coerce_typed(chunk)
+    messages: List[str] = []
+    if rejected.any():
+        label = f"[CSV][BYTES {start}-{end}]"
+        messages = [f"{label} {m}" for m in rejected_report(chunk, rejected)]
+    return _pack(typed), messages, len(chunk)
+
+
+class KeitaroMmapCSVLoader:
+    """
+    Параллельный разбор одного большого CSV.
+
+    Файл отображается в память и режется на диапазоны ~range_bytes, выровненные
+    по концам записей: перевод строки внутри кавычек (user agent с \\n) границей не считается.
+    Чётность кавычек на каждой границе берётся из параллельного подсчёта кавычек
+    по диапазонам (проход 1), затем граница сдвигается до ближайшего перевода строки
+    вне кавычек. Диапазоны разбираются и приводятся к типам в пуле процессов (проход 2).
+
+    Интерфейс как у KeitaroCSVLoader.iter_frames: куски не больше chunk_size строк
+    отдаются в порядке файла, position / loaded / rejected ведутся так же,
+    поэтому работают и чекпоинты. С одним процессом или файлом не больше одного
+    диапазона пул не окупается — тогда файл читается обычным KeitaroCSVLoader.
+    """
+
+    def __init__(
+        self,
+        csv_path: Path,
+        workers: Optional[int] = None,
+        range_bytes: int = 64 << 20,
+        chunk_size: int = 50_000,
+    ):
+        self.csv_path = csv_path
+        self.workers = workers or os.cpu_count() or 1
+        self.range_bytes = range_bytes
+        self.chunk_size = chunk_size
+
+        self.loaded = 0
+        self.rejected = 0
+        self.position = 0
+
+    def _header(self, mm: mmap.mmap) -> Tuple[List[str], int]:
+        header_end = _record_end(mm, 0, False)
+        columns = pd.read_csv(
+            io.BytesIO(mm[:header_end]), sep=";", quotechar='"', encoding="utf-8", nrows=0
+        ).columns
+        return list(columns), header_end
+
+    def split_ranges(self, pool: ProcessPoolExecutor) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """Заголовок и диапазоны [start, end), каждый начинается с новой записи."""
+        path = str(self.csv_path)
+        mm = _open_mmap(path)
+        try:
+            columns, data_start = self._header(mm)
+            size = len(mm)
+            raw = list(range(data_start, size, self.range_bytes)) + [size]
+
+            # проход 1: кавычки в каждом сыром диапазоне -> чётность на его начале
+            counts = list(pool.map(_count_quotes, [path] * (len(raw) - 1), raw[:-1], raw[1:]))
+            boundaries = [data_start]
+            quotes = 0
+            for pos, count in zip(raw[1:-1], counts):
+                quotes += count
+                boundary = _record_end(mm, pos, quotes % 2 == 1)
+                if boundary > boundaries[-1]:
+                    boundaries.append(boundary)
+            if size > boundaries[-1]:
+                boundaries.append(size)
+        finally:
+            mm.close()
+
+        return columns, list(zip(boundaries[:-1], boundaries[1:]))
+
+    def _iter_sequential(self, skip_rows: int) -> Iterator[pd.DataFrame]:
+        loader = KeitaroCSVLoader(self.csv_path, chunk_size=self.chunk_size)
+        for frame in loader.iter_frames(skip_rows=skip_rows):
+            self.loaded, self.rejected, self.position = loader.loaded, loader.rejected, loader.position
+            yield frame
+        self.loaded, self.rejected, self.position = loader.loaded, loader.rejected, loader.position
+
+    def _slices(self, frame: pd.DataFrame, rows: int, skip_rows: int) -> Iterator[pd.DataFrame]:
+        """
+        Разобранный диапазон -> куски по chunk_size строк диапазона (вместе с отклонёнными),
+        чтобы чекпоинт двигался так же часто, как у KeitaroCSVLoader.
+        """
+        first = self.position
+        index = frame.index.to_numpy()
+        for lo in range(0, rows, self.chunk_size):
+            hi = min(lo + self.chunk_size, rows)
+            self.position = first + hi
+            # возобновление: строки до skip_rows уже в БД
+            if self.position <= skip_rows:
+                continue
+            begin = max(lo, skip_rows - first)
+            piece = frame.iloc[np.searchsorted(index, begin):np.searchsorted(index, hi)]
+            self.rejected += hi - begin - len(piece)
+            self.loaded += len(piece)
+            yield piece
+
+    def iter_frames(self, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+        if not self.csv_path.exists():
+            raise FileNotFoundError(f"CSV file not found: {self.csv_path}")
+
+        self.loaded = 0
+        self.rejected = 0
+        self.position = 0
+        if self.workers <= 1 or self.csv_path.stat().st_size <= self.range_bytes:
+            yield from self._iter_sequential(skip_rows)
+            return
+
+        path = str(self.csv_path)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            columns, ranges = self.split_ranges(pool)
+            print(f"[CSV] {self.csv_path.name}: {len(ranges)} byte ranges, {self.workers} workers")
+
+            # в работе не больше двух диапазонов на процесс — готовые куски не копятся в памяти
+            pending: Deque = deque()
+            todo = iter(ranges)
+            for start, end in todo:
+                pending.append(pool.submit(_parse_range, path, start, end, columns))
+                if len(pending) >= self.workers * 2:
+                    break
+
+            while pending:
+                packed, messages, rows = pending.popleft().result()
+                for start, end in todo:
+                    pending.append(pool.submit(_parse_range, path, start, end, columns))
+                    break
+
+                for message in messages:
+                    print(message)
+
+                # диапазон целиком до чекпоинта — даже не распаковываем
+                if self.position + rows <= skip_rows:
+                    self.position += rows
+                    continue
+                yield from self._slices(_unpack(*packed), rows, skip_rows)
+
+        print(f"[CSV] Loaded {self.loaded} records from {self.csv_path.name}")
@@ -1,26 +1,53 @@
+import argparse
 import sys
 from pathlib import Path
 
+from Keitaro.loaders.csv_paths import resolve_csv_paths
 from Keitaro.services.keitaro_service import KeitaroService
+from Keitaro.services.keitaro_multi_service import KeitaroMultiFileService
 
 
 def main() -> None:
-    if len(sys.argv) != 2:
-        print(
-            "Usage:\n"
-            "  python -m Keitaro.main <path_to_keitaro_csv>\n\n"
-            "Example:\n"
-            "  python -m Keitaro.main C:\\Users\\user\\Downloads\\report.csv"
-        )
-        sys.exit(1)
-
-    csv_path = Path(sys.argv[1])
-
-    if not csv_path.exists():
-        print(f"[ERROR] CSV file does not exist: {csv_path}")
+    parser = argparse.ArgumentParser(
+        prog="python -m Keitaro.main",
+        description="Import Keitaro CSV exports into PostgreSQL",
+        epilog=(
+            "Examples:\n"
+            "  python -m Keitaro.main C:\\Users\\user\\Downloads\\report.csv\n"
+            "  python -m Keitaro.main C:\\exports\\2025-11-20\\\n"
+            "  python -m Keitaro.main \"exports/**/*.csv\" --workers 6"
+        ),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("paths", nargs="+", help="CSV-файлы, каталоги или glob-шаблоны")
+    parser.add_argument("--workers", type=int, default=None, help="процессов для парсинга (по умолчанию — по числу CPU)")
+    parser.add_argument("--parse-workers", type=int, default=1, help="процессов на разбор одного большого файла")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--manifest", type=Path, default=None, help="куда записать JSON-манифест импорта")
+    args = parser.parse_args()
+
+    csv_paths = resolve_csv_paths(args.paths)
+    missing = [p for p in csv_paths if not p.exists()]
+    if missing:
+        for p in missing:
+            print(f"[ERROR] CSV file does not exist: {p}")
+        sys.exit(2)
+    if not csv_paths:
+        print(f"[ERROR] No CSV files found: {' '.join(args.paths)}")
         sys.exit(2)
 
-    service = KeitaroService(csv_path)
+    if len(csv_paths) == 1 and args.manifest is None:
+        service = KeitaroService(csv_paths[0], chunk_size=args.chunk_size, parse_workers=args.parse_workers)
+        service.run()
+        return
+
+    service = KeitaroMultiFileService(
+        csv_paths,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        manifest_path=args.manifest,
+        parse_workers=args.parse_workers,
+    )
     service.run()
 
 
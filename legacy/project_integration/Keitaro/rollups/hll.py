@@ -0,0 +1,112 @@
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+# HyperLogLog: m = 2**p регистров по 1 байту.
+# Стандартная ошибка оценки 1.04 / sqrt(m): при p=14 (16384 регистра) это ~0.81%,
+# т.е. ~95% оценок в пределах ±1.6% от точного COUNT(DISTINCT), ~99.7% — в пределах ±2.4%.
+# Слияние скетчей (union) — поэлементный максимум регистров, без потери точности,
+# поэтому дневные скетчи складываются в любой период.
+HLL_PRECISION = 14
+
+_DENSE = b"D"
+_SPARSE = b"S"
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    """Число значащих бит uint64 без перехода во float (log2 теряет точность на 64 битах)."""
+    x = x.copy()
+    n = np.zeros(len(x), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = x >= np.uint64(1 << shift)
+        n[mask] += shift
+        x[mask] >>= np.uint64(shift)
+    return n + (x > 0)
+
+
+def hash_values(values: pd.Series, p: int = HLL_PRECISION) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    64-битный хэш значений (pandas hash_pandas_object, стабилен между запусками)
+    -> (номер регистра: старшие p бит, ранг: позиция первой единицы в остальных 64-p битах).
+    """
+    h = pd.util.hash_pandas_object(values.astype(str), index=False).to_numpy(dtype=np.uint64)
+    idx = (h >> np.uint64(64 - p)).astype(np.int64)
+    rest = h & np.uint64((1 << (64 - p)) - 1)
+    rank = (64 - p) - _bit_length(rest) + 1
+    return idx, rank.astype(np.uint8)
+
+
+def group_registers(
+    groups: np.ndarray, values: pd.Series, p: int = HLL_PRECISION
+) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Скетчи сразу для многих групп: groups[i] — номер группы строки values[i].
+    Возвращает группа -> (номера ненулевых регистров, их ранги) — разреженный вид.
+    """
+    if len(values) == 0:
+        return {}
+    idx, rank = hash_values(values, p)
+    reduced = (
+        pd.DataFrame({"g": groups, "i": idx, "r": rank})
+        .groupby(["g", "i"], sort=True)["r"]
+        .max()
+        .reset_index()
+    )
+    g = reduced["g"].to_numpy()
+    i = reduced["i"].to_numpy()
+    r = reduced["r"].to_numpy(dtype=np.uint8)
+    bounds = np.flatnonzero(np.diff(g)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(g)]))
+    return {int(g[s]): (i[s:e], r[s:e]) for s, e in zip(starts, ends)}
+
+
+def empty(p: int = HLL_PRECISION) -> np.ndarray:
+    return np.zeros(1 << p, dtype=np.uint8)
+
+
+def add(registers: np.ndarray, idx: np.ndarray, rank: np.ndarray) -> np.ndarray:
+    np.maximum.at(registers, idx, rank)
+    return registers
+
+
+def merge(sketches: Iterable[np.ndarray], p: int = HLL_PRECISION) -> np.ndarray:
+    result = empty(p)
+    for registers in sketches:
+        np.maximum(result, registers, out=result)
+    return result
+
+
+def encode(registers: np.ndarray) -> bytes:
+    """
+    bytea для БД. Мало заполненный скетч (типично для ключа за день) хранится
+    разреженно: пары (uint16 номер регистра, uint8 ранг) вместо всех 2**p байт.
+    """
+    nonzero = np.flatnonzero(registers)
+    if len(nonzero) * 3 < len(registers):
+        return _SPARSE + nonzero.astype("<u2").tobytes() + registers[nonzero].tobytes()
+    return _DENSE + registers.tobytes()
+
+
+def decode(data: bytes, p: int = HLL_PRECISION) -> np.ndarray:
+    data = bytes(data)
+    if data[:1] == _DENSE:
+        return np.frombuffer(data, dtype=np.uint8, offset=1).copy()
+    n = (len(data) - 1) // 3
+    idx = np.frombuffer(data, dtype="<u2", count=n, offset=1)
+    rank = np.frombuffer(data, dtype=np.uint8, count=n, offset=1 + 2 * n)
+    registers = empty(p)
+    registers[idx] = rank
+    return registers
+
+
+def estimate(registers: np.ndarray) -> int:
+    """Оценка числа уникальных (HyperLogLog, с линейным подсчётом для малых значений)."""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * m and zeros:
+        return int(round(m * np.log(m / zeros)))
+    return int(round(raw))
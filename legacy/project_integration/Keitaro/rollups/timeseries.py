@@ -0,0 +1,72 @@
+"""
+Почасовые и дневные агрегаты кликов для графиков (sql/keitaro_timeseries.sql).
+
+Ведутся прямо в запросе вставки куска: INSERT ... RETURNING отдаёт только реально
+вставленные строки (дубли отсеяны ON CONFLICT), и они же добавляются к бакетам
+через ON CONFLICT DO UPDATE SET x = x + EXCLUDED.x. Поэтому повтор файла и
+возобновление импорта агрегаты не завышают.
+"""
+from typing import List
+
+from Keitaro.db.copy_writer import CONFLICT_TARGET
+from Keitaro.db.dimensions import dimension_table
+
+HOURLY_TABLE = "keitaro_clicks_hourly"
+DAILY_TABLE = "keitaro_clicks_daily"
+
+BUCKET_KEYS = ["campaign", "stream_id", "offer", "country"]
+MEASURES = ["clicks", "unique_clicks", "bots", "leads", "sales"]
+
+_RETURNING = ["datetime", "campaign", "stream_id", "offer", "country", "is_unique", "is_bot", "lead", "sale"]
+
+
+def _bucket_insert(table: str, bucket_column: str, bucket_expr: str, source: str) -> str:
+    updates = ",\n            ".join(f"{m} = t.{m} + EXCLUDED.{m}" for m in MEASURES)
+    return f"""
+    INSERT INTO {table} AS t ({bucket_column}, {', '.join(BUCKET_KEYS)}, {', '.join(MEASURES)})
+    SELECT {bucket_expr}, campaign, stream_id, offer, country,
+           count(*),
+           count(*) FILTER (WHERE is_unique),
+           count(*) FILTER (WHERE is_bot),
+           coalesce(sum(lead), 0),
+           coalesce(sum(sale), 0)
+    FROM {source}
+    WHERE datetime IS NOT NULL
+    GROUP BY 1, 2, 3, 4, 5
+    ON CONFLICT ({bucket_column}, {', '.join(BUCKET_KEYS)}) DO UPDATE
+        SET {updates}
+    """
+
+
+def insert_sql(table: str, stage_table: str, columns: List[str], dictionary_encoding: bool = False) -> str:
+    """
+    Вставка куска из staging в table с обновлением бакетов одним запросом.
+    Запрос возвращает одну строку — число вставленных кликов.
+    """
+    column_list = ", ".join(columns)
+    if dictionary_encoding:
+        # в факте id справочников — для агрегатов возвращаем строки
+        returning = ", ".join(
+            f"{name}_id" if name in ("campaign", "offer") else name for name in _RETURNING
+        )
+        source = (
+            "(SELECT ins.datetime, c.value AS campaign, ins.stream_id, o.value AS offer, ins.country, "
+            "ins.is_unique, ins.is_bot, ins.lead, ins.sale "
+            f"FROM ins LEFT JOIN {dimension_table('campaign')} c ON c.id = ins.campaign_id "
+            f"LEFT JOIN {dimension_table('offer')} o ON o.id = ins.offer_id) AS ins_named"
+        )
+    else:
+        returning = ", ".join(_RETURNING)
+        source = "ins"
+
+    return f"""
+    WITH ins AS (
+        INSERT INTO {table} ({column_list})
+        SELECT {column_list} FROM {stage_table}
+        ON CONFLICT {CONFLICT_TARGET} DO NOTHING
+        RETURNING {returning}
+    ),
+    hourly AS ({_bucket_insert(HOURLY_TABLE, "bucket", "date_trunc('hour', datetime)", source)}),
+    daily AS ({_bucket_insert(DAILY_TABLE, "day", "datetime::date", source)})
+    SELECT count(*) FROM ins
+    """
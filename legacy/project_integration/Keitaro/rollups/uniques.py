@@ -0,0 +1,228 @@
+"""
+Приблизительные уникальные ip и subid по (campaign, stream_id, country, day).
+
+keitaro_uniques_daily (sql/keitaro_uniques.sql) хранит HyperLogLog-скетчи за день,
+импорт дополняет их по каждому куску, запрос за период сливает дневные скетчи
+в Python. Ошибка — см. hll.HLL_PRECISION (~0.81% стандартная, ±1.6% для 95% оценок).
+
+Повторная загрузка тех же строк скетч не меняет (максимум регистров идемпотентен),
+поэтому обновление безопасно и для дублей, и для возобновлённого импорта.
+Слияние идёт в Python (чтение -> максимум -> запись), поэтому на каждый ключ куска
+берётся транзакционная advisory-блокировка: FOR UPDATE не защищает ключи, которых
+ещё нет в таблице, и два импорта перезаписали бы скетчи друг друга.
+
+Запуск из project_integration/:
+    python -m Keitaro.rollups.uniques --from 2025-11-01 --to 2025-11-07 --by campaign
+    python -m Keitaro.rollups.uniques --rebuild
+"""
+import argparse
+import time
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import psycopg2.extras
+
+from Keitaro.db.postgresql_adapter import PostgresqlAdapter
+from Keitaro.rollups import hll
+
+UNIQUES_TABLE = "keitaro_uniques_daily"
+KEY_COLUMNS = ["day", "campaign", "stream_id", "country"]
+# поле клика -> колонка со скетчем
+SKETCH_COLUMNS: Dict[str, str] = {"ip": "ip_hll", "subid": "subid_hll"}
+
+# блокировки в одном порядке (по хэшу) — параллельные импорты не взаимоблокируются
+_LOCK_SQL = """
+SELECT pg_advisory_xact_lock(h)
+FROM (SELECT DISTINCT hashtext(k) AS h FROM unnest(%s::text[]) AS k ORDER BY h) s
+"""
+
+_SELECT_SQL = f"""
+SELECT u.day, u.campaign, u.stream_id, u.country, u.ip_hll, u.subid_hll
+FROM {UNIQUES_TABLE} u
+         JOIN unnest(%s::date[], %s::text[], %s::int[], %s::text[]) AS k(day, campaign, stream_id, country)
+              ON u.day = k.day
+                  AND u.campaign IS NOT DISTINCT FROM k.campaign
+                  AND u.stream_id IS NOT DISTINCT FROM k.stream_id
+                  AND u.country IS NOT DISTINCT FROM k.country
+"""
+
+_UPSERT_SQL = f"""
+INSERT INTO {UNIQUES_TABLE} (day, campaign, stream_id, country, ip_hll, subid_hll)
+VALUES %s
+ON CONFLICT (day, campaign, stream_id, country) DO UPDATE
+    SET ip_hll     = EXCLUDED.ip_hll,
+        subid_hll  = EXCLUDED.subid_hll,
+        updated_at = now()
+"""
+
+Key = Tuple[date, Optional[str], Optional[int], Optional[str]]
+
+
+def _none(v):
+    return None if v is None or v != v else v
+
+
+class UniquesRollup:
+    """Обновление дневных скетчей по куску кликов (колонки KeitaroRecord). Commit — у вызывающего."""
+
+    def __init__(self, adapter: PostgresqlAdapter):
+        self.adapter = adapter
+        self.keys_updated = 0
+
+    def update(self, frame: pd.DataFrame) -> int:
+        frame = frame[frame["datetime"].notna()]
+        if frame.empty:
+            return 0
+
+        keys = pd.DataFrame(
+            {
+                "day": pd.to_datetime(frame["datetime"]).dt.date.to_numpy(),
+                "campaign": frame["campaign"].to_numpy(),
+                "stream_id": frame["stream_id"].to_numpy(),
+                "country": frame["country"].to_numpy(),
+            }
+        )
+        codes = keys.groupby(KEY_COLUMNS, dropna=False, sort=False).ngroup().to_numpy()
+        first = pd.Series(np.arange(len(codes))).groupby(codes).first().to_numpy()
+        group_keys: List[Key] = [
+            (row[0], _none(row[1]), None if _none(row[2]) is None else int(row[2]), _none(row[3]))
+            for row in keys.iloc[first].itertuples(index=False, name=None)
+        ]
+
+        # группа -> поле -> (регистры, ранги) по куску
+        chunk_sketches = {}
+        for field in SKETCH_COLUMNS:
+            values = frame[field].reset_index(drop=True)
+            mask = values.notna().to_numpy()
+            chunk_sketches[field] = hll.group_registers(codes[mask], values[mask])
+
+        with self.adapter.connection.cursor() as cursor:
+            cursor.execute(_LOCK_SQL, ([f"{UNIQUES_TABLE}:{key!r}" for key in group_keys],))
+            cursor.execute(_SELECT_SQL, [list(col) for col in zip(*group_keys)])
+            existing = {tuple(row[:4]): row[4:] for row in cursor.fetchall()}
+
+            rows = []
+            for code, key in enumerate(group_keys):
+                stored = existing.get(key)
+                out = []
+                for pos, field in enumerate(SKETCH_COLUMNS):
+                    registers = hll.decode(stored[pos]) if stored and stored[pos] else hll.empty()
+                    if code in chunk_sketches[field]:
+                        hll.add(registers, *chunk_sketches[field][code])
+                    out.append(psycopg2.Binary(hll.encode(registers)))
+                rows.append((*key, *out))
+
+            psycopg2.extras.execute_values(cursor, _UPSERT_SQL, rows, page_size=1000)
+
+        self.keys_updated += len(rows)
+        return len(rows)
+
+
+def approx_uniques(
+    adapter: PostgresqlAdapter,
+    date_from: date,
+    date_to: date,
+    by: Sequence[str] = ("campaign",),
+    campaign: Optional[str] = None,
+    stream_id: Optional[int] = None,
+    country: Optional[str] = None,
+) -> List[dict]:
+    """
+    Уникальные ip/subid за [date_from, date_to] в разрезе by (подмножество
+    campaign, stream_id, country, day), с необязательными фильтрами.
+    """
+    by = list(by)
+    unknown = set(by) - set(KEY_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unsupported group by: {sorted(unknown)}")
+
+    where = ["day BETWEEN %s AND %s"]
+    params: list = [date_from, date_to]
+    for column, value in (("campaign", campaign), ("stream_id", stream_id), ("country", country)):
+        if value is not None:
+            where.append(f"{column} = %s")
+            params.append(value)
+
+    select = ", ".join(by + list(SKETCH_COLUMNS.values()))
+    with adapter.connection.cursor() as cursor:
+        cursor.execute(f"SELECT {select} FROM {UNIQUES_TABLE} WHERE {' AND '.join(where)}", params)
+        rows = cursor.fetchall()
+    adapter.rollback()
+
+    merged: Dict[tuple, List[np.ndarray]] = {}
+    for row in rows:
+        group = tuple(row[: len(by)])
+        sketches = merged.setdefault(group, [hll.empty() for _ in SKETCH_COLUMNS])
+        for pos, data in enumerate(row[len(by):]):
+            if data:
+                np.maximum(sketches[pos], hll.decode(data), out=sketches[pos])
+
+    result = []
+    for group, sketches in merged.items():
+        item = dict(zip(by, group))
+        for field, registers in zip(SKETCH_COLUMNS, sketches):
+            item[f"uniq_{field}"] = hll.estimate(registers)
+        result.append(item)
+    return result
+
+
+def rebuild(adapter: PostgresqlAdapter, source: str = "keitaro_clicks", batch_rows: int = 200_000) -> int:
+    """
+    Пересчёт скетчей по всей сырой таблице (первичное заполнение).
+    TRUNCATE и пересчёт — одна транзакция: при ошибке остаются прежние скетчи,
+    а импорт, пишущий в таблицу, ждёт конца пересчёта.
+    """
+    with adapter.connection.cursor() as cursor:
+        cursor.execute(f"TRUNCATE {UNIQUES_TABLE}")
+
+    rollup = UniquesRollup(adapter)
+    columns = ["datetime", "campaign", "stream_id", "country", "ip", "subid"]
+    # именованный курсор — строки тянутся с сервера порциями, а не целиком
+    reader = adapter.connection.cursor(name="keitaro_uniques_rebuild")
+    reader.itersize = batch_rows
+    reader.execute(f"SELECT {', '.join(columns)} FROM {source}")
+
+    total = 0
+    # обновления идут по другому курсору той же транзакции, commit — в конце
+    while True:
+        batch = reader.fetchmany(batch_rows)
+        if not batch:
+            break
+        rollup.update(pd.DataFrame(batch, columns=columns))
+        total += len(batch)
+        print(f"[UNIQUES] {total} clicks processed")
+    reader.close()
+    adapter.commit()
+    return rollup.keys_updated
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="approximate unique ip/subid from keitaro_uniques_daily")
+    ap.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    ap.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    ap.add_argument("--by", nargs="+", default=["campaign"], choices=KEY_COLUMNS)
+    ap.add_argument("--campaign")
+    ap.add_argument("--stream-id", type=int)
+    ap.add_argument("--country")
+    ap.add_argument("--rebuild", action="store_true", help="пересчитать скетчи из keitaro_clicks")
+    args = ap.parse_args()
+
+    adapter = PostgresqlAdapter()
+    if args.rebuild:
+        print(f"[UNIQUES] Rebuilt {rebuild(adapter)} keys")
+    if args.date_from and args.date_to:
+        t0 = time.perf_counter()
+        rows = approx_uniques(
+            adapter, args.date_from, args.date_to, by=args.by,
+            campaign=args.campaign, stream_id=args.stream_id, country=args.country,
+        )
+        for row in sorted(rows, key=lambda r: -r["uniq_ip"]):
+            print(row)
+        print(f"[UNIQUES] {len(rows)} groups in {(time.perf_counter() - t0) * 1000:.1f} ms")
+    adapter.connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from Keitaro.loaders.csv_loader import KeitaroCSVLoader
+from Keitaro.loaders.mmap_loader import KeitaroMmapCSVLoader
+from Keitaro.db.checkpoints import file_key
+from Keitaro.db.dedup_writer import ImportChunk
+from Keitaro.db.repository import KeitaroRepository
+
+
+def _parse_file(csv_path: str, key: str, skip_rows: int, chunk_size: int, parse_workers: int, frames) -> dict:
+    """
+    Выполняется в процессе пула: парсит файл кусками (начиная с чекпоинта skip_rows)
+    и кладёт их в общую очередь как ImportChunk. Возвращает статистику файла для манифеста.
+    parse_workers > 1 — большой файл ещё и режется на байтовые диапазоны в своём пуле.
+    """
+    started = time.perf_counter()
+    if parse_workers > 1:
+        loader = KeitaroMmapCSVLoader(Path(csv_path), workers=parse_workers, chunk_size=chunk_size)
+    else:
+        loader = KeitaroCSVLoader(Path(csv_path), chunk_size=chunk_size)
+    chunks = 0
+    for frame in loader.iter_frames(skip_rows=skip_rows):
+        frames.put(ImportChunk(csv_path, key, frame, loader.position))
+        chunks += 1
+    frames.put(ImportChunk(csv_path, key, None, loader.position, last=True))
+    return {
+        "rows": loader.loaded,
+        "rejected": loader.rejected,
+        "skipped_rows": skip_rows,
+        "chunks": chunks,
+        "parse_seconds": round(time.perf_counter() - started, 3),
+        "pid": os.getpid(),
+    }
+
+
+class KeitaroMultiFileService:
+    """
+    Импорт нескольких CSV за один запуск: файлы парсятся параллельно в пуле процессов,
+    куски со всех файлов идут через одну ограниченную очередь в общий COPY-писатель
+    (одно соединение, поток в родительском процессе). По итогам пишется манифест
+    с количеством строк и временем по каждому файлу.
+    """
+
+    def __init__(
+        self,
+        csv_paths: List[Path],
+        workers: Optional[int] = None,
+        chunk_size: int = 50_000,
+        queue_size: Optional[int] = None,
+        manifest_path: Optional[Path] = None,
+        parse_workers: int = 1,
+    ):
+        # крупные файлы первыми: тогда общее время ≈ время самого большого файла
+        self.csv_paths = sorted(csv_paths, key=lambda p: p.stat().st_size, reverse=True)
+        self.workers = workers or min(len(self.csv_paths), os.cpu_count() or 1)
+        self.chunk_size = chunk_size
+        # процессов на разбор одного файла; всего процессов до workers * parse_workers
+        self.parse_workers = parse_workers
+        # по паре кусков на воркер ждут записи — больше в памяти не копится
+        self.queue_size = queue_size or self.workers * 2
+        self.manifest_path = manifest_path or Path(
+            f"keitaro_import_{datetime.now():%Y%m%d_%H%M%S}.json"
+        )
+        self.repository = KeitaroRepository()
+
+    @staticmethod
+    def _drain(frames) -> Iterator[ImportChunk]:
+        # None — конец данных (свой объект-маркер через Manager не пройдёт: он копируется)
+        while True:
+            item = frames.get()
+            if item is None:
+                return
+            yield item
+
+    @staticmethod
+    def _discard(frames) -> None:
+        # писатель упал: разгружаем очередь, чтобы воркеры не висели на put()
+        while True:
+            try:
+                frames.get_nowait()
+            except queue.Empty:
+                return
+
+    def run(self) -> dict:
+        print(f"[SERVICE] Importing {len(self.csv_paths)} Keitaro files with {self.workers} workers")
+        started_at = datetime.now()
+        started = time.perf_counter()
+
+        # чекпоинты читаем до старта писателя: соединение у репозитория одно
+        keys = {str(path): file_key(path) for path in self.csv_paths}
+        files: Dict[str, dict] = {}
+        todo: Dict[str, int] = {}
+        for csv_path, key in keys.items():
+            checkpoint = self.repository.checkpoint(key)
+            if checkpoint and checkpoint["completed"]:
+                print(f"[SERVICE] {Path(csv_path).name} already imported, skipping")
+                files[csv_path] = {"status": "skipped", "rows": 0, "rejected": 0}
+            else:
+                todo[csv_path] = checkpoint["rows_done"] if checkpoint else 0
+
+        manager = multiprocessing.Manager()
+        frames = manager.Queue(maxsize=self.queue_size)
+        result: dict = {}
+
+        def write():
+            try:
+                result["stats"] = self.repository.import_chunks(self._drain(frames))
+            except Exception as e:
+                result["error"] = e
+
+        writer = threading.Thread(target=write, name="keitaro-writer", daemon=True)
+        writer.start()
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                pending = {
+                    pool.submit(
+                        _parse_file, csv_path, keys[csv_path], skip_rows, self.chunk_size, self.parse_workers, frames
+                    ): csv_path
+                    for csv_path, skip_rows in todo.items()
+                }
+                while pending:
+                    done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        csv_path = pending.pop(future)
+                        try:
+                            files[csv_path] = {"status": "ok", **future.result()}
+                        except Exception as e:
+                            # один битый файл не роняет остальные
+                            print(f"[SERVICE][ERROR] {csv_path}: {e}")
+                            files[csv_path] = {"status": "error", "error": str(e)}
+                    if not writer.is_alive():
+                        self._discard(frames)
+
+            if writer.is_alive():
+                frames.put(None)
+            writer.join()
+        finally:
+            manager.shutdown()
+
+        if "error" in result:
+            raise result["error"]
+
+        written = result["stats"]["files"]
+        manifest = {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - started, 3),
+            "workers": self.workers,
+            "copy": {k: v for k, v in result["stats"].items() if k != "files"},
+            "files": [
+                {
+                    "file": str(path),
+                    "size_bytes": path.stat().st_size,
+                    **files[str(path)],
+                    "inserted": written.get(str(path), {}).get("inserted", 0),
+                    "duplicates": written.get(str(path), {}).get("duplicates", 0),
+                }
+                for path in self.csv_paths
+            ],
+        }
+        self.manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        failed = [f["file"] for f in manifest["files"] if f["status"] == "error"]
+        print(
+            f"[SERVICE] Written {result['stats']['inserted']} new rows "
+            f"({result['stats']['duplicates']} duplicates) from {len(self.csv_paths)} files "
+            f"in {manifest['seconds']:.1f} s, manifest: {self.manifest_path}"
+        )
+        if failed:
+            print(f"[SERVICE][WARN] Failed files: {', '.join(failed)}")
+        else:
+            print("[SERVICE] Keitaro import finished successfully ✅")
+        return manifest
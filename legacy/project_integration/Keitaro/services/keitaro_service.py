@@ -1,25 +1,109 @@
+import queue
+import threading
 from pathlib import Path
+from typing import Iterator
+
 from Keitaro.loaders.csv_loader import KeitaroCSVLoader
+from Keitaro.loaders.mmap_loader import KeitaroMmapCSVLoader
+from Keitaro.db.checkpoints import file_key
+from Keitaro.db.dedup_writer import ImportChunk
 from Keitaro.db.repository import KeitaroRepository
-from Keitaro.models.keitaro_record import KeitaroRecord
+
+_DONE = object()
 
 
 class KeitaroService:
-    def __init__(self, csv_path: Path):
+    def __init__(
+        self,
+        csv_path: Path,
+        chunk_size: int = 50_000,
+        queue_size: int = 2,
+        resume: bool = True,
+        parse_workers: int = 1,
+    ):
         self.csv_path = csv_path
-        self.loader = KeitaroCSVLoader(csv_path)
+        # parse_workers > 1 — файл режется на байтовые диапазоны и разбирается в пуле процессов
+        if parse_workers > 1:
+            self.loader = KeitaroMmapCSVLoader(csv_path, workers=parse_workers, chunk_size=chunk_size)
+        else:
+            self.loader = KeitaroCSVLoader(csv_path, chunk_size=chunk_size)
         self.repository = KeitaroRepository()
+        # сколько распарсенных батчей может ждать записи (ограничивает память)
+        self.queue_size = queue_size
+        # продолжать с чекпоинта; False — перечитать файл целиком (дубли всё равно отсеются)
+        self.resume = resume
+
+    @staticmethod
+    def _drain(batches: queue.Queue) -> Iterator[ImportChunk]:
+        while True:
+            batch = batches.get()
+            if batch is _DONE:
+                return
+            yield batch
 
     def run(self):
+        """
+        Парсинг и запись идут параллельно: основной поток читает CSV кусками
+        и приводит типы поколоночно, поток-писатель забирает куски из очереди
+        и стримит в БД через COPY + staging (дубли по subid/datetime пропускаются).
+        Прерванный импорт того же файла продолжается с сохранённого чекпоинта.
+        """
         print(f"[SERVICE] Starting Keitaro import from {self.csv_path}")
 
-        records: list[KeitaroRecord] = self.loader.load()
-        if not records:
-            print("[SERVICE] No records loaded, stopping")
+        key = file_key(self.csv_path)
+        checkpoint = self.repository.checkpoint(key) if self.resume else None
+        if checkpoint and checkpoint["completed"]:
+            print(f"[SERVICE] {self.csv_path.name} already imported ({checkpoint['inserted']} rows), skipping")
             return
+        skip_rows = checkpoint["rows_done"] if checkpoint else 0
+        if skip_rows:
+            print(f"[SERVICE] Resuming {self.csv_path.name} from row {skip_rows}")
+
+        batches: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        result: dict = {}
+
+        def write():
+            try:
+                result["stats"] = self.repository.import_chunks(self._drain(batches))
+            except Exception as e:
+                result["error"] = e
 
-        print(f"[SERVICE] Loaded {len(records)} records. Inserting to DB...")
+        writer = threading.Thread(target=write, name="keitaro-writer", daemon=True)
+        writer.start()
 
-        self.repository.insert_many(records)
+        def put(item) -> bool:
+            # если писатель упал, очередь никто не разберёт — не висим на put()
+            while writer.is_alive():
+                try:
+                    batches.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        loaded = 0
+        path = str(self.csv_path)
+        try:
+            for batch in self.loader.iter_frames(skip_rows=skip_rows):
+                loaded += len(batch)
+                # пустой кусок (все строки отклонены) тоже двигает чекпоинт
+                if not put(ImportChunk(path, key, batch, self.loader.position)):
+                    break
+            else:
+                put(ImportChunk(path, key, None, self.loader.position, last=True))
+        finally:
+            # и при ошибке парсинга писатель должен выйти из _drain, иначе join() повиснет;
+            # put() сам перестаёт ждать, если писатель уже упал
+            put(_DONE)
+            writer.join()
+
+        if "error" in result:
+            raise result["error"]
+
+        if not loaded:
+            print("[SERVICE] No records loaded, stopping")
+            return
 
+        stats = result["stats"]
+        print(f"[SERVICE] Parsed {loaded} records, new {stats['inserted']}, duplicates {stats['duplicates']}")
         print("[SERVICE] Keitaro import finished successfully ✅")
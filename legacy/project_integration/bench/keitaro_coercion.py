@@ -0,0 +1,77 @@
+"""
+Разбор Keitaro CSV: KeitaroRecord на каждую строку (KeitaroCSVLoader.iter_batches)
+против поколоночного приведения типов (KeitaroCSVLoader.iter_frames).
+
+Синтетика пишется во временный CSV с заголовками выгрузки Keitaro, часть значений
+портится (пустые/null токены, кривые даты и числа), затем оба пути читают один и тот же
+файл. Результаты сверяются построчно. БД не нужна.
+
+Запуск из project_integration/:
+    python -m bench.keitaro_coercion --rows 200000
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from Keitaro.loaders.csv_loader import KeitaroCSVLoader
+from Keitaro.models.keitaro_record import KeitaroRecord
+from bench.synthetic import write_keitaro_csv
+
+# что подмешиваем в колонки, чтобы проверить совпадение на граничных значениях
+_NOISE = {
+    "datetime": ["", "null", "2025-13-01 00:00:00", "2025-11-01"],
+    "is_bot": ["", "NULL", "yes", "N", "maybe"],
+    "sale": ["", "null", "1.5", " 2 ", "x"],
+    "stream_id": ["", "-3", "7.0"],
+    "country": ["", "N/A", "NA", "null"],
+    "sub_id_5": ["0042", "", "NULL"],
+}
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="per-row KeitaroRecord vs columnar coercion")
+    ap.add_argument("--rows", type=int, default=200000)
+    ap.add_argument("--chunk-size", type=int, default=50000)
+    ap.add_argument("--noise", type=float, default=0.02, help="доля строк с испорченным значением поля")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "keitaro.csv"
+        write_keitaro_csv(path, args.rows, noise=_NOISE, noise_rate=args.noise, seed=args.seed)
+        loader = KeitaroCSVLoader(path, chunk_size=args.chunk_size)
+
+        records, per_row = _timed(lambda: [r for batch in loader.iter_batches() for r in batch])
+        frames, columnar = _timed(lambda: list(loader.iter_frames()))
+
+    fields = list(KeitaroRecord.model_fields)
+    expected = [tuple(getattr(r, f) for f in fields) for r in records]
+    actual = [row for frame in frames for row in frame[fields].itertuples(index=False, name=None)]
+
+    mismatches = 0
+    if len(expected) != len(actual):
+        print(f"row count differs: model={len(expected)} columnar={len(actual)}")
+        mismatches = abs(len(expected) - len(actual))
+    for a, b in zip(expected, actual):
+        if a != b:
+            mismatches += 1
+            if mismatches <= 5:
+                diff = {f: (x, y) for f, x, y in zip(fields, a, b) if x != y}
+                print(f"mismatch: {diff}")
+
+    print(f"\n{'per-row KeitaroRecord':<24} {len(expected):>9} rows  {per_row:>8.2f} s  {len(expected) / per_row:>10.0f} rows/s")
+    print(f"{'columnar coerce_frame':<24} {len(actual):>9} rows  {columnar:>8.2f} s  {len(actual) / columnar:>10.0f} rows/s")
+    print(f"speedup: x{per_row / columnar:.1f}, mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Разбор одного большого Keitaro CSV: KeitaroCSVLoader (один процесс, read_csv кусками)
+против KeitaroMmapCSVLoader (байтовые диапазоны в пуле процессов) на 1..N процессах.
+
+Часть user agent'ов содержит переводы строк и кавычки внутри кавычек — проверка того,
+что границы диапазонов попадают только на концы записей. Результаты сверяются
+с однопроцессным разбором. БД не нужна.
+
+Запуск из project_integration/:
+    python -m bench.keitaro_mmap_parser --rows 2000000 --workers 1 2 4 8
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from Keitaro.loaders.csv_loader import KeitaroCSVLoader
+from Keitaro.loaders.mmap_loader import KeitaroMmapCSVLoader
+from bench.synthetic import write_keitaro_csv
+
+_NOISE = {
+    "user_agent": [
+        "Mozilla/5.0 (Linux; Android 14)\nAppleWebKit/537.36",
+        'Mozilla/5.0 "quoted"; build\r\n42',
+    ],
+}
+
+
+def _frame(frames) -> pd.DataFrame:
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="single-process read_csv vs mmap byte-range parser")
+    ap.add_argument("--rows", type=int, default=1000000)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    ap.add_argument("--range-mb", type=int, default=16)
+    ap.add_argument("--multiline", type=float, default=0.01, help="доля строк с переводом строки в user agent")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "keitaro.csv"
+        write_keitaro_csv(path, args.rows, noise=_NOISE, noise_rate=args.multiline)
+        size_mb = path.stat().st_size / 2**20
+        print(f"file: {size_mb:.0f} MiB, {args.rows} rows")
+
+        t0 = time.perf_counter()
+        expected = _frame(list(KeitaroCSVLoader(path).iter_frames()))
+        base = time.perf_counter() - t0
+        print(f"{'read_csv, 1 process':<24} {base:>8.2f} s  {size_mb / base:>8.1f} MiB/s")
+
+        for workers in args.workers:
+            loader = KeitaroMmapCSVLoader(path, workers=workers, range_bytes=args.range_mb << 20)
+            t0 = time.perf_counter()
+            actual = _frame(list(loader.iter_frames()))
+            seconds = time.perf_counter() - t0
+
+            same = len(actual) == len(expected) and actual.equals(expected)
+            print(
+                f"{f'mmap, {workers} processes':<24} {seconds:>8.2f} s  {size_mb / seconds:>8.1f} MiB/s  "
+                f"x{base / seconds:.1f}  {'match' if same else 'MISMATCH'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SQL_DIR = Path(__file__).resolve().parent.parent / "sql"
+
+COUNTRIES = ["US", "GB", "DE", "FR", "BR", "IN", "JP", "KZ", "TR", "PL", "CA", "AU"]
+MEDIA_SOURCES = ["googleadwords_int", "Facebook Ads", "tiktokglobal_int", "unityads_int", "Organic"]
+TEAMS = ["alpha", "bravo", "delta", "kilo", "omega", "zulu"]
+
+
+def make_appsflyer_rows(
+    n_rows: int,
+    *,
+    n_apps: int = 20,
+    start: datetime = datetime(2023, 1, 1),
+    days: int = 365,
+    seed: int = 42,
+) -> List[Dict[str, Any]]:
+    """
+    Синтетические строки в формате таблицы appsflyer (после normalize_rows).
+    Уникальность (date, app_id, campaign, country) гарантируется.
+    """
+    rnd = random.Random(seed)
+    rows: List[Dict[str, Any]] = []
+    seen = set()
+
+    while len(rows) < n_rows:
+        app_no = rnd.randrange(n_apps)
+        date = start + timedelta(days=rnd.randrange(days))
+        team = rnd.choice(TEAMS)
+        campaign = f"{team}_{rnd.choice(MEDIA_SOURCES)[:4]}_{rnd.randrange(50)}"
+        country = rnd.choice(COUNTRIES)
+
+        key = (date, app_no, campaign, country)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        impressions = rnd.randrange(0, 50000)
+        clicks = rnd.randrange(0, max(1, impressions // 10))
+        installs = rnd.randrange(0, max(1, clicks // 5))
+        cost = round(installs * rnd.uniform(0.2, 3.0), 2)
+        revenue = round(installs * rnd.uniform(0.0, 4.0), 2)
+
+        rows.append(
+            {
+                "date": date,
+                "country": country,
+                "agency_pmd": None,
+                "media_source": rnd.choice(MEDIA_SOURCES),
+                "campaign": campaign,
+                "impressions": impressions,
+                "clicks": clicks,
+                "ctr": f"{100 * clicks / impressions:.2f}" if impressions else None,
+                "installs": installs,
+                "conversion_rate": f"{100 * installs / clicks:.2f}" if clicks else None,
+                "sessions": installs * rnd.randrange(1, 6),
+                "loyal_users": installs // 3,
+                "loyal_users_per_install": 0.33 if installs else None,
+                "total_revenue": revenue,
+                "total_cost": cost,
+                "roi": round((revenue - cost) / cost, 4) if cost else None,
+                "arpu": round(revenue / installs, 4) if installs else None,
+                "avg_ecpi": round(cost / installs, 4) if installs else None,
+                "af_complete_registration_unique_users": installs // 2,
+                "af_complete_registration_event_counter": installs // 2,
+                "af_complete_registration_sales_usd": 0.0,
+                "af_purchase_unique_users": installs // 10,
+                "af_purchase_event_counter": installs // 8,
+                "af_purchase_sales_usd": revenue,
+                "app_id": f"id{6700000000 + app_no}",
+                "app_name": f"Bench App {app_no}",
+                "app_platform": "ios",
+                "report_type": "geo_by_date_report",
+            }
+        )
+
+    return rows
+
+
+def appsflyer_ddl(table: str, sql_file: str = "table.sql") -> str:
+    """DDL из sql/<sql_file>, но под другим именем таблицы (для бенчмарков)."""
+    ddl = (SQL_DIR / sql_file).read_text(encoding="utf-8")
+    return ddl.replace("appsflyer", table)
+
+
+USER_AGENTS = [
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+]
+
+
+def make_keitaro_rows(
+    n_rows: int,
+    *,
+    start: datetime = datetime(2025, 11, 1),
+    days: int = 7,
+    seed: int = 7,
+) -> List[Dict[str, Any]]:
+    """Синтетические клики Keitaro в формате полей KeitaroRecord."""
+    rnd = random.Random(seed)
+    rows: List[Dict[str, Any]] = []
+    for i in range(n_rows):
+        team = rnd.choice(TEAMS)
+        stream_id = rnd.randrange(1, 40)
+        rows.append(
+            {
+                "subid": f"{i:x}{rnd.getrandbits(40):010x}",
+                "datetime": start + timedelta(seconds=rnd.randrange(days * 86400)),
+                "ip": f"{rnd.randrange(1, 255)}.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(256)}",
+                "campaign": f"{team}_{rnd.randrange(30)}",
+                "stream": f"stream {stream_id}",
+                "stream_id": stream_id,
+                "offer": f"offer_{rnd.randrange(15)}",
+                "country": rnd.choice(COUNTRIES),
+                "country_flag": None,
+                "sub_id_2": f"{team}_adset_{rnd.randrange(100)}",
+                "sub_id_5": str(rnd.randrange(1000)),
+                "os": rnd.choice(["iOS", "Android", "Windows"]),
+                "os_version": str(rnd.randrange(10, 18)),
+                "browser": rnd.choice(["Safari", "Chrome", "WebView"]),
+                "connection_type": rnd.choice(["wifi", "cellular"]),
+                "device_type": rnd.choice(["mobile", "tablet", "desktop"]),
+                "device_model": rnd.choice(["iPhone", "SM-S918B", "Pixel 8", None]),
+                "is_bot": rnd.random() < 0.05,
+                "is_unique": rnd.random() < 0.7,
+                "sale": int(rnd.random() < 0.01),
+                "lead": int(rnd.random() < 0.05),
+                "user_agent": rnd.choice(USER_AGENTS),
+                "isp": rnd.choice(["Comcast", "Vodafone", "MTS", "Orange"]),
+                "operator": rnd.choice(["T-Mobile", "Beeline", None]),
+                "campaign_group": team,
+            }
+        )
+    return rows
+
+
+def write_keitaro_csv(
+    path: Path,
+    n_rows: int,
+    *,
+    noise: Optional[Dict[str, List[Any]]] = None,
+    noise_rate: float = 0.0,
+    seed: int = 7,
+) -> None:
+    """
+    make_keitaro_rows в CSV с заголовками выгрузки Keitaro (как читает KeitaroCSVLoader).
+    noise — поле -> значения, которыми с вероятностью noise_rate портится строка.
+    """
+    import pandas as pd
+
+    from Keitaro.loaders.csv_loader import CSV_COLUMNS_MAP
+
+    rnd = random.Random(seed)
+    rows = make_keitaro_rows(n_rows, seed=seed)
+    for row in rows:
+        row["datetime"] = row["datetime"].strftime("%Y-%m-%d %H:%M:%S")
+        row["is_bot"] = int(row["is_bot"])
+        row["is_unique"] = int(row["is_unique"])
+        for field, values in (noise or {}).items():
+            if rnd.random() < noise_rate:
+                row[field] = rnd.choice(values)
+
+    to_csv = {field: col for col, field in CSV_COLUMNS_MAP.items()}
+    frame = pd.DataFrame(rows).rename(columns=to_csv)
+    frame.to_csv(path, sep=";", index=False, quotechar='"', encoding="utf-8")
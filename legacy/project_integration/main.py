@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 
 from sqlalchemy import false
@@ -29,7 +30,10 @@ def main() -> None:
     service = IntegrationService(config=cfg, client=client)
 
     # 4. запускаем сценарий
-    service.run()
+    if cfg.async_writer:
+        asyncio.run(service.run_async())
+    else:
+        service.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+-- Связка кампаний Keitaro и AppsFlyer по дням (src/campaign_bridge.py).
+-- Keitaro-часть пересчитывается из keitaro_clicks_daily (sql/keitaro_timeseries.sql),
+-- поэтому Keitaro и appsflyer должны жить в одной базе.
+
+-- исходное имя кампании -> нормализованный ключ (campaign_key() в Python)
+create table campaign_key_map
+(
+    source       text not null,
+    campaign     text not null,
+    campaign_key text not null,
+    primary key (source, campaign)
+);
+
+create index campaign_key_map_key_idx on campaign_key_map (campaign_key, source);
+
+create table campaign_day_bridge
+(
+    campaign_key          text      not null,
+    day                   date      not null,
+    keitaro_clicks        bigint    not null default 0,
+    keitaro_unique_clicks bigint    not null default 0,
+    keitaro_leads         bigint    not null default 0,
+    keitaro_sales         bigint    not null default 0,
+    af_impressions        bigint    not null default 0,
+    af_clicks             bigint    not null default 0,
+    af_installs           bigint    not null default 0,
+    af_cost               numeric   not null default 0,
+    af_revenue            numeric   not null default 0,
+    updated_at            timestamp not null default now(),
+    primary key (campaign_key, day)
+);
+
+-- панели «все кампании за период»
+create index campaign_day_bridge_day_idx on campaign_day_bridge (day, campaign_key);
+
+create view campaign_funnel_daily as
+select campaign_key,
+       day,
+       keitaro_clicks,
+       keitaro_unique_clicks,
+       af_clicks,
+       af_installs,
+       keitaro_leads,
+       keitaro_sales,
+       af_cost,
+       af_revenue,
+       af_installs::numeric / nullif(keitaro_clicks, 0)        as click_to_install,
+       af_installs::numeric / nullif(keitaro_unique_clicks, 0) as unique_click_to_install,
+       keitaro_leads::numeric / nullif(af_installs, 0)         as install_to_lead,
+       af_cost / nullif(af_installs, 0)                        as cost_per_install
+from campaign_day_bridge;
@@ -0,0 +1,52 @@
+create table keitaro_clicks
+(
+    id              bigserial
+        primary key,
+    subid           text,
+    datetime        timestamp,
+    ip              text,
+    campaign        text,
+    stream          text,
+    stream_id       integer,
+    offer           text,
+    country         text,
+    country_flag    text,
+    sub_id_2        text,
+    sub_id_5        text,
+    os              text,
+    os_version      text,
+    browser         text,
+    connection_type text,
+    device_type     text,
+    device_model    text,
+    is_bot          boolean,
+    is_unique       boolean,
+    sale            integer,
+    lead            integer,
+    user_agent      text,
+    isp             text,
+    operator        text,
+    campaign_group  text
+);
+
+-- один клик = subid + время клика; повторный импорт пересекающейся выгрузки пропускает дубли
+-- строки без subid не дедуплицируются: по ним не отличить разные клики.
+-- Индекс частичный, поэтому ON CONFLICT обязан повторять его условие:
+-- ON CONFLICT (subid, datetime) WHERE subid IS NOT NULL
+create unique index keitaro_clicks_subid_datetime_key
+    on keitaro_clicks (subid, datetime)
+    where subid is not null;
+
+-- докуда дочитан каждый файл импорта (строки данных CSV, без заголовка)
+create table keitaro_import_checkpoints
+(
+    file_key   text
+        primary key,
+    file_name  text      not null,
+    file_size  bigint    not null,
+    rows_done  bigint    not null default 0,
+    inserted   bigint    not null default 0,
+    duplicates bigint    not null default 0,
+    completed  boolean   not null default false,
+    updated_at timestamp not null default now()
+);
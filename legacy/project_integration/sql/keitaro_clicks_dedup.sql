@@ -0,0 +1,35 @@
+-- Переход существующей keitaro_clicks на дедупликацию (для новых баз достаточно keitaro_clicks.sql).
+-- Оставляет самую раннюю запись из каждой группы (subid, datetime); строки без subid не трогает.
+begin;
+
+delete
+from keitaro_clicks
+where id in (select id
+             from (select id, row_number() over (partition by subid, datetime order by id) rn
+                   from keitaro_clicks
+                   where subid is not null) t
+             where rn > 1);
+
+alter table keitaro_clicks
+    drop constraint if exists keitaro_clicks_subid_datetime_key;
+
+-- строки без subid (subid is null) не дедуплицируются никогда: индекс частичный, и такие клики
+-- вставляются все, включая повторы при перезапуске импорта
+create unique index if not exists keitaro_clicks_subid_datetime_key
+    on keitaro_clicks (subid, datetime)
+    where subid is not null;
+
+create table if not exists keitaro_import_checkpoints
+(
+    file_key   text
+        primary key,
+    file_name  text      not null,
+    file_size  bigint    not null,
+    rows_done  bigint    not null default 0,
+    inserted   bigint    not null default 0,
+    duplicates bigint    not null default 0,
+    completed  boolean   not null default false,
+    updated_at timestamp not null default now()
+);
+
+commit;
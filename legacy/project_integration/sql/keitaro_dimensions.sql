@@ -0,0 +1,223 @@
+-- Словарное кодирование keitaro_clicks: длинные повторяющиеся строки уходят в справочники,
+-- в факте остаются integer id. keitaro_clicks становится view с прежними колонками,
+-- так что существующие запросы и дашборды работают без изменений.
+-- Применяется к базе, где уже есть keitaro_clicks (sql/keitaro_clicks.sql); старая таблица
+-- переименовывается в keitaro_clicks_wide и после проверки может быть удалена.
+begin;
+
+-- уникальность значения — по md5(value): btree на самом text не принимает строки длиннее ~2.7 КБ
+-- (user_agent бывает и длиннее); DimensionEncoder ищет значения по md5(value) и сверяет value
+
+create table keitaro_dim_campaign
+(
+    id    serial
+        primary key,
+    value text not null
+);
+
+create unique index keitaro_dim_campaign_value_key
+    on keitaro_dim_campaign (md5(value));
+
+create table keitaro_dim_offer
+(
+    id    serial
+        primary key,
+    value text not null
+);
+
+create unique index keitaro_dim_offer_value_key
+    on keitaro_dim_offer (md5(value));
+
+create table keitaro_dim_browser
+(
+    id    serial
+        primary key,
+    value text not null
+);
+
+create unique index keitaro_dim_browser_value_key
+    on keitaro_dim_browser (md5(value));
+
+create table keitaro_dim_device_model
+(
+    id    serial
+        primary key,
+    value text not null
+);
+
+create unique index keitaro_dim_device_model_value_key
+    on keitaro_dim_device_model (md5(value));
+
+create table keitaro_dim_user_agent
+(
+    id    serial
+        primary key,
+    value text not null
+);
+
+create unique index keitaro_dim_user_agent_value_key
+    on keitaro_dim_user_agent (md5(value));
+
+create table keitaro_dim_isp
+(
+    id    serial
+        primary key,
+    value text not null
+);
+
+create unique index keitaro_dim_isp_value_key
+    on keitaro_dim_isp (md5(value));
+
+create table keitaro_dim_operator
+(
+    id    serial
+        primary key,
+    value text not null
+);
+
+create unique index keitaro_dim_operator_value_key
+    on keitaro_dim_operator (md5(value));
+
+-- <колонка>_id -> keitaro_dim_<колонка>.id; внешние ключи не ставим, чтобы не проверять их на каждом COPY
+-- (id выдаёт только DimensionEncoder, справочники только растут)
+create table keitaro_clicks_fact
+(
+    id              bigserial
+        primary key,
+    subid           text,
+    datetime        timestamp,
+    ip              text,
+    campaign_id     integer,
+    stream          text,
+    stream_id       integer,
+    offer_id        integer,
+    country         text,
+    country_flag    text,
+    sub_id_2        text,
+    sub_id_5        text,
+    os              text,
+    os_version      text,
+    browser_id      integer,
+    connection_type text,
+    device_type     text,
+    device_model_id integer,
+    is_bot          boolean,
+    is_unique       boolean,
+    sale            integer,
+    lead            integer,
+    user_agent_id   integer,
+    isp_id          integer,
+    operator_id     integer,
+    campaign_group  text
+);
+
+-- как в keitaro_clicks.sql: дедупликация только строк с subid
+create unique index keitaro_clicks_fact_subid_datetime_key
+    on keitaro_clicks_fact (subid, datetime)
+    where subid is not null;
+
+-- справочники из уже загруженных кликов
+insert into keitaro_dim_campaign (value)
+select distinct campaign from keitaro_clicks where campaign is not null;
+
+insert into keitaro_dim_offer (value)
+select distinct offer from keitaro_clicks where offer is not null;
+
+insert into keitaro_dim_browser (value)
+select distinct browser from keitaro_clicks where browser is not null;
+
+insert into keitaro_dim_device_model (value)
+select distinct device_model from keitaro_clicks where device_model is not null;
+
+insert into keitaro_dim_user_agent (value)
+select distinct user_agent from keitaro_clicks where user_agent is not null;
+
+insert into keitaro_dim_isp (value)
+select distinct isp from keitaro_clicks where isp is not null;
+
+insert into keitaro_dim_operator (value)
+select distinct operator from keitaro_clicks where operator is not null;
+
+insert into keitaro_clicks_fact (id, subid, datetime, ip, campaign_id, stream, stream_id, offer_id, country,
+                                 country_flag, sub_id_2, sub_id_5, os, os_version, browser_id, connection_type,
+                                 device_type, device_model_id, is_bot, is_unique, sale, lead, user_agent_id,
+                                 isp_id, operator_id, campaign_group)
+select k.id,
+       k.subid,
+       k.datetime,
+       k.ip,
+       cmp.id,
+       k.stream,
+       k.stream_id,
+       ofr.id,
+       k.country,
+       k.country_flag,
+       k.sub_id_2,
+       k.sub_id_5,
+       k.os,
+       k.os_version,
+       br.id,
+       k.connection_type,
+       k.device_type,
+       dm.id,
+       k.is_bot,
+       k.is_unique,
+       k.sale,
+       k.lead,
+       ua.id,
+       isp.id,
+       op.id,
+       k.campaign_group
+from keitaro_clicks k
+         left join keitaro_dim_campaign cmp on cmp.value = k.campaign
+         left join keitaro_dim_offer ofr on ofr.value = k.offer
+         left join keitaro_dim_browser br on br.value = k.browser
+         left join keitaro_dim_device_model dm on dm.value = k.device_model
+         left join keitaro_dim_user_agent ua on ua.value = k.user_agent
+         left join keitaro_dim_isp isp on isp.value = k.isp
+         left join keitaro_dim_operator op on op.value = k.operator
+on conflict do nothing;
+
+-- is_called = false: следующий nextval вернёт ровно max(id) + 1, и на пустой таблице — 1
+select setval(pg_get_serial_sequence('keitaro_clicks_fact', 'id'), coalesce(max(id), 0) + 1, false) from keitaro_clicks_fact;
+
+alter table keitaro_clicks rename to keitaro_clicks_wide;
+
+-- прежний вид таблицы для чтения
+create view keitaro_clicks as
+select f.id,
+       f.subid,
+       f.datetime,
+       f.ip,
+       cmp.value as campaign,
+       f.stream,
+       f.stream_id,
+       ofr.value as offer,
+       f.country,
+       f.country_flag,
+       f.sub_id_2,
+       f.sub_id_5,
+       f.os,
+       f.os_version,
+       br.value as browser,
+       f.connection_type,
+       f.device_type,
+       dm.value as device_model,
+       f.is_bot,
+       f.is_unique,
+       f.sale,
+       f.lead,
+       ua.value as user_agent,
+       isp.value as isp,
+       op.value as operator,
+       f.campaign_group
+from keitaro_clicks_fact f
+         left join keitaro_dim_campaign cmp on cmp.id = f.campaign_id
+         left join keitaro_dim_offer ofr on ofr.id = f.offer_id
+         left join keitaro_dim_browser br on br.id = f.browser_id
+         left join keitaro_dim_device_model dm on dm.id = f.device_model_id
+         left join keitaro_dim_user_agent ua on ua.id = f.user_agent_id
+         left join keitaro_dim_isp isp on isp.id = f.isp_id
+         left join keitaro_dim_operator op on op.id = f.operator_id;
+
+commit;
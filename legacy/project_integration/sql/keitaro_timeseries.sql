@@ -0,0 +1,64 @@
+-- Почасовые и дневные агрегаты кликов для графиков Grafana.
+-- Импорт (KeitaroDedupWriter) дополняет их новыми кликами каждого куска,
+-- здесь — создание и первичное заполнение из уже загруженных keitaro_clicks.
+begin;
+
+create table keitaro_clicks_hourly
+(
+    bucket        timestamp not null,
+    campaign      text,
+    stream_id     integer,
+    offer         text,
+    country       text,
+    clicks        bigint    not null default 0,
+    unique_clicks bigint    not null default 0,
+    bots          bigint    not null default 0,
+    leads         bigint    not null default 0,
+    sales         bigint    not null default 0,
+    constraint keitaro_clicks_hourly_key unique nulls not distinct (bucket, campaign, stream_id, offer, country)
+);
+
+create table keitaro_clicks_daily
+(
+    day           date   not null,
+    campaign      text,
+    stream_id     integer,
+    offer         text,
+    country       text,
+    clicks        bigint not null default 0,
+    unique_clicks bigint not null default 0,
+    bots          bigint not null default 0,
+    leads         bigint not null default 0,
+    sales         bigint not null default 0,
+    constraint keitaro_clicks_daily_key unique nulls not distinct (day, campaign, stream_id, offer, country)
+);
+
+insert into keitaro_clicks_hourly (bucket, campaign, stream_id, offer, country, clicks, unique_clicks, bots, leads, sales)
+select date_trunc('hour', datetime), campaign, stream_id, offer, country,
+       count(*),
+       count(*) filter (where is_unique),
+       count(*) filter (where is_bot),
+       coalesce(sum(lead), 0),
+       coalesce(sum(sale), 0)
+from keitaro_clicks
+where datetime is not null
+group by 1, 2, 3, 4, 5;
+
+insert into keitaro_clicks_daily (day, campaign, stream_id, offer, country, clicks, unique_clicks, bots, leads, sales)
+select bucket::date, campaign, stream_id, offer, country,
+       sum(clicks), sum(unique_clicks), sum(bots), sum(leads), sum(sales)
+from keitaro_clicks_hourly
+group by 1, 2, 3, 4, 5;
+
+commit;
+
+-- Пример панели Grafana (вместо сканирования keitaro_clicks):
+-- select bucket as time,
+--        sum(clicks)                              as clicks,
+--        sum(leads)                               as leads,
+--        sum(sales)                               as sales,
+--        sum(bots)::float / nullif(sum(clicks), 0) as bot_share
+-- from keitaro_clicks_hourly
+-- where $__timeFilter(bucket) and campaign in ($campaign)
+-- group by 1
+-- order by 1;
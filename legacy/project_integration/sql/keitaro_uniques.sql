@@ -0,0 +1,14 @@
+-- HyperLogLog-скетчи уникальных ip и subid за день (Keitaro/rollups/hll.py, p=14, ~0.81% ошибка).
+-- Ведутся импортом (KeitaroDedupWriter), за период сливаются в Keitaro/rollups/uniques.py.
+-- Первичное заполнение: python -m Keitaro.rollups.uniques --rebuild
+create table keitaro_uniques_daily
+(
+    day        date      not null,
+    campaign   text,
+    stream_id  integer,
+    country    text,
+    ip_hll     bytea,
+    subid_hll  bytea,
+    updated_at timestamp not null default now(),
+    constraint keitaro_uniques_daily_key unique nulls not distinct (day, campaign, stream_id, country)
+);
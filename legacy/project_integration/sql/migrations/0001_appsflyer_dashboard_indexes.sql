@@ -0,0 +1,15 @@
+-- Индексы под дашборды: фильтр app_id + диапазон дат, группировка по media_source.
+-- Подобраны по bench/dashboard_indexes.py (планы и время до/после).
+-- {{ table }} — сырая таблица AppsFlyer (destination_table), подставляет src/migrations.py.
+
+-- BRIN на порядки меньше btree, но отсекает страницы только если физический порядок строк
+-- близок к порядку date; это не гарантировано (upsert'ы перезаписывают старые дни,
+-- VACUUM переиспользует место), поэтому bench/dashboard_indexes.py печатает
+-- pg_stats.correlation для date — при |correlation| заметно меньше 1 индекс бесполезен
+create index if not exists {{ table }}_date_brin
+    on {{ table }} using brin (date) with (pages_per_range = 32);
+
+-- app_id + диапазон дат; INCLUDE даёт index-only scan для типовых сумм по media_source
+create index if not exists {{ table }}_app_date_idx
+    on {{ table }} (app_id, date)
+    include (media_source, country, installs, clicks, impressions, total_cost, total_revenue);
@@ -0,0 +1,39 @@
+-- Предагрегаты для дашбордов (Metabase / Grafana).
+-- Обновляются загрузчиком только по затронутым (app_id, day), см. src/rollups.py
+
+create table appsflyer_daily_rollup
+(
+    day           date    not null,
+    app_id        text    not null,
+    media_source  text    not null,
+    country       text    not null,
+    impressions   bigint  not null default 0,
+    clicks        bigint  not null default 0,
+    installs      bigint  not null default 0,
+    sessions      bigint  not null default 0,
+    total_cost    numeric not null default 0,
+    total_revenue numeric not null default 0,
+    purchases     bigint  not null default 0,
+    rows_count    integer not null default 0,
+    constraint appsflyer_daily_rollup_pk
+        primary key (app_id, day, media_source, country)
+);
+
+create index appsflyer_daily_rollup_day_idx on appsflyer_daily_rollup (day);
+
+create table appsflyer_weekly_team_rollup
+(
+    week_start    date    not null,
+    app_id        text    not null,
+    team          text    not null,
+    impressions   bigint  not null default 0,
+    clicks        bigint  not null default 0,
+    installs      bigint  not null default 0,
+    total_cost    numeric not null default 0,
+    total_revenue numeric not null default 0,
+    campaigns     integer not null default 0,
+    constraint appsflyer_weekly_team_rollup_pk
+        primary key (app_id, week_start, team)
+);
+
+create index appsflyer_weekly_team_rollup_week_idx on appsflyer_weekly_team_rollup (week_start);
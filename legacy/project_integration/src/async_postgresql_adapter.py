@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import logging
+import time
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+
+from .batch_sizer import BatchSizer
+
+
+class AsyncPostgresqlAdapter:
+    """
+    asyncio-версия PostgresqlAdapter.insert на asyncpg.
+
+    Контракт тот же: insert(data=..., destination_table=..., on_duplicate=...),
+    но запись идёт без SQLAlchemy и без потоков:
+        - 'no_check' / None -> COPY прямо в таблицу
+        - 'ignore' / 'update' -> COPY во временную таблицу + подготовленный
+          INSERT ... SELECT ... ON CONFLICT
+    """
+
+    STAGE_TABLE = "_af_insert_stage"
+
+    @classmethod
+    async def create_pool(cls, uri: str, *, min_size: int = 1, max_size: int = 4) -> asyncpg.Pool:
+        uri = uri.replace('postgres://', 'postgresql://')
+        return await asyncpg.create_pool(uri, min_size=min_size, max_size=max_size, timeout=1800)
+
+    @classmethod
+    async def _describe_table(
+        cls, connection: asyncpg.Connection, table: str
+    ) -> Tuple[Dict[str, str], List[str], Optional[str]]:
+        """
+        Возвращает (тип каждой колонки, автоинкрементные колонки, имя unique/PK constraint).
+        Как и в синхронном адаптере, unique constraint приоритетнее PK.
+        """
+        columns = await connection.fetch(
+            """
+            SELECT a.attname                            AS name,
+                   format_type(a.atttypid, a.atttypmod) AS type,
+                   a.attidentity <> ''                  AS is_identity,
+                   pg_get_expr(d.adbin, d.adrelid)      AS default_expr
+            FROM pg_attribute a
+                     LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+            WHERE a.attrelid = $1::regclass
+              AND a.attnum > 0
+              AND NOT a.attisdropped
+            """,
+            table,
+        )
+        column_types = {c["name"]: c["type"] for c in columns}
+        autoincrement_columns = [
+            c["name"]
+            for c in columns
+            if c["is_identity"] or (c["default_expr"] or "").startswith("nextval(")
+        ]
+
+        constraint_name = await connection.fetchval(
+            """
+            SELECT conname
+            FROM pg_constraint
+            WHERE conrelid = $1::regclass
+              AND contype IN ('u', 'p')
+            ORDER BY contype = 'p', conname
+            LIMIT 1
+            """,
+            table,
+        )
+        return column_types, autoincrement_columns, constraint_name
+
+    @staticmethod
+    def _quote(name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
+    @classmethod
+    def _upsert_sql(
+        cls, table: str, insert_columns: List[str], constraint_name: str, on_duplicate: str
+    ) -> str:
+        cols = ", ".join(cls._quote(c) for c in insert_columns)
+        sql = f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {cls.STAGE_TABLE}"
+        if on_duplicate == "update":
+            set_clause = ", ".join(f"{cls._quote(c)} = EXCLUDED.{cls._quote(c)}" for c in insert_columns)
+            sql += f" ON CONFLICT ON CONSTRAINT {cls._quote(constraint_name)} DO UPDATE SET {set_clause}"
+        else:
+            sql += " ON CONFLICT DO NOTHING"
+        return sql
+
+    @staticmethod
+    def _to_record(row: dict, insert_columns: List[str], numeric_columns: set) -> tuple:
+        # asyncpg кодирует float в numeric через Decimal(float) -> хвост из знаков,
+        # поэтому приводим через repr, как это делает psycopg2
+        values = []
+        for col in insert_columns:
+            v = row.get(col)
+            if col in numeric_columns and isinstance(v, float):
+                v = Decimal(repr(v))
+            values.append(v)
+        return tuple(values)
+
+    @classmethod
+    async def insert(
+        cls,
+        *,
+        data: list[dict],
+        destination_table: str,
+        destination_uri: str | None = None,
+        pool: asyncpg.Pool | None = None,
+        connection: asyncpg.Connection | None = None,
+        schema_name: str | None = None,
+        on_duplicate: str | None = None,
+        mode: str | None = None,
+        batch_size: int | str = "auto",
+        **kwargs,
+    ):
+        """
+        Асинхронный insert с поддержкой батчей и on_duplicate.
+        data: список dict (ключи = имена колонок в таблице).
+        pool: готовый пул (для пайплайна), иначе открывается соединение по destination_uri.
+        connection: соединение вызывающего — insert идёт в его транзакции (как savepoint),
+            соединение не закрывается и в пул не возвращается.
+        batch_size: int или 'auto' (см. BatchSizer), выбранные размеры возвращаются в 'batch_sizes'.
+        on_duplicate:
+            - None / 'no_check'  -> COPY, пусть БД сама ругается на дубликаты
+            - 'ignore'           -> ON CONFLICT DO NOTHING
+            - 'update'           -> ON CONFLICT DO UPDATE SET ... = EXCLUDED....
+        """
+        if not data:
+            logging.info("AsyncPostgresqlAdapter.insert: no data to insert")
+            return {"affected_rows": 0, "affected_columns": []}
+
+        if on_duplicate not in ("update", "ignore", "no_check", None):
+            raise ValueError(f"Unsupported on_duplicate mode: {on_duplicate}")
+
+        if connection is None and pool is None and not destination_uri:
+            raise ValueError("destination_uri, pool or connection is required")
+
+        sizer = BatchSizer(
+            batch_size,
+            target_seconds=kwargs.get("batch_target_seconds", 2.0),
+            memory_limit_bytes=kwargs.get("batch_memory_limit_bytes", 256 * 1024 * 1024),
+        )
+
+        owned = connection is None
+        if owned and pool is not None:
+            connection = await pool.acquire()
+        elif owned:
+            connection = await asyncpg.connect(
+                destination_uri.replace('postgres://', 'postgresql://'), timeout=1800
+            )
+
+        affected = 0
+        try:
+            async with connection.transaction():
+                if schema_name:
+                    await connection.execute(f"SET LOCAL SEARCH_PATH = {schema_name}")
+
+                table = cls._quote(destination_table)
+                column_types, autoincrement_columns, constraint_name = await cls._describe_table(
+                    connection, table
+                )
+
+                if not constraint_name and on_duplicate in ("update", "ignore"):
+                    raise ValueError(
+                        "No unique or primary key constraint found, but on_duplicate requires a constraint"
+                    )
+
+                all_keys = list(data[0].keys())
+                insert_columns = [c for c in all_keys if c not in autoincrement_columns]
+                numeric_columns = {c for c in insert_columns if column_types.get(c, "").startswith("numeric")}
+
+                upsert = None
+                if on_duplicate in ("update", "ignore"):
+                    # временная таблица без constraint'ов, только нужные колонки
+                    cols = ", ".join(cls._quote(c) for c in insert_columns)
+                    await connection.execute(
+                        f"CREATE TEMP TABLE {cls.STAGE_TABLE} ON COMMIT DROP AS "
+                        f"SELECT {cols} FROM {table} WITH NO DATA"
+                    )
+                    upsert = await connection.prepare(
+                        cls._upsert_sql(table, insert_columns, constraint_name, on_duplicate)
+                    )
+
+                size = sizer.start(data)
+                offset = 0
+                while offset < len(data):
+                    batch = data[offset : offset + size]
+                    offset += len(batch)
+                    started = time.perf_counter()
+
+                    records = [cls._to_record(row, insert_columns, numeric_columns) for row in batch]
+
+                    if upsert is None:
+                        await connection.copy_records_to_table(
+                            destination_table,
+                            records=records,
+                            columns=insert_columns,
+                            schema_name=schema_name,
+                        )
+                        affected += len(records)
+                        size = sizer.observe(len(batch), time.perf_counter() - started)
+                        continue
+
+                    await connection.copy_records_to_table(
+                        cls.STAGE_TABLE, records=records, columns=insert_columns
+                    )
+                    await upsert.fetch()
+                    # статус вида "INSERT 0 <n>"
+                    affected += int(upsert.get_statusmsg().rsplit(" ", 1)[-1])
+                    await connection.execute(f"TRUNCATE {cls.STAGE_TABLE}")
+                    size = sizer.observe(len(batch), time.perf_counter() - started)
+        finally:
+            if owned and pool is not None:
+                await pool.release(connection)
+            elif owned:
+                await connection.close()
+
+        return {"affected_rows": affected, "affected_columns": insert_columns, **sizer.metrics()}
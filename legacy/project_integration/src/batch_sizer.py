@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import sys
+from typing import Any, Dict, List
+
+
+class BatchSizer:
+    """
+    Подбирает размер батча для insert'а.
+
+    Стартовый размер считается из средней ширины строки и потолка памяти на батч,
+    дальше размер подстраивается под целевую длительность батча по фактической
+    скорости (rows/s) предыдущего батча. Рост/падение за шаг ограничены,
+    чтобы один медленный батч не обрушил размер.
+
+    batch_size:
+        - 'auto' -> адаптивный режим
+        - int    -> фиксированный размер (история всё равно пишется)
+    """
+
+    def __init__(
+        self,
+        batch_size: int | str = "auto",
+        *,
+        target_seconds: float = 2.0,
+        memory_limit_bytes: int = 256 * 1024 * 1024,
+        min_size: int = 1000,
+        max_size: int = 200000,
+        max_step: float = 2.0,
+        sample_rows: int = 200,
+    ) -> None:
+        if batch_size != "auto" and (not isinstance(batch_size, int) or batch_size <= 0):
+            raise ValueError(f"batch_size must be positive int or 'auto', got {batch_size!r}")
+
+        self.auto = batch_size == "auto"
+        self.fixed_size = batch_size if not self.auto else None
+        self.target_seconds = target_seconds
+        self.memory_limit_bytes = memory_limit_bytes
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_step = max_step
+        self.sample_rows = sample_rows
+
+        self.row_bytes: int | None = None
+        self.memory_cap: int = max_size
+        self.history: List[Dict[str, Any]] = []
+        self._next: int | None = None
+
+    @staticmethod
+    def estimate_row_bytes(data: List[dict], sample_rows: int = 200) -> int:
+        """Средний размер строки (dict + значения) по равномерной выборке."""
+        if not data:
+            return 0
+        step = max(1, len(data) // sample_rows)
+        sample = data[::step][:sample_rows]
+        total = 0
+        for row in sample:
+            total += sys.getsizeof(row)
+            for v in row.values():
+                total += sys.getsizeof(v)
+        return max(1, total // len(sample))
+
+    def start(self, data: List[dict]) -> int:
+        """Первый размер батча для data."""
+        if not self.auto:
+            self._next = self.fixed_size
+            return self._next
+
+        self.row_bytes = self.estimate_row_bytes(data, self.sample_rows)
+        self.memory_cap = max(self.min_size, min(self.max_size, self.memory_limit_bytes // self.row_bytes))
+        # первый батч — осторожный: четверть потолка, но не меньше min_size
+        self._next = max(self.min_size, self.memory_cap // 4)
+        return self._next
+
+    def observe(self, rows: int, seconds: float) -> int:
+        """Записывает результат батча и возвращает размер следующего."""
+        self.history.append({"size": rows, "seconds": round(seconds, 4)})
+
+        if not self.auto or rows <= 0:
+            return self._next
+
+        current = self._next or rows
+        if seconds <= 0:
+            proposed = current * self.max_step
+        else:
+            proposed = rows / seconds * self.target_seconds
+
+        proposed = min(proposed, current * self.max_step)
+        proposed = max(proposed, current / self.max_step)
+        self._next = int(max(self.min_size, min(self.memory_cap, proposed)))
+        return self._next
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "batch_mode": "auto" if self.auto else "fixed",
+            "row_bytes": self.row_bytes,
+            "batch_sizes": [h["size"] for h in self.history],
+            "batches": self.history,
+        }
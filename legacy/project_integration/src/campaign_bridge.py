@@ -0,0 +1,241 @@
+"""
+Связка кампаний Keitaro и AppsFlyer по дням (sql/campaign_bridge.sql).
+
+Имена кампаний с обеих сторон приводятся к общему ключу campaign_key() в Python
+(с мемоизацией — имён мало, строк много), пары (источник, имя) -> ключ пишутся
+в campaign_key_map. После каждой загрузки (AppsFlyer — IntegrationService,
+Keitaro — KeitaroDedupWriter) затронутые (ключ, день) пересчитываются в
+campaign_day_bridge из appsflyer и keitaro_clicks_daily, так что воронка
+клик -> инсталл читается из готовой таблицы, без join'ов по тексту.
+
+Работает и с SQLAlchemy Connection, и с psycopg2-соединением: SQL в формате драйвера (%(name)s).
+Для asyncpg — refresh_bridge_async: тот же SQL с плейсхолдерами $1, $2, ...
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .teams import TEAM_SEPARATORS
+
+KEITARO = "keitaro"
+APPSFLYER = "appsflyer"
+
+# разделители команды (src/teams.py) плюс точка
+_SEPARATORS = re.compile(rf"[{TEAM_SEPARATORS}.]+")
+
+_REGISTER_SQL = """
+INSERT INTO campaign_key_map (source, campaign, campaign_key)
+SELECT * FROM unnest(%(sources)s::text[], %(campaigns)s::text[], %(keys)s::text[])
+ON CONFLICT (source, campaign) DO UPDATE SET campaign_key = EXCLUDED.campaign_key
+    WHERE campaign_key_map.campaign_key IS DISTINCT FROM EXCLUDED.campaign_key
+"""
+
+_REFRESH_SQL = """
+WITH k AS (
+    SELECT DISTINCT campaign_key, day
+    FROM unnest(%(keys)s::text[], %(days)s::date[]) AS k(campaign_key, day)
+),
+kt AS (
+    SELECT m.campaign_key, d.day,
+           sum(d.clicks) AS clicks, sum(d.unique_clicks) AS unique_clicks,
+           sum(d.leads) AS leads, sum(d.sales) AS sales
+    FROM keitaro_clicks_daily d
+             JOIN campaign_key_map m ON m.source = 'keitaro' AND m.campaign = d.campaign
+             JOIN k ON k.campaign_key = m.campaign_key AND k.day = d.day
+    GROUP BY 1, 2
+),
+af AS (
+    SELECT m.campaign_key, k.day,
+           sum(a.impressions) AS impressions, sum(a.clicks) AS clicks, sum(a.installs) AS installs,
+           sum(a.total_cost) AS cost, sum(a.total_revenue) AS revenue
+    FROM {appsflyer_table} a
+             JOIN campaign_key_map m ON m.source = 'appsflyer' AND m.campaign = a.campaign
+             JOIN k ON k.campaign_key = m.campaign_key AND a.date >= k.day AND a.date < k.day + 1
+    GROUP BY 1, 2
+)
+INSERT INTO campaign_day_bridge AS b
+    (campaign_key, day, keitaro_clicks, keitaro_unique_clicks, keitaro_leads, keitaro_sales,
+     af_impressions, af_clicks, af_installs, af_cost, af_revenue)
+SELECT k.campaign_key, k.day,
+       coalesce(kt.clicks, 0), coalesce(kt.unique_clicks, 0), coalesce(kt.leads, 0), coalesce(kt.sales, 0),
+       coalesce(af.impressions, 0), coalesce(af.clicks, 0), coalesce(af.installs, 0),
+       coalesce(af.cost, 0), coalesce(af.revenue, 0)
+FROM k
+         LEFT JOIN kt ON kt.campaign_key = k.campaign_key AND kt.day = k.day
+         LEFT JOIN af ON af.campaign_key = k.campaign_key AND af.day = k.day
+ON CONFLICT (campaign_key, day) DO UPDATE
+    SET keitaro_clicks        = EXCLUDED.keitaro_clicks,
+        keitaro_unique_clicks = EXCLUDED.keitaro_unique_clicks,
+        keitaro_leads         = EXCLUDED.keitaro_leads,
+        keitaro_sales         = EXCLUDED.keitaro_sales,
+        af_impressions        = EXCLUDED.af_impressions,
+        af_clicks             = EXCLUDED.af_clicks,
+        af_installs           = EXCLUDED.af_installs,
+        af_cost               = EXCLUDED.af_cost,
+        af_revenue            = EXCLUDED.af_revenue,
+        updated_at            = now()
+"""
+
+_FUNNEL_SQL = """
+SELECT *
+FROM campaign_funnel_daily
+WHERE day BETWEEN %(date_from)s AND %(date_to)s
+  AND (%(campaign_key)s::text IS NULL OR campaign_key = %(campaign_key)s)
+ORDER BY day, campaign_key
+"""
+
+@lru_cache(maxsize=100_000)
+def campaign_key(name: Optional[str]) -> Optional[str]:
+    """'Alpha | iOS-US (v2)' и 'alpha_ios_us_v2' -> 'alpha_ios_us_v2'."""
+    if name is None:
+        return None
+    key = unicodedata.normalize("NFKC", str(name)).strip().lower()
+    key = _SEPARATORS.sub("_", key).strip("_")
+    return key or None
+
+
+def _execute(connection, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if hasattr(connection, "exec_driver_sql"):  # SQLAlchemy Connection
+        result = connection.exec_driver_sql(sql, params)
+        return [dict(r) for r in result.mappings()] if result.returns_rows else []
+    with connection.cursor() as cursor:  # psycopg2
+        cursor.execute(sql, params)
+        if cursor.description is None:
+            return []
+        columns = [c.name for c in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _day(value) -> Optional[date]:
+    if value is None or value != value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def touched_campaign_days(rows: Iterable[Tuple[Any, Any]]) -> Set[Tuple[str, str, date]]:
+    """(имя кампании, дата/время) -> {(имя, ключ, день)} без пустых."""
+    touched = set()
+    for name, when in rows:
+        key, day = campaign_key(name), _day(when)
+        if key and day:
+            touched.add((name, key, day))
+    return touched
+
+
+def _bridge_params(source: str, touched: Set[Tuple[str, str, date]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Параметры _REGISTER_SQL и _REFRESH_SQL по затронутым (имя, ключ, день)."""
+    names = sorted({(name, key) for name, key, _ in touched})
+    pairs = sorted({(key, day) for _, key, day in touched})
+    return (
+        {"sources": [source] * len(names), "campaigns": [n for n, _ in names], "keys": [k for _, k in names]},
+        {"keys": [k for k, _ in pairs], "days": [d for _, d in pairs]},
+    )
+
+
+def _asyncpg_sql(sql: str, params: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """%(name)s -> $1, $2, ... в порядке первого появления и значения в том же порядке."""
+    names: List[str] = []
+
+    def placeholder(match: "re.Match[str]") -> str:
+        if match.group(1) not in names:
+            names.append(match.group(1))
+        return f"${names.index(match.group(1)) + 1}"
+
+    sql = re.sub(r"%\((\w+)\)s", placeholder, sql)
+    return sql, [params[name] for name in names]
+
+
+def refresh_bridge(
+    connection,
+    source: str,
+    touched: Set[Tuple[str, str, date]],
+    appsflyer_table: str = "appsflyer",
+) -> int:
+    """
+    Регистрирует имена source в campaign_key_map и пересчитывает
+    campaign_day_bridge по затронутым (ключ, день). Commit — у вызывающего.
+    Имена пишутся каждый раз (уже известные ON CONFLICT пропускает): кэш в процессе
+    разошёлся бы с БД, если вызывающий откатит транзакцию.
+    """
+    if not touched:
+        return 0
+
+    register, refresh = _bridge_params(source, touched)
+    _execute(connection, _REGISTER_SQL, register)
+    _execute(connection, _REFRESH_SQL.format(appsflyer_table=appsflyer_table), refresh)
+    return len(refresh["keys"])
+
+
+async def refresh_bridge_async(
+    connection,
+    source: str,
+    touched: Set[Tuple[str, str, date]],
+    appsflyer_table: str = "appsflyer",
+) -> int:
+    """То же, что refresh_bridge, но для asyncpg-соединения (в транзакции вызывающего)."""
+    if not touched:
+        return 0
+
+    register, refresh = _bridge_params(source, touched)
+    for sql, params in (
+        (_REGISTER_SQL, register),
+        (_REFRESH_SQL.format(appsflyer_table=appsflyer_table), refresh),
+    ):
+        sql, args = _asyncpg_sql(sql, params)
+        await connection.execute(sql, *args)
+    return len(refresh["keys"])
+
+
+def funnel(connection, date_from: date, date_to: date, campaign: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Воронка клик Keitaro -> инсталл AppsFlyer по кампаниям и дням из campaign_funnel_daily."""
+    return _execute(
+        connection,
+        _FUNNEL_SQL,
+        {"date_from": date_from, "date_to": date_to, "campaign_key": campaign_key(campaign)},
+    )
+
+
+def rebuild_bridge(connection, appsflyer_table: str = "appsflyer") -> int:
+    """Первичное заполнение: все кампании и дни обеих сторон."""
+    touched = 0
+    for source, sql in (
+        (APPSFLYER, f"SELECT DISTINCT campaign, date::date AS day FROM {appsflyer_table}"),
+        (KEITARO, "SELECT DISTINCT campaign, day FROM keitaro_clicks_daily WHERE campaign IS NOT NULL"),
+    ):
+        rows = _execute(connection, sql, {})
+        touched += refresh_bridge(
+            connection, source, touched_campaign_days((r["campaign"], r["day"]) for r in rows), appsflyer_table
+        )
+    return touched
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .config import load_config
+    from .postgresql_adapter import PostgresqlAdapter
+
+    ap = argparse.ArgumentParser(description="Keitaro -> AppsFlyer campaign funnel")
+    ap.add_argument("--rebuild", action="store_true", help="пересчитать campaign_day_bridge целиком")
+    ap.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    ap.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    ap.add_argument("--campaign")
+    args = ap.parse_args()
+
+    cfg = load_config()
+    engine = PostgresqlAdapter.get_engine(cfg.destination_uri)
+    with engine.begin() as conn:
+        if args.rebuild:
+            print(f"[BRIDGE] rebuilt {rebuild_bridge(conn, cfg.destination_table)} (campaign, day) keys")
+        if args.date_from and args.date_to:
+            for row in funnel(conn, args.date_from, args.date_to, args.campaign):
+                print(row)
+    engine.dispose()
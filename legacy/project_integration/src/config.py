@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 import json
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -25,6 +25,12 @@ class Config:
     retargeting: str
     destination_table: str
     destination_uri: str
+    async_writer: bool = False
+    insert_parallel: int = 1
+    # None — шарды коммитятся независимо; 'atomic' — двухфазный коммит (max_prepared_transactions > 0)
+    insert_mode: Optional[str] = None
+    refresh_rollups: bool = False
+    campaign_bridge: bool = False
 
 
 def load_config(path: Path = CONFIG_PATH) -> Config:
@@ -47,4 +53,9 @@ def load_config(path: Path = CONFIG_PATH) -> Config:
         retargeting=raw.get("retargeting", "false"),
         destination_table=raw["destination_table"],
         destination_uri=raw["destination_uri"],
+        async_writer=raw.get("async_writer", False),
+        insert_parallel=raw.get("insert_parallel", 1),
+        insert_mode=raw.get("insert_mode"),
+        refresh_rollups=raw.get("refresh_rollups", False),
+        campaign_bridge=raw.get("campaign_bridge", False),
     )
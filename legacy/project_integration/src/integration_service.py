@@ -1,12 +1,16 @@
 # integration_service.py
 from __future__ import annotations
 
+import asyncio
 from typing import Any, Dict, List
 
-from .config import Config
+from .config import AppConfig, Config
 from .appsflyer_client import AppsFlyerClient
 from .postgresql_adapter import PostgresqlAdapter
+from .async_postgresql_adapter import AsyncPostgresqlAdapter
 from .models import AppsFlyerRecord
+from .rollups import refresh_rollups, refresh_rollups_async, touched_keys
+from .campaign_bridge import APPSFLYER, refresh_bridge, refresh_bridge_async, touched_campaign_days
 
 # Маппинг "как в CSV" -> "как в таблице Postgres"
 COLUMN_RENAME_MAP: Dict[str, str] = {
@@ -75,6 +79,15 @@ class IntegrationService:
     def __init__(self, config: Config, client: AppsFlyerClient) -> None:
         self._config = config
         self._client = client
+        # результаты insert'ов за прогон (affected_rows, batch_sizes, ...)
+        self.metrics: List[Dict[str, Any]] = []
+
+    def _log_insert_metrics(self, result: Dict[str, Any]) -> None:
+        self.metrics.append(result)
+        print(
+            f"  affected={result.get('affected_rows')} "
+            f"row_bytes={result.get('row_bytes')} batch_sizes={result.get('batch_sizes')}"
+        )
 
     def _insert_to_db(self, data: List[Dict[str, Any]]) -> None:
         if not data:
@@ -82,12 +95,40 @@ class IntegrationService:
             return
 
         print(f"Insert {len(data)} rows into {self._config.destination_table}")
-        PostgresqlAdapter.insert(
+        result = PostgresqlAdapter.insert(
             data=data,
             destination_table=self._config.destination_table,
             destination_uri=self._config.destination_uri,
             on_duplicate="update",
+            # длинные периоды одного приложения режем по месяцам на insert_parallel соединений
+            parallel=self._config.insert_parallel,
+            shard_by="month",
+            mode=self._config.insert_mode,
         )
+        self._log_insert_metrics(result)
+        self._refresh_rollups(data)
+        self._refresh_campaign_bridge(data)
+
+    def _refresh_rollups(self, data: List[Dict[str, Any]]) -> None:
+        """Пересчитывает предагрегаты (sql/rollups.sql) только по записанным (app_id, day)."""
+        if not self._config.refresh_rollups:
+            return
+        engine = PostgresqlAdapter.get_engine(self._config.destination_uri)
+        with engine.begin() as connection:
+            n = refresh_rollups(connection, touched_keys(data), source=self._config.destination_table)
+        engine.dispose()
+        print(f"  rollups refreshed for {n} (app, day) keys")
+
+    def _refresh_campaign_bridge(self, data: List[Dict[str, Any]]) -> None:
+        """Пересчитывает связку с Keitaro (sql/campaign_bridge.sql) по записанным (кампания, день)."""
+        if not self._config.campaign_bridge:
+            return
+        touched = touched_campaign_days((row.get("campaign"), row.get("date")) for row in data)
+        engine = PostgresqlAdapter.get_engine(self._config.destination_uri)
+        with engine.begin() as connection:
+            n = refresh_bridge(connection, APPSFLYER, touched, appsflyer_table=self._config.destination_table)
+        engine.dispose()
+        print(f"  campaign bridge refreshed for {n} (campaign, day) keys")
 
     def run(self) -> None:
         """
@@ -108,4 +149,74 @@ class IntegrationService:
                     print("  ERROR:", repr(e))
 
                 all_rows = normalize_rows(all_rows)
-                self._insert_to_db(all_rows)
\ No newline at end of file
+                self._insert_to_db(all_rows)
+
+    # ---------- async-пайплайн ----------
+
+    async def _insert_to_db_async(self, pool, data: List[Dict[str, Any]]) -> None:
+        if not data:
+            print("No rows to insert")
+            return
+
+        print(f"Insert {len(data)} rows into {self._config.destination_table} (async)")
+        # upsert, предагрегаты и связка кампаний — одна транзакция на одном соединении:
+        # после сбоя не остаётся записанных строк с непересчитанными rollups/bridge
+        async with pool.acquire() as connection:
+            async with connection.transaction():
+                result = await AsyncPostgresqlAdapter.insert(
+                    data=data,
+                    destination_table=self._config.destination_table,
+                    connection=connection,
+                    on_duplicate="update",
+                )
+                if self._config.refresh_rollups:
+                    n_rollups = await refresh_rollups_async(
+                        connection, touched_keys(data), source=self._config.destination_table
+                    )
+                if self._config.campaign_bridge:
+                    touched = touched_campaign_days((row.get("campaign"), row.get("date")) for row in data)
+                    n_bridge = await refresh_bridge_async(
+                        connection, APPSFLYER, touched, appsflyer_table=self._config.destination_table
+                    )
+
+        self._log_insert_metrics(result)
+        if self._config.refresh_rollups:
+            print(f"  rollups refreshed for {n_rollups} (app, day) keys")
+        if self._config.campaign_bridge:
+            print(f"  campaign bridge refreshed for {n_bridge} (campaign, day) keys")
+
+    async def _process_app_async(
+        self, pool, semaphore: asyncio.Semaphore, idx: int, app: AppConfig, report_type: str
+    ) -> None:
+        rows: List[Dict[str, Any]] = []
+        async with semaphore:
+            print(f"[{idx}/{len(self._config.apps)}] {app.name} ({app.id})")
+            try:
+                # HTTP-клиент синхронный (requests), поэтому только он уходит в поток;
+                # запись в БД идёт прямо в event loop через asyncpg
+                rows = await asyncio.to_thread(self._client.fetch_agg_report, app, report_type)
+                print(f"  +{len(rows)} rows ({app.id})")
+            except Exception as e:
+                print(f"  ERROR ({app.id}):", repr(e))
+
+        await self._insert_to_db_async(pool, normalize_rows(rows))
+
+    async def run_async(self, concurrency: int = 4) -> None:
+        """
+        То же, что run(), но приложения качаются параллельно (до concurrency штук),
+        а вставка в БД идёт через AsyncPostgresqlAdapter, не блокируя скачивание остальных.
+        Ключи разных приложений не пересекаются (app_id в unique), поэтому upsert'ы не конфликтуют.
+        """
+        pool = await AsyncPostgresqlAdapter.create_pool(self._config.destination_uri)
+        semaphore = asyncio.Semaphore(concurrency)
+        try:
+            for report_type in self._config.agg_report_types:
+                print(f"\n=== AGG {report_type} (async) ===")
+                await asyncio.gather(
+                    *(
+                        self._process_app_async(pool, semaphore, idx, app, report_type)
+                        for idx, app in enumerate(self._config.apps, 1)
+                    )
+                )
+        finally:
+            await pool.close()
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List
+
+from jinja2 import Template
+from sqlalchemy import text
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "sql" / "migrations"
+
+
+def apply_migrations(connection, table: str = "appsflyer", migrations_dir: Path = MIGRATIONS_DIR) -> List[str]:
+    """
+    Применяет sql/migrations/*.sql по порядку имён, каждую ровно один раз.
+    Файлы — шаблоны jinja2: {{ table }} -> сырая таблица AppsFlyer (destination_table).
+    Применённые записываются в schema_migrations (в текущем search_path).
+    connection — SQLAlchemy Connection внутри транзакции. Возвращает применённые сейчас.
+    """
+    connection.execute(
+        text(
+            "create table if not exists schema_migrations ("
+            " name text primary key,"
+            " applied_at timestamp not null default now())"
+        )
+    )
+    done = {row.name for row in connection.execute(text("select name from schema_migrations"))}
+
+    applied: List[str] = []
+    for path in sorted(migrations_dir.glob("*.sql")):
+        if path.name in done:
+            continue
+        connection.exec_driver_sql(Template(path.read_text(encoding="utf-8")).render(table=table))
+        connection.execute(text("insert into schema_migrations (name) values (:name)"), {"name": path.name})
+        applied.append(path.name)
+        print(f"[MIGRATION] applied {path.name}")
+
+    return applied
+
+
+if __name__ == "__main__":
+    from .config import load_config
+    from .postgresql_adapter import PostgresqlAdapter
+
+    cfg = load_config()
+    engine = PostgresqlAdapter.get_engine(cfg.destination_uri)
+    with engine.begin() as conn:
+        apply_migrations(conn, cfg.destination_table)
+    engine.dispose()
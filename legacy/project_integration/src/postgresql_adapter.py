@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import logging
-from datetime import timedelta
-from typing import Generator, List, Union
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Generator, List, Union
 
 from sqlalchemy import create_engine, text, Table, MetaData, inspect, select, func
 from sqlalchemy.dialects.postgresql import insert
@@ -10,6 +12,8 @@ from sqlalchemy.dialects.postgresql import insert
 # from sqlalchemy.schema import AddConstraint, DropConstraint
 from jinja2 import Template
 
+from .batch_sizer import BatchSizer
+
 
 # noinspection PyUnusedLocal
 class PostgresqlAdapter:
@@ -18,10 +22,10 @@ class PostgresqlAdapter:
     """
 
     @classmethod
-    def get_engine(cls, uri):
+    def get_engine(cls, uri, **engine_kwargs):
         uri = uri.replace('postgres://', 'postgresql://')
         engine = create_engine(uri, connect_args={'connect_timeout': 1800}, json_serializer=lambda x: x,
-                               hide_parameters=True)
+                               hide_parameters=True, **engine_kwargs)
         # By default, SQLAlchemy will automatically cll json.dumps on values assigned to a JSON or JSONB column, so it
         # isn't necessary to call it yourself - in fact this will lead to double-encoded values as seen in the question.
 
@@ -35,6 +39,257 @@ class PostgresqlAdapter:
 
         return engine
 
+    @classmethod
+    def _reflect_table(cls, connection, destination_table: str, on_duplicate: str | None):
+        """
+        Читает таблицу и возвращает (table_object, автоинкрементные колонки, имя constraint'а).
+        """
+        metadata = MetaData()
+        table_object = Table(destination_table, metadata, autoload_with=connection)
+        inspector = inspect(connection)
+
+        # autoincrement / PK / уникальный constraint
+        columns_data = inspector.get_columns(destination_table)
+        autoincrement_columns = [c["name"] for c in columns_data if c.get("autoincrement")]
+
+        ucs = inspector.get_unique_constraints(destination_table)
+        unique_constraint_name = ucs[0]["name"] if ucs else None
+
+        pk = inspector.get_pk_constraint(destination_table)
+        primary_constraint_name = pk.get("name")
+
+        constraint_name = unique_constraint_name or primary_constraint_name
+
+        if not constraint_name and on_duplicate in ("update", "partial_update", "ignore"):
+            raise ValueError(
+                "No unique or primary key constraint found, but on_duplicate requires a constraint"
+            )
+
+        return table_object, autoincrement_columns, constraint_name
+
+    @classmethod
+    def _insert_batches(
+        cls,
+        connection,
+        data: list[dict],
+        *,
+        table_object: Table,
+        insert_columns: list[str],
+        constraint_name: str | None,
+        on_duplicate: str | None,
+        sizer: BatchSizer,
+    ) -> int:
+        """Пишет data батчами в уже открытой транзакции, возвращает affected rows."""
+        affected = 0
+        size = sizer.start(data)
+        offset = 0
+        while offset < len(data):
+            batch = data[offset : offset + size]
+            offset += len(batch)
+            started = time.perf_counter()
+
+            # нормализуем батч: только нужные колонки
+            batch_rows: list[dict] = []
+            for row in batch:
+                # выкидываем колонки, которых нет в insert_columns
+                normalized_row = {col: row.get(col) for col in insert_columns}
+                batch_rows.append(normalized_row)
+
+            # строим INSERT без .values(...)
+            stmt = insert(table_object)
+
+            if on_duplicate == "update":
+                # обновляем все вставляемые колонки (кроме автогенерируемых)
+                update_fields = {col: stmt.excluded[col] for col in insert_columns}
+                stmt = stmt.on_conflict_do_update(
+                    constraint=constraint_name,
+                    set_=update_fields,
+                )
+            elif on_duplicate == "ignore":
+                stmt = stmt.on_conflict_do_nothing()
+            elif on_duplicate in ("no_check", None):
+                # обычный insert, без on_conflict
+                pass
+            else:
+                raise ValueError(f"Unsupported on_duplicate mode: {on_duplicate}")
+
+            # executemany: SQLAlchemy сам создаёт bind-параметры под dict
+            result = connection.execute(stmt, batch_rows)
+            if result.rowcount is not None:
+                affected += result.rowcount
+
+            size = sizer.observe(len(batch), time.perf_counter() - started)
+
+        return affected
+
+    @staticmethod
+    def _shard_key(row: dict, shard_by: str):
+        if shard_by == "app_id":
+            return row.get("app_id")
+        if shard_by == "month":
+            value = row.get("date")
+            if isinstance(value, str):
+                return value[:7]
+            if isinstance(value, datetime):
+                return value.strftime("%Y-%m")
+            return value
+        raise ValueError(f"Unsupported shard_by: {shard_by}")
+
+    @classmethod
+    def _split_shards(cls, data: list[dict], shard_by: str, parallel: int) -> list[list[dict]]:
+        """
+        Делит data на не более чем parallel непересекающихся шардов.
+        Ключ шарда (месяц date или app_id) входит в unique (date, app_id, campaign, country),
+        поэтому одна и та же строка-ключ всегда попадает в один шард и соединения
+        не блокируют друг друга на unique-индексе.
+        Группы раскладываются жадно: самая большая — в самый лёгкий шард.
+        """
+        groups: Dict[Any, list[dict]] = {}
+        for row in data:
+            groups.setdefault(cls._shard_key(row, shard_by), []).append(row)
+
+        shards: list[list[dict]] = [[] for _ in range(min(parallel, len(groups)))]
+        for group in sorted(groups.values(), key=len, reverse=True):
+            min(shards, key=len).extend(group)
+        return shards
+
+    @classmethod
+    def _load_shard(
+        cls,
+        engine,
+        shard: list[dict],
+        *,
+        schema_name: str | None,
+        atomic: bool,
+        sizer: BatchSizer,
+        **insert_kwargs,
+    ):
+        """
+        Пишет один шард в своём соединении.
+        atomic: транзакция двухфазная и только PREPARE'ится — решение о COMMIT
+        принимает _insert_parallel, когда все шарды готовы.
+        """
+        connection = engine.connect()
+        xact = connection.begin_twophase() if atomic else connection.begin()
+        try:
+            if schema_name:
+                connection.execute(text(f"SET LOCAL SEARCH_PATH = {schema_name}"))
+            affected = cls._insert_batches(connection, shard, sizer=sizer, **insert_kwargs)
+            if atomic:
+                xact.prepare()
+            else:
+                xact.commit()
+        except Exception:
+            xact.rollback()
+            connection.close()
+            raise
+
+        if not atomic:
+            connection.close()
+        return connection, xact, affected
+
+    @classmethod
+    def _insert_parallel(
+        cls,
+        data: list[dict],
+        *,
+        destination_table: str,
+        destination_uri: str,
+        schema_name: str | None,
+        on_duplicate: str | None,
+        mode: str | None,
+        batch_size: int | str,
+        parallel: int,
+        shard_by: str,
+        **kwargs,
+    ):
+        atomic = mode == "atomic"
+        shards = cls._split_shards(data, shard_by, parallel)
+        engine = cls.get_engine(destination_uri, pool_size=len(shards), max_overflow=0)
+
+        with engine.begin() as connection:
+            if schema_name:
+                connection.execute(text(f"SET LOCAL SEARCH_PATH = {schema_name}"))
+            table_object, autoincrement_columns, constraint_name = cls._reflect_table(
+                connection, destination_table, on_duplicate
+            )
+            if atomic and int(connection.execute(text("SHOW max_prepared_transactions")).scalar()) == 0:
+                # без prepared transactions PREPARE TRANSACTION упадёт на каждом шарде
+                logging.warning(
+                    "PostgresqlAdapter.insert: max_prepared_transactions = 0, "
+                    "mode='atomic' falls back to independent shard commits"
+                )
+                atomic = False
+
+        insert_columns = [c for c in data[0].keys() if c not in autoincrement_columns]
+        sizers = [
+            BatchSizer(
+                batch_size,
+                target_seconds=kwargs.get("batch_target_seconds", 2.0),
+                memory_limit_bytes=kwargs.get("batch_memory_limit_bytes", 256 * 1024 * 1024) // len(shards),
+            )
+            for _ in shards
+        ]
+
+        with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [
+                executor.submit(
+                    cls._load_shard,
+                    engine,
+                    shard,
+                    schema_name=schema_name,
+                    atomic=atomic,
+                    sizer=sizer,
+                    table_object=table_object,
+                    insert_columns=insert_columns,
+                    constraint_name=constraint_name,
+                    on_duplicate=on_duplicate,
+                )
+                for shard, sizer in zip(shards, sizers)
+            ]
+
+        prepared, errors = [], []
+        for future in futures:
+            try:
+                prepared.append(future.result())
+            except Exception as e:
+                errors.append(e)
+
+        affected = 0
+        try:
+            if atomic:
+                # все шарды в PREPARE: либо коммитим все, либо откатываем все
+                for connection, xact, shard_affected in prepared:
+                    if errors:
+                        xact.rollback()
+                    else:
+                        xact.commit()
+                        affected += shard_affected
+            else:
+                affected = sum(shard_affected for _, _, shard_affected in prepared)
+        finally:
+            for connection, _, _ in prepared:
+                connection.close()
+            engine.dispose()
+
+        if errors:
+            logging.error(
+                "PostgresqlAdapter.insert: %d of %d shards failed (%s)",
+                len(errors), len(shards), "rolled back" if atomic else "other shards committed",
+            )
+            raise errors[0]
+
+        metrics = [sizer.metrics() for sizer in sizers]
+        return {
+            "affected_rows": affected,
+            "affected_columns": insert_columns,
+            "shards": [len(shard) for shard in shards],
+            "batch_mode": metrics[0]["batch_mode"],
+            "row_bytes": metrics[0]["row_bytes"],
+            "batch_sizes": [m["batch_sizes"] for m in metrics],
+            "batches": [m["batches"] for m in metrics],
+        }
+
     @classmethod
     def insert(
         cls,
@@ -45,91 +300,234 @@ class PostgresqlAdapter:
         schema_name: str | None = None,
         on_duplicate: str | None = None,
         mode: str | None = None,
-        batch_size: int = 80000,
+        batch_size: int | str = "auto",
+        parallel: int = 1,
+        shard_by: str | None = None,
         **kwargs,
     ):
         """
         Универсальный insert с поддержкой батчей и on_duplicate.
         data: список dict (ключи = имена колонок в таблице).
+        batch_size: int или 'auto' (см. BatchSizer; доп. параметры — batch_target_seconds,
+            batch_memory_limit_bytes). Выбранные размеры возвращаются в 'batch_sizes'.
         on_duplicate:
             - None / 'no_check'  -> обычный INSERT, пусть БД сама ругается на дубликаты
             - 'ignore'           -> ON CONFLICT DO NOTHING
             - 'update'           -> ON CONFLICT DO UPDATE SET ... = EXCLUDED....
+        parallel / shard_by:
+            parallel > 1 и shard_by ('month' | 'app_id') -> data делится на непересекающиеся
+            шарды, которые пишутся параллельно в parallel соединениях.
+        mode:
+            - 'atomic' -> при parallel всё-или-ничего через двухфазный коммит
+              (нужен max_prepared_transactions > 0 на сервере; при 0 — как None, с предупреждением)
+            - None     -> каждый шард коммитится сам по себе
         """
         if not data:
             logging.info("PostgresqlAdapter.insert: no data to insert")
             return {"affected_rows": 0, "affected_columns": []}
 
+        if parallel > 1 and shard_by:
+            return cls._insert_parallel(
+                data,
+                destination_table=destination_table,
+                destination_uri=destination_uri,
+                schema_name=schema_name,
+                on_duplicate=on_duplicate,
+                mode=mode,
+                batch_size=batch_size,
+                parallel=parallel,
+                shard_by=shard_by,
+                **kwargs,
+            )
+
+        sizer = BatchSizer(
+            batch_size,
+            target_seconds=kwargs.get("batch_target_seconds", 2.0),
+            memory_limit_bytes=kwargs.get("batch_memory_limit_bytes", 256 * 1024 * 1024),
+        )
         engine = cls.get_engine(destination_uri)
-        affected = 0
-        columns_list: list[str] = []
 
         with engine.begin() as connection:
             # schema / search_path
             if schema_name:
                 connection.execute(text(f"SET LOCAL SEARCH_PATH = {schema_name}"))
 
-            metadata = MetaData()
-            table_object = Table(destination_table, metadata, autoload_with=connection)
-            inspector = inspect(connection)
+            table_object, autoincrement_columns, constraint_name = cls._reflect_table(
+                connection, destination_table, on_duplicate
+            )
 
-            # autoincrement / PK / уникальный constraint
-            columns_data = inspector.get_columns(destination_table)
-            autoincrement_columns = [c["name"] for c in columns_data if c.get("autoincrement")]
+            # полное множество колонок, которые реально передаём (без автоинкремента)
+            all_keys = list(data[0].keys())
+            insert_columns = [c for c in all_keys if c not in autoincrement_columns]
 
-            ucs = inspector.get_unique_constraints(destination_table)
-            unique_constraint_name = ucs[0]["name"] if ucs else None
+            affected = cls._insert_batches(
+                connection,
+                data,
+                table_object=table_object,
+                insert_columns=insert_columns,
+                constraint_name=constraint_name,
+                on_duplicate=on_duplicate,
+                sizer=sizer,
+            )
 
-            pk = inspector.get_pk_constraint(destination_table)
-            primary_constraint_name = pk.get("name")
-            pk_columns = pk.get("constrained_columns") or []
+        engine.dispose()
+        return {"affected_rows": affected, "affected_columns": insert_columns, **sizer.metrics()}
 
-            constraint_name = unique_constraint_name or primary_constraint_name
+    # ---------- extract ----------
 
-            if not constraint_name and on_duplicate in ("update", "partial_update", "ignore"):
-                raise ValueError(
-                    "No unique or primary key constraint found, but on_duplicate requires a constraint"
-                )
+    # OID типа Postgres -> имя типа pyarrow (для записи в parquet / arrow)
+    _ARROW_TYPES = {
+        16: "bool_",
+        20: "int64",
+        21: "int16",
+        23: "int32",
+        700: "float32",
+        701: "float64",
+        1700: "float64",  # numeric -> float64, Decimal приводим к float
+        25: "string",
+        1043: "string",
+        19: "string",
+        1082: "date32",
+        1114: "timestamp",
+        1184: "timestamptz",
+    }
 
-            # полное множество колонок, которые реально передаём (без автоинкремента)
-            all_keys = list(data[0].keys())
-            insert_columns = [c for c in all_keys if c not in autoincrement_columns]
-            columns_list = insert_columns
-
-            for i in range(0, len(data), batch_size):
-                batch = data[i : i + batch_size]
-                if not batch:
-                    continue
-
-                # нормализуем батч: только нужные колонки
-                batch_rows: list[dict] = []
-                for row in batch:
-                    # выкидываем колонки, которых нет в insert_columns
-                    normalized_row = {col: row.get(col) for col in insert_columns}
-                    batch_rows.append(normalized_row)
-
-                # строим INSERT без .values(...)
-                stmt = insert(table_object)
-
-                if on_duplicate == "update":
-                    # обновляем все вставляемые колонки (кроме автогенерируемых)
-                    update_fields = {col: stmt.excluded[col] for col in insert_columns}
-                    stmt = stmt.on_conflict_do_update(
-                        constraint=constraint_name,
-                        set_=update_fields,
-                    )
-                elif on_duplicate == "ignore":
-                    stmt = stmt.on_conflict_do_nothing()
-                elif on_duplicate in ("no_check", None):
-                    # обычный insert, без on_conflict
-                    pass
-                else:
-                    raise ValueError(f"Unsupported on_duplicate mode: {on_duplicate}")
-
-                # executemany: SQLAlchemy сам создаёт bind-параметры под dict
-                result = connection.execute(stmt, batch_rows)
-                if result.rowcount is not None:
-                    affected += result.rowcount
+    @classmethod
+    def _iter_partitions(
+        cls,
+        *,
+        uri: str,
+        query: str,
+        params: dict | None = None,
+        fetch_size: int = 10000,
+    ) -> Generator[tuple, None, None]:
+        """
+        Выполняет query через server-side (named) курсор и отдаёт
+        (columns, description, rows) пачками по fetch_size строк.
+        В памяти одновременно не больше одной пачки.
+        """
+        engine = cls.get_engine(uri)
+        try:
+            with engine.connect() as connection:
+                # stream_results=True -> psycopg2 открывает именованный курсор на сервере
+                result = connection.execution_options(
+                    stream_results=True, max_row_buffer=fetch_size
+                ).execute(text(query), params or {})
+                columns = list(result.keys())
+                for partition in result.partitions(fetch_size):
+                    # у именованного курсора description заполняется только после первого fetch
+                    yield columns, result.cursor.description, partition
+        finally:
+            engine.dispose()
 
-        engine.dispose()
-        return {"affected_rows": affected, "affected_columns": columns_list}
+    @classmethod
+    def extract(
+        cls,
+        *,
+        uri: str,
+        query: str,
+        params: dict | None = None,
+        fetch_size: int = 10000,
+        as_dataframe: bool = False,
+        **kwargs,
+    ) -> Generator[Union[List[dict], Any], None, None]:
+        """
+        Потоковое чтение результата query.
+        Отдаёт пачки по fetch_size строк: list[dict] (как принимает insert)
+        или pandas.DataFrame при as_dataframe=True.
+        """
+        if as_dataframe:
+            import pandas as pd
+
+        for columns, _, rows in cls._iter_partitions(uri=uri, query=query, params=params, fetch_size=fetch_size):
+            if as_dataframe:
+                yield pd.DataFrame.from_records(rows, columns=columns)
+            else:
+                yield [dict(zip(columns, row)) for row in rows]
+
+    @classmethod
+    def _arrow_schema(cls, columns: list[str], description):
+        import pyarrow as pa
+
+        fields = []
+        for name, col in zip(columns, description):
+            type_name = cls._ARROW_TYPES.get(col[1], "string")
+            if type_name == "timestamp":
+                arrow_type = pa.timestamp("us")
+            elif type_name == "timestamptz":
+                arrow_type = pa.timestamp("us", tz="UTC")
+            else:
+                arrow_type = getattr(pa, type_name)()
+            fields.append(pa.field(name, arrow_type))
+        return pa.schema(fields)
+
+    @staticmethod
+    def _arrow_batch(schema, rows):
+        import pyarrow as pa
+
+        arrays = []
+        for idx, field in enumerate(schema):
+            values = [row[idx] for row in rows]
+            if pa.types.is_floating(field.type):
+                values = [float(v) if v is not None else None for v in values]
+            elif pa.types.is_string(field.type):
+                values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+            arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    @classmethod
+    def extract_to_file(
+        cls,
+        *,
+        uri: str,
+        query: str,
+        file_path,
+        file_format: str = "csv",
+        params: dict | None = None,
+        fetch_size: int = 50000,
+        compression: str = "zstd",
+    ) -> dict:
+        """
+        Выгружает результат query в файл без загрузки всего результата в память.
+        file_format: 'csv' | 'parquet' | 'arrow' (Arrow IPC file).
+        Возвращает {"rows": ..., "file_path": ...}.
+        """
+        if file_format not in ("csv", "parquet", "arrow"):
+            raise ValueError(f"Unsupported file_format: {file_format}")
+
+        partitions = cls._iter_partitions(uri=uri, query=query, params=params, fetch_size=fetch_size)
+        total = 0
+
+        if file_format == "csv":
+            import csv
+
+            with open(file_path, "w", encoding="utf-8", newline="") as f:
+                writer = None
+                for columns, _, rows in partitions:
+                    if writer is None:
+                        writer = csv.writer(f)
+                        writer.writerow(columns)
+                    writer.writerows(rows)
+                    total += len(rows)
+            return {"rows": total, "file_path": str(file_path)}
+
+        import pyarrow.ipc
+        import pyarrow.parquet as pq
+
+        writer = None
+        schema = None
+        try:
+            for columns, description, rows in partitions:
+                if writer is None:
+                    schema = cls._arrow_schema(columns, description)
+                    if file_format == "parquet":
+                        writer = pq.ParquetWriter(str(file_path), schema, compression=compression)
+                    else:
+                        writer = pyarrow.ipc.new_file(str(file_path), schema)
+                writer.write_batch(cls._arrow_batch(schema, rows))
+                total += len(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        return {"rows": total, "file_path": str(file_path)}
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Iterable, List, Set, Tuple
+
+from jinja2 import Template
+from sqlalchemy import text
+
+from .teams import UNATTRIBUTED, team_sql
+
+# Префикс команды = часть campaign до первого разделителя (src/teams.py)
+TEAM_EXPR = f"coalesce({team_sql('a.campaign')}, '{UNATTRIBUTED}')"
+
+# Затронутые ключи приходят двумя массивами одинаковой длины: app_ids[i], days[i].
+# Сначала удаляем агрегаты по ключам, затем пересчитываем их из сырой таблицы.
+_KEYS = "SELECT DISTINCT k.app_id, k.day FROM unnest({{ app_ids }}, {{ days }}) AS k(app_id, day)"
+_WEEKS = (
+    "SELECT DISTINCT k.app_id, date_trunc('week', k.day)::date AS week_start "
+    "FROM unnest({{ app_ids }}, {{ days }}) AS k(app_id, day)"
+)
+
+REFRESH_SQL: List[str] = [
+    # --- daily: app × media_source × country ---
+    """
+    DELETE FROM {{ source }}_daily_rollup r
+    USING (""" + _KEYS + """) k
+    WHERE r.app_id = k.app_id AND r.day = k.day
+    """,
+    """
+    INSERT INTO {{ source }}_daily_rollup AS r
+        (day, app_id, media_source, country, impressions, clicks, installs, sessions,
+         total_cost, total_revenue, purchases, rows_count)
+    SELECT a.date::date,
+           a.app_id,
+           coalesce(a.media_source, 'Organic'),
+           a.country,
+           coalesce(sum(a.impressions), 0),
+           coalesce(sum(a.clicks), 0),
+           coalesce(sum(a.installs), 0),
+           coalesce(sum(a.sessions), 0),
+           coalesce(sum(a.total_cost), 0),
+           coalesce(sum(a.total_revenue), 0),
+           coalesce(sum(a.af_purchase_event_counter), 0),
+           count(*)
+    FROM {{ source }} a
+             JOIN (""" + _KEYS + """) k
+                  ON a.app_id = k.app_id AND a.date >= k.day AND a.date < k.day + 1
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (app_id, day, media_source, country) DO UPDATE
+        SET impressions   = EXCLUDED.impressions,
+            clicks        = EXCLUDED.clicks,
+            installs      = EXCLUDED.installs,
+            sessions      = EXCLUDED.sessions,
+            total_cost    = EXCLUDED.total_cost,
+            total_revenue = EXCLUDED.total_revenue,
+            purchases     = EXCLUDED.purchases,
+            rows_count    = EXCLUDED.rows_count
+    """,
+    # --- weekly: app × команда (пересчитываем неделю целиком) ---
+    """
+    DELETE FROM {{ source }}_weekly_team_rollup r
+    USING (""" + _WEEKS + """) w
+    WHERE r.app_id = w.app_id AND r.week_start = w.week_start
+    """,
+    """
+    INSERT INTO {{ source }}_weekly_team_rollup AS r
+        (week_start, app_id, team, impressions, clicks, installs, total_cost, total_revenue, campaigns)
+    SELECT w.week_start,
+           a.app_id,
+           """ + TEAM_EXPR + """,
+           coalesce(sum(a.impressions), 0),
+           coalesce(sum(a.clicks), 0),
+           coalesce(sum(a.installs), 0),
+           coalesce(sum(a.total_cost), 0),
+           coalesce(sum(a.total_revenue), 0),
+           count(DISTINCT a.campaign)
+    FROM {{ source }} a
+             JOIN (""" + _WEEKS + """) w
+                  ON a.app_id = w.app_id AND a.date >= w.week_start AND a.date < w.week_start + 7
+    GROUP BY 1, 2, 3
+    ON CONFLICT (app_id, week_start, team) DO UPDATE
+        SET impressions   = EXCLUDED.impressions,
+            clicks        = EXCLUDED.clicks,
+            installs      = EXCLUDED.installs,
+            total_cost    = EXCLUDED.total_cost,
+            total_revenue = EXCLUDED.total_revenue,
+            campaigns     = EXCLUDED.campaigns
+    """,
+]
+
+# Полная пересборка: ключами становятся все (app_id, day) из сырой таблицы
+REBUILD_KEYS_SQL = "SELECT DISTINCT app_id, date::date AS day FROM {{ source }}"
+
+
+def touched_keys(data: Iterable[dict]) -> Set[Tuple[str, date]]:
+    """(app_id, day) строк, которые только что записали."""
+    keys: Set[Tuple[str, date]] = set()
+    for row in data:
+        app_id, value = row.get("app_id"), row.get("date")
+        if not app_id or value is None:
+            continue
+        if isinstance(value, datetime):
+            value = value.date()
+        elif isinstance(value, str):
+            value = date.fromisoformat(value[:10])
+        keys.add((app_id, value))
+    return keys
+
+
+def render_statements(source: str, style: str = "sqlalchemy") -> List[str]:
+    """
+    SQL обновления под конкретную сырую таблицу.
+    style: 'sqlalchemy' (:app_ids, :days) или 'asyncpg' ($1, $2).
+    """
+    if style == "sqlalchemy":
+        params = {"app_ids": "CAST(:app_ids AS text[])", "days": "CAST(:days AS date[])"}
+    elif style == "asyncpg":
+        params = {"app_ids": "$1::text[]", "days": "$2::date[]"}
+    else:
+        raise ValueError(f"Unsupported style: {style}")
+    return [Template(sql).render(source=source, **params) for sql in REFRESH_SQL]
+
+
+def _split_keys(keys: Iterable[Tuple[str, date]]) -> Tuple[List[str], List[date]]:
+    keys = sorted(keys)
+    return [k[0] for k in keys], [k[1] for k in keys]
+
+
+def refresh_rollups(connection, keys: Iterable[Tuple[str, date]], source: str = "appsflyer") -> int:
+    """
+    Пересчитывает предагрегаты только по затронутым (app_id, day).
+    connection — SQLAlchemy Connection внутри транзакции. Возвращает число ключей.
+    """
+    app_ids, days = _split_keys(keys)
+    if not app_ids:
+        return 0
+    for sql in render_statements(source):
+        connection.execute(text(sql), {"app_ids": app_ids, "days": days})
+    return len(app_ids)
+
+
+async def refresh_rollups_async(connection, keys: Iterable[Tuple[str, date]], source: str = "appsflyer") -> int:
+    """То же, что refresh_rollups, но для asyncpg-соединения."""
+    app_ids, days = _split_keys(keys)
+    if not app_ids:
+        return 0
+    async with connection.transaction():
+        for sql in render_statements(source, style="asyncpg"):
+            await connection.execute(sql, app_ids, days)
+    return len(app_ids)
+
+
+def rebuild_rollups(connection, source: str = "appsflyer") -> int:
+    """Полная пересборка предагрегатов (первичное заполнение)."""
+    rows = connection.execute(text(Template(REBUILD_KEYS_SQL).render(source=source))).all()
+    return refresh_rollups(connection, [(r.app_id, r.day) for r in rows], source=source)
@@ -0,0 +1,16 @@
+"""
+Команда кампании = префикс campaign до первого разделителя.
+
+Одно определение разделителей для Python и SQL: набор годится и для re,
+и для регулярок PostgreSQL (ARE). Из него строятся TEAM_EXPR агрегатов (rollups.py)
+и ключ кампании (campaign_bridge.py). sasha_folder/team_attribution.py держит тот же
+набор (скрипты от project_integration не зависят), совпадение проверяет его тест.
+"""
+
+TEAM_SEPARATORS = r"\s_\-|:/\[\]()"
+UNATTRIBUTED = "Unattributed"
+
+
+def team_sql(column: str) -> str:
+    """SQL-выражение префикса; campaign пустой или начинается с разделителя -> NULL."""
+    return f"substring(btrim({column}) from '^[^{TEAM_SEPARATORS}]+')"
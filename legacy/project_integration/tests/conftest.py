@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# тесты запускаются из любой папки, импорты — как у скриптов: from src..., from Keitaro...
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
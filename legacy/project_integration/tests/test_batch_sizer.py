@@ -0,0 +1,62 @@
+import pytest
+
+from src.batch_sizer import BatchSizer
+
+
+def rows(n, width=10):
+    return [{"id": i, "name": "x" * width} for i in range(n)]
+
+
+def test_fixed_size_is_kept_and_history_recorded():
+    sizer = BatchSizer(5000)
+    assert sizer.start(rows(10)) == 5000
+    assert sizer.observe(5000, 10.0) == 5000
+    assert sizer.observe(5000, 0.01) == 5000
+    assert sizer.metrics()["batch_mode"] == "fixed"
+    assert sizer.metrics()["batch_sizes"] == [5000, 5000]
+
+
+@pytest.mark.parametrize("bad", [0, -1, "10", 1.5])
+def test_invalid_batch_size(bad):
+    with pytest.raises(ValueError):
+        BatchSizer(bad)
+
+
+def test_start_is_quarter_of_memory_cap():
+    data = rows(100)
+    row_bytes = BatchSizer.estimate_row_bytes(data)
+    sizer = BatchSizer(memory_limit_bytes=row_bytes * 40_000, min_size=100, max_size=1_000_000)
+    assert sizer.start(data) == 10_000
+    assert sizer.memory_cap == 40_000
+
+
+def test_start_not_below_min_size():
+    sizer = BatchSizer(memory_limit_bytes=1, min_size=1000)
+    assert sizer.start(rows(10)) == 1000
+
+
+def test_observe_targets_duration_within_step_limits():
+    sizer = BatchSizer(target_seconds=2.0, min_size=10, max_size=1_000_000, max_step=2.0)
+    sizer.start(rows(10))
+    sizer._next = 1000
+    # 1000 строк за 1 с -> на 2 с нужно 2000, в пределах шага x2
+    assert sizer.observe(1000, 1.0) == 2000
+    # очень быстро: рост ограничен x2
+    assert sizer.observe(2000, 0.001) == 4000
+    # очень медленно: падение ограничено /2
+    assert sizer.observe(4000, 100.0) == 2000
+    # нулевая длительность — тоже только x2
+    assert sizer.observe(2000, 0.0) == 4000
+
+
+def test_observe_respects_memory_cap_and_min_size():
+    sizer = BatchSizer(min_size=500, max_size=3000, max_step=10.0)
+    sizer.start(rows(10))
+    sizer._next = 2000
+    assert sizer.observe(2000, 0.1) == sizer.memory_cap
+    sizer._next = 600
+    assert sizer.observe(600, 100.0) == 500
+
+
+def test_estimate_row_bytes_empty():
+    assert BatchSizer.estimate_row_bytes([]) == 0
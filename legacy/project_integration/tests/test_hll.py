@@ -0,0 +1,61 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from Keitaro.rollups import hll  # noqa: E402
+
+
+def sketch(values):
+    idx, rank = hll.hash_values(pd.Series(values))
+    return hll.add(hll.empty(), idx, rank)
+
+
+def ids(prefix, n, start=0):
+    return [f"{prefix}{i}" for i in range(start, start + n)]
+
+
+@pytest.mark.parametrize("n", [1, 100, 5_000, 200_000])
+def test_estimate_within_error(n):
+    # 4 стандартные ошибки (~3.2%) — с запасом для одного фиксированного набора
+    assert hll.estimate(sketch(ids("ip-", n))) == pytest.approx(n, rel=0.033)
+
+
+def test_empty_estimates_zero():
+    assert hll.estimate(hll.empty()) == 0
+
+
+def test_duplicates_do_not_change_sketch():
+    values = ids("s", 1000)
+    assert np.array_equal(sketch(values), sketch(values * 3))
+
+
+def test_merge_is_union():
+    a, b = ids("x", 30_000), ids("x", 30_000, start=20_000)  # пересечение 10 000
+    merged = hll.merge([sketch(a), sketch(b)])
+
+    assert np.array_equal(merged, sketch(a + b))
+    assert hll.estimate(merged) == pytest.approx(50_000, rel=0.033)
+    # порядок и повтор скетчей не важны
+    assert np.array_equal(merged, hll.merge([sketch(b), sketch(a), sketch(b)]))
+
+
+def test_group_registers_match_per_group_sketches():
+    values = pd.Series(ids("u", 3000))
+    groups = np.arange(3000) % 3
+    per_group = hll.group_registers(groups, values)
+
+    assert sorted(per_group) == [0, 1, 2]
+    for g, (idx, rank) in per_group.items():
+        expected = sketch(values[groups == g].tolist())
+        assert np.array_equal(hll.add(hll.empty(), idx, rank), expected)
+
+
+@pytest.mark.parametrize("n", [10, 50_000])
+def test_encode_decode_roundtrip(n):
+    registers = sketch(ids("r", n))
+    data = hll.encode(registers)
+
+    assert data[:1] == (b"S" if n == 10 else b"D")
+    assert np.array_equal(hll.decode(data), registers)
+    assert np.array_equal(hll.decode(memoryview(data)), registers)
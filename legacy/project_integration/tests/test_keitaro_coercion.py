@@ -0,0 +1,79 @@
+import csv
+import datetime as dt
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pydantic")
+
+from Keitaro.loaders.coercion import coerce_frame  # noqa: E402
+from Keitaro.loaders.csv_loader import CSV_COLUMNS_MAP, KeitaroCSVLoader  # noqa: E402
+from Keitaro.models.keitaro_record import KeitaroRecord  # noqa: E402
+
+FIELDS = list(KeitaroRecord.model_fields)
+
+# граничные значения, как в bench.keitaro_coercion: поле -> значения по строкам
+NOISY = {
+    "datetime": ["2025-11-01 10:00:00", "", "null", "2025-13-01 00:00:00", "2025-11-01", "2025-11-02 23:59:59"],
+    "is_bot": ["1", "", "NULL", "yes", "N", "maybe"],
+    "is_unique": ["true", "0", "False", "y", "no", ""],
+    "sale": ["0", "null", "1.5", " 2 ", "x", "-4"],
+    "lead": ["1", "", "3", "007", "NULL", "1e3"],
+    "stream_id": ["12", "", "-3", "7.0", "NULL", "5"],
+    "country": ["US", "", "N/A", "NA", "null", "DE"],
+    "sub_id_5": ["0042", "", "NULL", "123", "abc", "00"],
+    "subid": ["s1", "s2", "s3", "s4", "s5", "s6"],
+}
+
+
+def write_csv(path, columns):
+    n = len(next(iter(columns.values())))
+    headers = list(CSV_COLUMNS_MAP)
+    by_field = {field: csv_col for csv_col, field in CSV_COLUMNS_MAP.items()}
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, delimiter=";", quotechar='"')
+        w.writerow(headers)
+        for i in range(n):
+            row = {h: "" for h in headers}
+            for field, values in columns.items():
+                row[by_field[field]] = values[i]
+            w.writerow([row[h] for h in headers])
+
+
+def test_columnar_matches_model_row_by_row(tmp_path):
+    path = tmp_path / "keitaro.csv"
+    write_csv(path, NOISY)
+    loader = KeitaroCSVLoader(path, chunk_size=4)
+
+    records = [r for batch in loader.iter_batches() for r in batch]
+    frames = list(loader.iter_frames())
+
+    expected = [tuple(getattr(r, f) for f in FIELDS) for r in records]
+    actual = [row for frame in frames for row in frame[FIELDS].itertuples(index=False, name=None)]
+    assert actual == expected
+    assert loader.position == len(NOISY["subid"])
+
+
+def test_coerce_frame_values():
+    chunk = pd.DataFrame({k: v for k, v in NOISY.items()})
+    frame, rejected = coerce_frame(chunk)
+
+    assert not rejected.any()
+    assert list(frame.columns) == FIELDS
+    assert frame["datetime"].tolist()[:2] == [pd.Timestamp(dt.datetime(2025, 11, 1, 10)), None]
+    assert frame["datetime"].tolist()[3:5] == [None, None]
+    assert frame["is_bot"].tolist() == [True, None, None, True, False, None]
+    assert frame["sale"].tolist() == [0, None, None, 2, None, -4]
+    assert frame["stream_id"].tolist() == [12, None, -3, None, None, 5]
+    assert frame["country"].tolist() == ["US", None, None, None, None, "DE"]
+    # строковые поля не превращаются в числа
+    assert frame["sub_id_5"].tolist() == ["0042", None, None, "123", "abc", "00"]
+
+
+def test_non_string_in_string_field_is_rejected():
+    chunk = pd.DataFrame({"subid": ["a", 5, None], "campaign": ["x", "y", "z"]})
+    frame, rejected = coerce_frame(chunk)
+
+    assert rejected.tolist() == [False, True, False]
+    assert frame["subid"].tolist() == ["a", None]
+    assert frame["campaign"].tolist() == ["x", "z"]
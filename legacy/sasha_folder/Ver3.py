@@ -12,6 +12,8 @@ from typing import Dict, List, Tuple
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+
+from csv_merge import SpillMergeWriter
 # ===============================
 # Конфигурация (правь под себя)
 # ===============================
@@ -100,17 +102,10 @@ def _download_csv_bytes(app_id: str, report_type: str) -> bytes:
     raise Exception(f"HTTP {r.status_code}: {r.text[:500]}")
 
 def _parse_csv(content: bytes):
+    # строки отдаются итератором — список на всё приложение не собираем
     text = content.decode("utf-8-sig", errors="replace")
     reader = csv.DictReader(io.StringIO(text))
-    rows = [dict(row) for row in reader]
-    return reader.fieldnames or [], rows
-
-def _write_csv(path: Path, headers: List[str], rows: List[Dict[str, str]]) -> None:
-    with path.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=headers, extrasaction="ignore")
-        w.writeheader()
-        for r in rows:
-            w.writerow(r)
+    return reader.fieldnames or [], reader
 
 # ===============================
 # Основная логика
@@ -122,13 +117,18 @@ def main():
     last_call_ts: Dict[Tuple[str, str], float] = {}
 
     for report_type in AGG_REPORT_TYPES:
-        all_headers: List[str] = []
-        all_rows: List[Dict[str, str]] = []
+        # строки каждого приложения сразу уходят в свою часть на диске;
+        # после падения уже выгруженные приложения при перезапуске пропускаются
+        out = OUTPUT_DIR / f"{report_type}_{FROM_DATE}_{TO_DATE}_ALL.csv"
+        writer = SpillMergeWriter(out)
         print(f"\n=== AGG {report_type} ===")
 
         for idx, app in enumerate(apps, 1):
             app_id = app["id"]
             print(f"[{idx}/{len(apps)}] {app.get('name')} ({app_id})")
+            if writer.has_part(app_id):
+                print("  = уже выгружено в прошлый запуск")
+                continue
             try:
                 _rate_limit(last_call_ts, app_id, report_type)
                 content = _download_csv_bytes(app_id, report_type)
@@ -140,28 +140,20 @@ def main():
                 for c in extra:
                     if c not in merged:
                         merged.append(c)
-                for r in rows:
-                    r["app_id"] = app.get("id", "")
-                    r["app_name"] = app.get("name", "")
-                    r["app_platform"] = app.get("platform", "")
-                    r["report_type"] = report_type
-
-                # объединяем схему
-                if not all_headers:
-                    all_headers = merged
-                else:
-                    for h in merged:
-                        if h not in all_headers:
-                            all_headers.append(h)
-
-                all_rows.extend(rows)
-                print(f"  +{len(rows)} строк")
+                ids = {
+                    "app_id": app.get("id", ""),
+                    "app_name": app.get("name", ""),
+                    "app_platform": app.get("platform", ""),
+                    "report_type": report_type,
+                }
+
+                n = writer.add_part(app_id, merged, ({**r, **ids} for r in rows))
+                print(f"  +{n} строк")
             except Exception as e:
                 print(f"  ✗ ошибка: {e}")
 
-        if all_rows:
-            out = OUTPUT_DIR / f"{report_type}_{FROM_DATE}_{TO_DATE}_ALL.csv"
-            _write_csv(out, all_headers, all_rows)
+        # объединение схем и выравнивание колонок — при склейке частей
+        if writer.finish():
             print(f"✓ saved: {out.resolve()}")
         else:
             print("∅ данных для этого отчёта")
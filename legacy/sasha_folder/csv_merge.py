@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+csv_merge.py
+Зависимости: нет (stdlib)
+
+Сборка общего CSV из частей по приложениям без накопления строк в памяти.
+
+Каждая часть (строки одного приложения) сразу пишется в свой файл рядом с итоговым
+(<out>.parts/), со своим заголовком. Часть считается готовой только после атомарного
+rename и записи в _parts.txt, поэтому при падении посреди прогона готовые приложения
+остаются на диске, а повторный запуск может их пропустить (has_part).
+finish() объединяет схемы частей в порядке их появления и переписывает строки
+в итоговый файл с выравниванием колонок (отсутствующие -> пусто).
+"""
+
+import csv
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MANIFEST = "_parts.txt"
+
+
+def _safe(key: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in key)
+
+
+class SpillMergeWriter:
+    def __init__(self, out_path: Path, parts_dir: Optional[Path] = None):
+        self.out_path = Path(out_path)
+        self.parts_dir = Path(parts_dir) if parts_dir else self.out_path.with_name(self.out_path.name + ".parts")
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        self._parts: List[Tuple[str, int]] = self._read_manifest()
+
+    def _read_manifest(self) -> List[Tuple[str, int]]:
+        path = self.parts_dir / MANIFEST
+        if not path.exists():
+            return []
+        parts = []
+        for line in path.read_text(encoding="utf-8").splitlines():
+            key, _, rows = line.partition("\t")
+            if key and (self.parts_dir / f"{_safe(key)}.csv").exists():
+                # часть могли переписать — берём последнюю запись
+                parts = [(k, c) for k, c in parts if k != key] + [(key, int(rows or 0))]
+        return parts
+
+    def has_part(self, key: str) -> bool:
+        return any(k == key for k, _ in self._parts)
+
+    @property
+    def rows(self) -> int:
+        return sum(n for _, n in self._parts)
+
+    def add_part(self, key: str, headers: List[str], rows: Iterable[Dict[str, str]]) -> int:
+        """Пишет строки части на диск по мере поступления; возвращает их число."""
+        final = self.parts_dir / f"{_safe(key)}.csv"
+        tmp = final.with_suffix(".tmp")
+        n = 0
+        with tmp.open("w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=headers, extrasaction="ignore")
+            w.writeheader()
+            for r in rows:
+                w.writerow(r)
+                n += 1
+        os.replace(tmp, final)
+        with (self.parts_dir / MANIFEST).open("a", encoding="utf-8") as m:
+            m.write(f"{key}\t{n}\n")
+        self._parts = [(k, c) for k, c in self._parts if k != key] + [(key, n)]
+        return n
+
+    def headers(self) -> List[str]:
+        """Объединение схем частей в порядке появления колонок."""
+        union: List[str] = []
+        seen = set()
+        for key, _ in self._parts:
+            with (self.parts_dir / f"{_safe(key)}.csv").open(newline="", encoding="utf-8") as f:
+                for h in next(csv.reader(f), []):
+                    if h not in seen:
+                        seen.add(h)
+                        union.append(h)
+        return union
+
+    def finish(self, cleanup: bool = True) -> Optional[Path]:
+        """Склеивает части в out_path. Без строк файл не пишется (None)."""
+        if not self.rows:
+            return None
+        headers = self.headers()
+        tmp = self.out_path.with_name(self.out_path.name + ".tmp")
+        with tmp.open("w", newline="", encoding="utf-8") as out:
+            w = csv.DictWriter(out, fieldnames=headers, restval="", extrasaction="ignore")
+            w.writeheader()
+            for key, _ in self._parts:
+                with (self.parts_dir / f"{_safe(key)}.csv").open(newline="", encoding="utf-8") as f:
+                    w.writerows(csv.DictReader(f))
+        os.replace(tmp, self.out_path)
+        if cleanup:
+            shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return self.out_path
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+metrics.py
+Зависимости: numpy, pandas (pandas — только для from_frame / to_frame)
+
+Общие метрики отчётов: w2w, d2d, скользящие суммы и отношения (eCPI, CTR, CR)
+по матрице приложение × день. Все приложения считаются одним векторным проходом
+по numpy-массивам; деление безопасное — знаменатель 0/NaN даёт NaN, а не ошибку
+или inf. Скалярные safe_ratio / wow_pct — для мест, где метрика считается по
+одной неделе (weekly.py, test1.py, test2.py), с той же семантикой.
+
+    m = AppDayMatrix.from_frame(df, measures=["installs", "clicks", "impressions", "total_cost"])
+    kpi = m.to_frame(m.kpis(window=7))   # app, day, installs_7d, w2w_pct_7d, ecpi_7d, ctr_pct_7d, ...
+"""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+
+# ----------- безопасное деление -----------
+def safe_div(num, den, scale: float = 1.0) -> np.ndarray:
+    """num / den * scale поэлементно; где den == 0 или NaN — NaN."""
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    out = np.full(np.broadcast(num, den).shape, np.nan)
+    ok = np.isfinite(den) & (den != 0)
+    np.divide(num * scale, den, out=out, where=ok)
+    return out
+
+
+def pct_change(curr, prev) -> np.ndarray:
+    """(curr - prev) / prev * 100; prev == 0/NaN -> NaN."""
+    curr = np.asarray(curr, dtype=np.float64)
+    return safe_div(curr - np.asarray(prev, dtype=np.float64), prev, 100.0)
+
+
+def _scalar(v, digits: Optional[int]) -> Optional[float]:
+    v = float(v)
+    if np.isnan(v):
+        return None
+    return round(v, digits) if digits is not None else v
+
+
+def safe_ratio(num, den, scale: float = 1.0, digits: Optional[int] = None) -> Optional[float]:
+    """Скалярное num / den * scale; den 0/None/NaN -> None."""
+    if num is None or den is None:
+        return None
+    return _scalar(safe_div(num, den, scale), digits)
+
+
+def wow_pct(curr, prev, digits: int = 2) -> Optional[float]:
+    """w2w в процентах как в отчётах: предыдущей недели нет или 0 -> None."""
+    if curr is None or prev is None:
+        return None
+    return _scalar(pct_change(curr, prev), digits)
+
+
+# ----------- сдвиги и окна по оси дней -----------
+def shift(x: np.ndarray, k: int) -> np.ndarray:
+    """Сдвиг по дням (axis=1) на k вперёд: out[:, t] = x[:, t-k], начало — NaN."""
+    out = np.full(x.shape, np.nan)
+    if k == 0:
+        out[:] = x
+    elif 0 < k < x.shape[1]:
+        out[:, k:] = x[:, :-k]
+    elif -x.shape[1] < k < 0:
+        out[:, :k] = x[:, -k:]
+    return out
+
+
+def rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """Сумма за последние window дней включительно; пока окно неполное — NaN."""
+    filled = np.nan_to_num(x, nan=0.0)
+    cs = np.concatenate([np.zeros((x.shape[0], 1)), np.cumsum(filled, axis=1)], axis=1)
+    out = np.full(x.shape, np.nan)
+    if window <= x.shape[1]:
+        out[:, window - 1:] = cs[:, window:] - cs[:, :-window]
+    return out
+
+
+# ----------- матрица приложение × день -----------
+class AppDayMatrix:
+    """
+    measures[name] — float64 (n_apps × n_days), дни идут подряд без пропусков
+    (день без строк = 0), поэтому лаг в k дней — сдвиг на k столбцов.
+    """
+
+    def __init__(self, apps: Sequence[str], days: np.ndarray, measures: Dict[str, np.ndarray]):
+        self.apps = list(apps)
+        self.days = np.asarray(days, dtype="datetime64[D]")
+        self.measures = measures
+
+    @classmethod
+    def from_frame(cls, df, measures: Sequence[str], app_col: str = "app", date_col: str = "date") -> "AppDayMatrix":
+        """Длинная таблица (app, date, метрики...) -> матрица; повторы (app, date) суммируются."""
+        import pandas as pd
+
+        df = df[df[date_col].notna() & df[app_col].notna()]
+        app_codes, apps = pd.factorize(df[app_col], sort=True)
+        days = pd.to_datetime(df[date_col]).to_numpy().astype("datetime64[D]")
+        if len(days) == 0:
+            return cls([], np.array([], dtype="datetime64[D]"), {m: np.zeros((0, 0)) for m in measures})
+        d0, d1 = days.min(), days.max()
+        day_idx = (days - d0).astype(np.int64)
+        shape = (len(apps), int((d1 - d0).astype(np.int64)) + 1)
+
+        out = {}
+        for m in measures:
+            values = pd.to_numeric(df[m], errors="coerce").to_numpy(dtype=np.float64) if m in df.columns \
+                else np.zeros(len(df))
+            grid = np.zeros(shape)
+            np.add.at(grid, (app_codes, day_idx), np.nan_to_num(values, nan=0.0))
+            out[m] = grid
+        return cls(list(apps), np.arange(d0, d1 + 1), out)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.measures[name]
+
+    def rolling(self, name: str, window: int) -> np.ndarray:
+        return rolling_sum(self[name], window)
+
+    def dod(self, name: str) -> np.ndarray:
+        """День к предыдущему дню, %."""
+        x = self[name]
+        return pct_change(x, shift(x, 1))
+
+    def wow(self, name: str, window: int = 7) -> np.ndarray:
+        """Сумма за window дней к такой же сумме неделей раньше, %."""
+        r = self.rolling(name, window)
+        return pct_change(r, shift(r, 7))
+
+    def ratio(self, num: str, den: str, window: int = 7, scale: float = 1.0) -> np.ndarray:
+        """Отношение скользящих сумм (а не среднее дневных отношений)."""
+        return safe_div(self.rolling(num, window), self.rolling(den, window), scale)
+
+    def kpis(self, window: int = 7) -> Dict[str, np.ndarray]:
+        """Стандартный набор для отчётов; метрики, которых нет в матрице, пропускаются."""
+        have = set(self.measures)
+        out: Dict[str, np.ndarray] = {}
+        sfx = f"_{window}d"
+        if "installs" in have:
+            out["installs" + sfx] = self.rolling("installs", window)
+            out["installs_d2d_pct"] = self.dod("installs")
+            out["w2w_pct" + sfx] = self.wow("installs", window)
+        if "total_cost" in have:
+            out["total_cost" + sfx] = self.rolling("total_cost", window)
+            if "installs" in have:
+                out["ecpi" + sfx] = self.ratio("total_cost", "installs", window)
+        if {"clicks", "impressions"} <= have:
+            out["ctr_pct" + sfx] = self.ratio("clicks", "impressions", window, 100.0)
+        if {"installs", "clicks"} <= have:
+            out["cr_pct" + sfx] = self.ratio("installs", "clicks", window, 100.0)
+        if {"loyal_users", "installs"} <= have:
+            out["loyal_ratio_pct" + sfx] = self.ratio("loyal_users", "installs", window, 100.0)
+        return out
+
+    def to_frame(self, columns: Dict[str, np.ndarray], digits: Optional[int] = 4):
+        """Матрицы (n_apps × n_days) -> длинная таблица app, day, колонки."""
+        import pandas as pd
+
+        n_apps, n_days = len(self.apps), len(self.days)
+        data = {
+            "app": np.repeat(np.asarray(self.apps, dtype=object), n_days),
+            "day": np.tile(self.days, n_apps),
+        }
+        for name, x in columns.items():
+            v = x.reshape(-1)
+            data[name] = np.round(v, digits) if digits is not None else v
+        return pd.DataFrame(data)
+
+
+def rolling_kpis(df, windows: Sequence[int] = (7, 28), app_col: str = "app", date_col: str = "date"):
+    """KPI по всем приложениям сразу для нескольких окон -> длинная таблица."""
+    measures = [c for c in ("installs", "clicks", "impressions", "total_cost", "loyal_users") if c in df.columns]
+    m = AppDayMatrix.from_frame(df, measures, app_col=app_col, date_col=date_col)
+    columns: Dict[str, np.ndarray] = {}
+    for w in windows:
+        columns.update(m.kpis(window=w))
+    return m.to_frame(columns)
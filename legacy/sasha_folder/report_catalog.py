@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+report_catalog.py
+Зависимости: нет (stdlib)
+
+Каталог файлов выгрузок в SQLite: разобранные из имени даты, app_id/app_key,
+размер, mtime и дайджест содержимого. scan() проходит папку одним scandir
+(stat на файл — один, из DirEntry), разбирает имя и считает дайджест только у
+новых/изменённых файлов и удаляет из каталога исчезнувшие. Дальше выбор лучшего
+файла на (приложение, неделя) и поиск по приложению — индексные запросы.
+
+    catalog = ReportCatalog(REPORT_DIR / "report_catalog.sqlite", parse_fname)
+    catalog.scan(REPORT_DIR)
+    for (app_key, d2), e in catalog.best_files().items(): ...
+"""
+
+import hashlib
+import os
+import sqlite3
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# имя файла -> (d1, d2, app_id, app_key, display_hint), как test2.parse_fname
+ParseName = Callable[[Path], tuple]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_files (
+    path     TEXT PRIMARY KEY,
+    dir      TEXT NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest   TEXT NOT NULL,
+    d1       TEXT,
+    d2       TEXT,
+    app_id   TEXT,
+    app_key  TEXT,
+    display  TEXT
+);
+CREATE INDEX IF NOT EXISTS report_files_app_week_idx ON report_files (app_key, d2);
+CREATE INDEX IF NOT EXISTS report_files_dir_idx ON report_files (dir);
+CREATE INDEX IF NOT EXISTS report_files_digest_idx ON report_files (digest);
+"""
+
+# лучший файл на (app_key, d2): больший размер, затем более свежий
+BEST_SQL = """
+SELECT path, d1, d2, app_id, app_key, display, size, mtime_ns, digest
+FROM (
+    SELECT *, row_number() OVER (PARTITION BY app_key, d2 ORDER BY size DESC, mtime_ns DESC) AS rn
+    FROM report_files
+    WHERE app_key IS NOT NULL AND d2 IS NOT NULL {where}
+)
+WHERE rn = 1
+ORDER BY app_key, d2
+"""
+
+
+class CatalogEntry(NamedTuple):
+    path: Path
+    d1: Optional[date]
+    d2: Optional[date]
+    app_id: Optional[str]
+    app_key: Optional[str]
+    display: Optional[str]
+    size: int
+    mtime_ns: int
+    digest: str
+
+
+def _iso(d) -> Optional[str]:
+    return d.isoformat() if d else None
+
+
+def _entry(row) -> CatalogEntry:
+    path, d1, d2, app_id, app_key, display, size, mtime_ns, digest = row
+    return CatalogEntry(
+        Path(path),
+        date.fromisoformat(d1) if d1 else None,
+        date.fromisoformat(d2) if d2 else None,
+        app_id, app_key, display, size, mtime_ns, digest,
+    )
+
+
+def file_digest(path: Path, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ReportCatalog:
+    def __init__(self, db_path: Path, parse_name: ParseName):
+        self.db_path = Path(db_path)
+        self.parse_name = parse_name
+        self.con = sqlite3.connect(self.db_path)
+        self.con.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.con.close()
+
+    def scan(self, directory: Path, prefix: str = "daily_report", suffix: str = ".csv") -> Tuple[int, int, int]:
+        """Инкрементальное обновление по папке -> (новых/изменённых, без изменений, удалённых)."""
+        directory = Path(directory)
+        dir_key = str(directory.resolve())
+        known = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self.con.execute(
+                "SELECT path, size, mtime_ns FROM report_files WHERE dir = ?", (dir_key,)
+            )
+        }
+        seen, changed, same = set(), 0, 0
+        with os.scandir(directory) as it:
+            for de in it:
+                if not (de.name.startswith(prefix) and de.name.endswith(suffix)) or not de.is_file():
+                    continue
+                st = de.stat()
+                path = os.path.join(dir_key, de.name)
+                seen.add(path)
+                if known.get(path) == (st.st_size, st.st_mtime_ns):
+                    same += 1
+                    continue
+                d1, d2, app_id, app_key, display = self.parse_name(Path(de.name))
+                self.con.execute(
+                    "INSERT OR REPLACE INTO report_files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, dir_key, st.st_size, st.st_mtime_ns, file_digest(Path(path)),
+                     _iso(d1), _iso(d2), app_id, app_key, display),
+                )
+                changed += 1
+        gone = [p for p in known if p not in seen]
+        self.con.executemany("DELETE FROM report_files WHERE path = ?", [(p,) for p in gone])
+        self.con.commit()
+        return changed, same, len(gone)
+
+    def best_files(self, app_key: Optional[str] = None) -> Dict[Tuple[str, date], CatalogEntry]:
+        """(app_key, d2) -> лучший файл недели; app_key — только для одного приложения."""
+        if app_key is None:
+            rows = self.con.execute(BEST_SQL.format(where=""))
+        else:
+            rows = self.con.execute(BEST_SQL.format(where="AND app_key = ?"), (app_key,))
+        return {(e.app_key, e.d2): e for e in map(_entry, rows)}
+
+    def week_files(self, app_key: str, d2: date) -> List[CatalogEntry]:
+        """Все файлы приложения за неделю, лучший первым."""
+        rows = self.con.execute(
+            "SELECT path, d1, d2, app_id, app_key, display, size, mtime_ns, digest FROM report_files "
+            "WHERE app_key = ? AND d2 = ? ORDER BY size DESC, mtime_ns DESC",
+            (app_key, d2.isoformat()),
+        )
+        return [_entry(r) for r in rows]
+
+    def latest(self) -> Dict[str, CatalogEntry]:
+        """app_key -> лучший файл самой свежей недели."""
+        latest: Dict[str, CatalogEntry] = {}
+        for (app_key, _), e in self.best_files().items():  # отсортировано по app_key, d2
+            latest[app_key] = e
+        return latest
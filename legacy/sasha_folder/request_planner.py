@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+request_planner.py
+Зависимости: pandas
+
+Планировщик запросов к AppsFlyer aggregate API.
+
+Скрипт сначала собирает все нужды прогона — (app_id, отчёт, период), — затем
+plan_requests() склеивает пересекающиеся и соседние периоды одного (app_id, отчёт)
+в один запрос, а fetch_planned() делает по запросу на группу и режет ответ
+локально по колонке date. Для недельного отчёта (текущая + предыдущая неделя
+подряд) это один запрос на приложение вместо двух.
+"""
+
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+import pandas as pd
+
+
+class Need(NamedTuple):
+    app_id: str
+    report: str
+    d_from: date
+    d_to: date
+
+
+class PlannedRequest(NamedTuple):
+    app_id: str
+    report: str
+    d_from: date
+    d_to: date
+    needs: List[Need]
+
+
+# fetch(app_id, report, d_from, d_to) -> DataFrame с колонкой date (datetime.date)
+Fetch = Callable[[str, str, date, date], pd.DataFrame]
+
+
+def plan_requests(needs: Iterable[Need], max_days: Optional[int] = None) -> List[PlannedRequest]:
+    """
+    Склеивает периоды одного (app_id, report), если они пересекаются или идут
+    встык. max_days — ограничение длины одного запроса (лимит API), по умолчанию нет.
+    """
+    by_key: Dict[tuple, List[Need]] = {}
+    for n in set(needs):
+        if n.d_from > n.d_to:
+            raise ValueError(f"Пустой период: {n}")
+        by_key.setdefault((n.app_id, n.report), []).append(n)
+
+    plan: List[PlannedRequest] = []
+    for (app_id, report), items in sorted(by_key.items()):
+        items.sort(key=lambda n: (n.d_from, n.d_to))
+        cur_from, cur_to, group = items[0].d_from, items[0].d_to, [items[0]]
+        for n in items[1:]:
+            new_to = max(cur_to, n.d_to)
+            fits = max_days is None or (new_to - cur_from).days + 1 <= max_days
+            if n.d_from <= cur_to + timedelta(days=1) and fits:
+                cur_to = new_to
+                group.append(n)
+            else:
+                plan.append(PlannedRequest(app_id, report, cur_from, cur_to, group))
+                cur_from, cur_to, group = n.d_from, n.d_to, [n]
+        plan.append(PlannedRequest(app_id, report, cur_from, cur_to, group))
+    return plan
+
+
+def slice_range(df: pd.DataFrame, d_from: date, d_to: date) -> pd.DataFrame:
+    if df.empty:
+        return df.copy()
+    if "date" not in df.columns:
+        raise ValueError("В ответе нет колонки date — резать по периоду нечем")
+    return df[df["date"].between(d_from, d_to)].reset_index(drop=True)
+
+
+def fetch_planned(needs: Iterable[Need], fetch: Fetch, max_days: Optional[int] = None) -> Dict[Need, pd.DataFrame]:
+    """
+    Выполняет план: по запросу на группу, результат — DataFrame на каждую нужду.
+    При ошибке запроса все его нужды получают пустой DataFrame (как и раньше в скриптах).
+    """
+    needs = list(needs)
+    plan = plan_requests(needs, max_days=max_days)
+    print(f"[PLAN] нужд: {len(set(needs))}, запросов: {len(plan)}")
+
+    result: Dict[Need, pd.DataFrame] = {}
+    for req in plan:
+        try:
+            df = fetch(req.app_id, req.report, req.d_from, req.d_to)
+        except Exception as e:
+            print(f"[ERR] {req.app_id} {req.report} {req.d_from}—{req.d_to}: {e}")
+            df = pd.DataFrame()
+        for n in req.needs:
+            if n.d_from == req.d_from and n.d_to == req.d_to:
+                result[n] = df
+            else:
+                result[n] = slice_range(df, n.d_from, n.d_to)
+    return result
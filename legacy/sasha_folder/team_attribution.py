@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+team_attribution.py
+Зависимости: pandas
+
+Команда = префикс campaign до первого разделителя (TEAM_SPLIT).
+Кампаний в выгрузке на порядки меньше, чем строк, поэтому регулярка гоняется
+не по строкам, а по уникальным значениям: campaign факторизуется, префикс
+каждого значения берётся из общего LRU-кэша (team_prefix), строкам команда
+раздаётся по кодам.
+
+Общая часть для test1.py / test2.py / weekly_db.py. Разделители — те же, что
+TEAM_SEPARATORS в project_integration/src/teams.py (SQL-агрегаты, связка кампаний);
+совпадение проверяет tests/test_team_attribution.py.
+"""
+
+import re
+from functools import lru_cache
+from typing import Hashable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+# годится и для re, и для регулярок PostgreSQL (weekly_db.py)
+TEAM_SEPARATORS = r"\s_\-|:/\[\]()"
+TEAM_SPLIT = re.compile(rf"[{TEAM_SEPARATORS}]+")  # разделители для префикса команды
+UNATTRIBUTED = "Unattributed"
+
+
+@lru_cache(maxsize=100_000)
+def _prefix(campaign: str) -> Optional[str]:
+    # начинается с разделителя -> первый кусок пустой -> команды нет
+    return TEAM_SPLIT.split(campaign.strip())[0] or None
+
+
+def team_prefix(campaign: Optional[str]) -> Optional[str]:
+    """Префикс одной кампании: 'alpha_ios_us' -> 'alpha'; пусто и не-строки -> None."""
+    # числовой campaign (id из read_csv) и NaN команды не дают
+    if not isinstance(campaign, str):
+        return None
+    return _prefix(campaign)
+
+
+def _prefixes(campaigns: Iterable[Hashable]) -> list:
+    return [team_prefix(c) for c in campaigns]
+
+
+def team_series(campaigns: pd.Series, default: Optional[str] = None) -> pd.Series:
+    """Команда для каждой строки; кампании без префикса (и пустые) получают default."""
+    codes, uniques = pd.factorize(campaigns)
+    # последний элемент — для кода -1 (NaN/None в campaign)
+    lookup = np.array([t if t is not None else default for t in _prefixes(uniques)] + [default], dtype=object)
+    return pd.Series(lookup[codes], index=campaigns.index, dtype=object)
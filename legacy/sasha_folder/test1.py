@@ -7,7 +7,9 @@ ENV: AF_API_TOKEN=<appsFlyer v2 token>
 
 Что делает:
 - Читает apps из app_id.json (формат, как дал Саша).
-- Выгружает из AppsFlyer daily_report/v5 CSV за прошлую и позапрошлую неделю.
+- Выгружает из AppsFlyer daily_report/v5 CSV за прошлую и позапрошлую неделю
+  (одним запросом на приложение, см. request_planner.py),
+  либо с --db считает то же по загруженной таблице appsflyer (weekly_db.py).
 - Считает installs ТОЛЬКО по paid (строки с ненулевым Campaign).
 - w2w = (week - prev_week)/prev_week * 100, если prev_week>0.
 - Команды: префиксы из Campaign до первого разделителя ([ _- |:/()[] ]) с суммой installs; выводим в отчёт в виде списка по убыванию.
@@ -21,10 +23,10 @@ ENV: AF_API_TOKEN=<appsFlyer v2 token>
   Лист "Summary" — общий итог:
     6) Общее кол-во установок
     7) Динамика w2w
+  Лист "KPI по дням" (не в режиме --db) — скользящие 7 дней по paid: installs, d2d, w2w, cost, eCPI.
 """
 
 import os
-import re
 import json
 import io
 from pathlib import Path
@@ -33,12 +35,13 @@ from typing import Dict, List, Tuple, Optional
 
 import requests
 import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, numbers
-from openpyxl.utils import get_column_letter
+
+from metrics import rolling_kpis, wow_pct
+from request_planner import Need, fetch_planned
+from team_attribution import team_prefix, team_series
+from xlsx_stream import Column, StreamingWorkbook
 
 AF_BASE = "https://hq1.appsflyer.com"
-TEAM_SPLIT = re.compile(r"[\s_\-\|:/\[\]\(\)]+")  # разделители для префикса команды
 
 # ----------- даты -----------
 def week_range(end_day: Optional[date] = None) -> Tuple[date, date, date, date]:
@@ -96,9 +99,7 @@ def normalize_df(df: pd.DataFrame) -> pd.DataFrame:
 
 # ----------- расчёты -----------
 def extract_team_prefix(campaign: Optional[str]) -> Optional[str]:
-    if not isinstance(campaign, str) or not campaign.strip():
-        return None
-    return (TEAM_SPLIT.split(campaign.strip()) or [None])[0]
+    return team_prefix(campaign)
 
 def installs_and_teams_paid(df: pd.DataFrame, top_n: Optional[int] = None) -> Tuple[int, List[str]]:
     """
@@ -112,7 +113,7 @@ def installs_and_teams_paid(df: pd.DataFrame, top_n: Optional[int] = None) -> Tu
     if total_installs == 0:
         return 0, []
     # команды
-    paid["team"] = paid["campaign"].apply(extract_team_prefix)
+    paid["team"] = team_series(paid["campaign"])
     teams = (
         paid.groupby("team", dropna=True)["installs"]
         .sum()
@@ -124,75 +125,52 @@ def installs_and_teams_paid(df: pd.DataFrame, top_n: Optional[int] = None) -> Tu
     return total_installs, team_list
 
 def wow(curr: int, prev: int) -> Optional[float]:
-    if prev is None or prev == 0:
-        return None
-    return round(100.0 * (curr - prev) / prev, 2)
+    return wow_pct(curr, prev)
 
 # ----------- Excel -----------
-def write_excel(report_rows: List[Dict], totals_curr: int, totals_prev: int, out_path: Path):
-    wb = Workbook()
-
-    # Лист "Отчёт"
-    ws = wb.active
-    ws.title = "Отчёт"
-    cols = [
-        "Название приложения",
-        "Тематика",
-        "Кол-во инсталлов за прошлую неделю",
-        "Динамика w2w (%)",
-        "Какие команды льют трафик",
-    ]
-    ws.append(cols)
-    for j, col in enumerate(cols, start=1):
-        c = ws.cell(1, j)
-        c.font = Font(bold=True)
-        c.alignment = Alignment(horizontal="center")
-
-    for row in report_rows:
-        ws.append([
-            row["app_name"],
-            "",  # Тематика — вручную
-            row["installs_curr"],
-            row["w2w_pct"],  # временно как число процентов → ниже форматируем
-            ", ".join(row["teams"]),
+def write_excel(report_rows: List[Dict], totals_curr: int, totals_prev: int, out_path: Path,
+                daily_kpi: Optional[pd.DataFrame] = None):
+    with StreamingWorkbook(out_path) as wb:
+        # Лист "Отчёт" (w2w в процентах -> формат % ставится при записи строки)
+        ws = wb.sheet("Отчёт", [
+            Column("Название приложения", 30),
+            Column("Тематика", 16),
+            Column("Кол-во инсталлов за прошлую неделю", 26),
+            Column("Динамика w2w (%)", 16, percent=True),
+            Column("Какие команды льют трафик", 48),
         ])
-
-    # Формат процента
-    col_idx = {c: i + 1 for i, c in enumerate(cols)}
-    pcol = col_idx["Динамика w2w (%)"]
-    for r in range(2, ws.max_row + 1):
-        v = ws.cell(r, pcol).value
-        if v is None or v == "":
-            ws.cell(r, pcol).value = None
-            continue
-        ws.cell(r, pcol).value = float(v) / 100.0
-        ws.cell(r, pcol).number_format = numbers.FORMAT_PERCENTAGE_00
-
-    # ширины
-    widths = {
-        "Название приложения": 30,
-        "Тематика": 16,
-        "Кол-во инсталлов за прошлую неделю": 26,
-        "Динамика w2w (%)": 16,
-        "Какие команды льют трафик": 48,
-    }
-    for name, w in widths.items():
-        letter = get_column_letter(col_idx[name])
-        ws.column_dimensions[letter].width = w
-    ws.auto_filter.ref = ws.dimensions
-
-    # Лист "Summary"
-    ws2 = wb.create_sheet("Summary")
-    total_wow = wow(totals_curr, totals_prev)
-    ws2.append(["Общее кол-во установок (прошлая неделя)", totals_curr])
-    ws2.append(["Общее кол-во установок (предыдущая неделя)", totals_prev if totals_prev else "—"])
-    ws2.append(["Динамика w2w общая (%)", total_wow if total_wow is not None else "—"])
-    # формат %
-    if total_wow is not None:
-        ws2.cell(3, 2).value = total_wow / 100.0
-        ws2.cell(3, 2).number_format = numbers.FORMAT_PERCENTAGE_00
-
-    wb.save(out_path)
+        for row in report_rows:
+            ws.append([
+                row["app_name"],
+                "",  # Тематика — вручную
+                row["installs_curr"],
+                row["w2w_pct"],
+                ", ".join(row["teams"]),
+            ])
+
+        # Лист "Summary"
+        ws2 = wb.sheet("Summary", header=False)
+        total_wow = wow(totals_curr, totals_prev)
+        ws2.append(["Общее кол-во установок (прошлая неделя)", totals_curr])
+        ws2.append(["Общее кол-во установок (предыдущая неделя)", totals_prev if totals_prev else "—"])
+        if total_wow is not None:
+            ws2.append(["Динамика w2w общая (%)", total_wow], percent=[1])
+        else:
+            ws2.append(["Динамика w2w общая (%)", "—"])
+
+        # Лист "KPI по дням" — скользящие 7 дней по paid, все приложения (metrics.py)
+        if daily_kpi is not None and not daily_kpi.empty:
+            kpi_cols = [
+                Column("app", 30),
+                Column("day", 12, number_format="yyyy-mm-dd"),
+                Column("installs_7d", 14),
+                Column("installs_d2d_pct", 16, percent=True),
+                Column("w2w_pct_7d", 14, percent=True),
+                Column("total_cost_7d", 14),
+                Column("ecpi_7d", 12),
+            ]
+            ws3 = wb.sheet("KPI по дням", [c for c in kpi_cols if c.name in daily_kpi.columns])
+            ws3.append_frame(daily_kpi)
 
 # ----------- main -----------
 def main():
@@ -204,10 +182,13 @@ def main():
     ap.add_argument("--tz", default="UTC", help="timezone для отчёта (UTC|preferred|...). По умолчанию UTC")
     ap.add_argument("--top-teams", type=int, default=10, help="Сколько команд выводить (по installs, по убыванию)")
     ap.add_argument("--out", default="af_weekly_report.xlsx", help="Выходной XLSX")
+    ap.add_argument("--db", default=os.getenv("AF_DB_URI"),
+                    help="Считать по загруженной таблице Postgres вместо API (DSN, или ENV AF_DB_URI)")
+    ap.add_argument("--table", default="appsflyer", help="Таблица с выгрузкой AppsFlyer для --db")
     args = ap.parse_args()
 
     token = os.getenv("AF_API_TOKEN")
-    if not token:
+    if not token and not args.db:
         raise SystemExit("AF_API_TOKEN не задан")
 
     apps_obj = json.loads(Path(args.apps).read_text(encoding="utf-8"))
@@ -216,7 +197,28 @@ def main():
     end_day = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else None
     p_s, p_e, c_s, c_e = week_range(end_day)
 
+    if args.db:
+        # из БД: всё одним запросом, DataFrame не нужны
+        from weekly_db import weekly_installs_from_db
+
+        db_stats = weekly_installs_from_db(
+            args.db, [a["id"] for a in apps], p_s, p_e, c_s, c_e, top_n=args.top_teams, table=args.table
+        )
+    else:
+        # обе недели идут встык — планировщик склеит их в один запрос на приложение
+        needs = {}
+        for app in apps:
+            needs[app["id"]] = (
+                Need(app["id"], "daily_report", c_s, c_e),
+                Need(app["id"], "daily_report", p_s, p_e),
+            )
+        frames = fetch_planned(
+            [n for pair in needs.values() for n in pair],
+            lambda app_id, _report, d_from, d_to: fetch_daily_report_csv(app_id, d_from, d_to, token, timezone=args.tz),
+        )
+
     report_rows = []
+    daily_paid = []
     total_curr = 0
     total_prev = 0
 
@@ -224,22 +226,18 @@ def main():
         app_id = app["id"]
         app_name = app.get("name") or app_id
 
-        # текущая неделя
-        try:
-            df_curr = fetch_daily_report_csv(app_id, c_s, c_e, token, timezone=args.tz)
-        except Exception as e:
-            print(f"[ERR] {app_name} curr week: {e}")
-            df_curr = pd.DataFrame()
+        if args.db:
+            inst_curr, inst_prev, teams_curr = db_stats.get(app_id, (0, 0, []))
+        else:
+            need_curr, need_prev = needs[app_id]
+            df_curr, df_prev = frames[need_curr], frames[need_prev]
 
-        # предыдущая неделя
-        try:
-            df_prev = fetch_daily_report_csv(app_id, p_s, p_e, token, timezone=args.tz)
-        except Exception as e:
-            print(f"[ERR] {app_name} prev week: {e}")
-            df_prev = pd.DataFrame()
+            inst_curr, teams_curr = installs_and_teams_paid(df_curr, top_n=args.top_teams)
+            inst_prev, _ = installs_and_teams_paid(df_prev, top_n=None)
 
-        inst_curr, teams_curr = installs_and_teams_paid(df_curr, top_n=args.top_teams)
-        inst_prev, _ = installs_and_teams_paid(df_prev, top_n=None)
+            for df in (df_prev, df_curr):
+                if not df.empty and {"date", "campaign"} <= set(df.columns):
+                    daily_paid.append(df[df["campaign"].notna()].assign(app=app_name))
 
         total_curr += inst_curr
         total_prev += inst_prev
@@ -255,7 +253,13 @@ def main():
     # сортировка по инсталлам по убыванию (чтобы важные сверху)
     report_rows.sort(key=lambda r: r["installs_curr"], reverse=True)
 
-    write_excel(report_rows, total_curr, total_prev, Path(args.out))
+    # дневные KPI по всем приложениям одним проходом; окно 7 дней полное только в текущей неделе
+    daily_kpi = None
+    if daily_paid:
+        daily_kpi = rolling_kpis(pd.concat(daily_paid, ignore_index=True), windows=(7,))
+        daily_kpi = daily_kpi[daily_kpi["day"] >= pd.Timestamp(c_s)]
+
+    write_excel(report_rows, total_curr, total_prev, Path(args.out), daily_kpi=daily_kpi)
     print(f"OK -> {args.out}")
     print(f"Период: {c_s}—{c_e} | Предыдущая: {p_s}—{p_e}")
 
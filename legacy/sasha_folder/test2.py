@@ -9,15 +9,18 @@ from datetime import datetime, timedelta
 from typing import Optional, Tuple, List, Dict
 
 import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, numbers
-from openpyxl.utils import get_column_letter
+
+from metrics import wow_pct
+from report_catalog import ReportCatalog
+from team_attribution import UNATTRIBUTED, team_prefix, team_series
+from xlsx_stream import Column, StreamingWorkbook
 
 # === Конфиг ===
 REPORT_DIR = Path("../report")            # где лежат daily_report*.csv
 OUT_XLSX   = REPORT_DIR / "summary_readable.xlsx"
 APPS_CACHE = REPORT_DIR / "apps_cache.json"  # {<app_id>: "<app_name>"}
 THEMES_JSON = Path("./themes.json")      # {"<app_id>|<name>": "Тематика", ...}
+CATALOG_DB = REPORT_DIR / "report_catalog.sqlite"  # каталог файлов выгрузок (report_catalog.py)
 
 # === Парсинг имён файлов ===
 def parse_fname(p: Path) -> Tuple[Optional[datetime], Optional[datetime], Optional[str], Optional[str], Optional[str]]:
@@ -76,26 +79,20 @@ def normalize_df(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 # === Метрики недели ===
-TEAM_SPLIT = re.compile(r"[\s_\-\|:/\[\]\(\)]+")
 def extract_team(name: Optional[str]) -> str:
-    if not isinstance(name, str) or not name.strip():
-        return "Unattributed"
-    return (TEAM_SPLIT.split(name.strip()) or ["Unattributed"])[0]
+    return team_prefix(name) or UNATTRIBUTED
 
 def week_stats_and_teams(df: pd.DataFrame, top_n=10) -> Tuple[int, Optional[float], List[str]]:
     installs = int(df.get("installs", pd.Series(dtype=float)).sum())
     # команды
     teams = []
     if "campaign" in df.columns and "installs" in df.columns:
-        t = df.assign(team=df["campaign"].apply(extract_team)) \
+        t = df.assign(team=team_series(df["campaign"], default=UNATTRIBUTED)) \
               .groupby("team")["installs"].sum().sort_values(ascending=False)
         teams = [k for k, v in t.items() if v > 0][:top_n]
     return installs, None, teams  # второй элемент — не используется здесь
 
 # === Формирование отчёта ===
-def choose_best_file(paths: List[Path]) -> Path:
-    return sorted(paths, key=lambda p: (p.stat().st_size, p.stat().st_mtime), reverse=True)[0]
-
 def load_maps() -> Tuple[Dict[str,str], Dict[str,str]]:
     apps_map = json.loads(APPS_CACHE.read_text(encoding="utf-8")) if APPS_CACHE.exists() else {}
     themes_map = json.loads(THEMES_JSON.read_text(encoding="utf-8")) if THEMES_JSON.exists() else {}
@@ -120,33 +117,28 @@ def resolve_theme(app_id: Optional[str], app_name: str, themes_map: Dict[str,str
 
 def build_report_rows() -> Tuple[pd.DataFrame, Dict[str,int], Dict[str,int]]:
     apps_map, themes_map = load_maps()
-    csvs = list(REPORT_DIR.glob("daily_report*.csv"))
-    if not csvs:
+    # 1) каталог файлов: на каждый (app_key, end_date) — лучший файл (индексный запрос, без stat в sort key)
+    catalog = ReportCatalog(CATALOG_DB, parse_fname)
+    changed, same, gone = catalog.scan(REPORT_DIR)
+    print(f"Каталог: новых/изменённых {changed}, без изменений {same}, удалено {gone}")
+    chosen = catalog.best_files()
+    catalog.close()
+    if not chosen:
         raise SystemExit("Нет файлов daily_report*.csv в ./report")
-
-    # 1) на каждый (app_key, end_date) — лучший файл
-    buckets: Dict[Tuple[str, datetime], List[Path]] = {}
-    file_info: Dict[Path, Tuple[datetime, datetime, Optional[str], str, Optional[str]]] = {}
-    for p in csvs:
-        d1, d2, app_id, app_key, disp = parse_fname(p)
-        if d2 is None or app_key is None:
-            continue
-        file_info[p] = (d1, d2, app_id, app_key, disp)
-        buckets.setdefault((app_key, d2), []).append(p)
-    chosen = {k: choose_best_file(v) for k, v in buckets.items()}
+    file_info = {e.path: (e.d1, e.d2, e.app_id, e.app_key, e.display) for e in chosen.values()}
 
     # 2) словарь для быстрого доступа к installs по ключу/дате
     installs_index: Dict[Tuple[str, datetime], int] = {}
-    for (app_key, end_d), p in chosen.items():
-        df = normalize_df(pd.read_csv(p))
+    for (app_key, end_d), e in chosen.items():
+        df = normalize_df(pd.read_csv(e.path))
         inst, _, _ = week_stats_and_teams(df)
         installs_index[(app_key, end_d)] = inst
 
     # 3) для каждого app_key берём самую свежую неделю
     latest_per_app: Dict[str, Tuple[datetime, Path]] = {}
-    for (app_key, end_d), p in chosen.items():
+    for (app_key, end_d), e in chosen.items():
         if (app_key not in latest_per_app) or (end_d > latest_per_app[app_key][0]):
-            latest_per_app[app_key] = (end_d, p)
+            latest_per_app[app_key] = (end_d, e.path)
 
     # 4) собираем строки формы
     rows = []
@@ -159,7 +151,7 @@ def build_report_rows() -> Tuple[pd.DataFrame, Dict[str,int], Dict[str,int]]:
 
         prev_end = d2 - timedelta(days=7)
         prev_installs = installs_index.get((app_key, prev_end))
-        w2w_pct = round(100.0 * (installs - prev_installs) / prev_installs, 2) if prev_installs else None
+        w2w_pct = wow_pct(installs, prev_installs)
 
         app_name = resolve_app_name(app_id, disp, apps_map)
         theme = resolve_theme(app_id, app_name, themes_map)
@@ -183,69 +175,32 @@ def build_report_rows() -> Tuple[pd.DataFrame, Dict[str,int], Dict[str,int]]:
     return df_form, {"curr": totals_curr}, {"prev": totals_prev}
 
 def save_excel_form(df_form: pd.DataFrame, totals_curr: int, totals_prev: int, path: Path):
-    wb = Workbook()
-
-    # --- Лист "Отчёт" ---
-    ws = wb.active
-    ws.title = "Отчёт"
-
-    visible_cols = ["Название приложения","Тематика","Кол-во инсталлов за прошлую неделю","Динамика w2w (%)","Команды (по префиксу кампании)","Период"]
-    ws.append(visible_cols)
-    for j, col in enumerate(visible_cols, start=1):
-        c = ws.cell(1, j); c.font = Font(bold=True); c.alignment = Alignment(horizontal="center")
-
-    # проценты -> доли для правильного % формата
-    for _, r in df_form.iterrows():
-        row = [r[c] for c in visible_cols]
-        ws.append(row)
-
-    # формат столбца w2w как %
-    col_map = {c: i+1 for i, c in enumerate(visible_cols)}
-    if "Динамика w2w (%)" in col_map:
-        col = col_map["Динамика w2w (%)"]
-        for r in range(2, ws.max_row+1):
-            v = ws.cell(r, col).value
-            if v is None or v == "":
-                continue
-            try:
-                ws.cell(r, col).value = float(v)/100.0
-                ws.cell(r, col).number_format = numbers.FORMAT_PERCENTAGE_00
-            except Exception:
-                pass
-
-    # ширины
-    widths = {
-        "Название приложения": 28,
-        "Тематика": 18,
-        "Кол-во инсталлов за прошлую неделю": 24,
-        "Динамика w2w (%)": 16,
-        "Команды (по префиксу кампании)": 44,
-        "Период": 18
-    }
-    for c, w in widths.items():
-        letter = get_column_letter(col_map[c])
-        ws.column_dimensions[letter].width = w
-    ws.auto_filter.ref = ws.dimensions
-
-    # --- Лист "Summary" ---
-    ws2 = wb.create_sheet("Summary")
-    ws2.append(["Всего инсталлов (текущая неделя)", totals_curr])
-    w2w_total = round(100.0 * (totals_curr - totals_prev) / totals_prev, 2) if totals_prev else None
-    ws2.append(["Всего инсталлов (пред. неделя)", totals_prev if totals_prev else "—"])
-    ws2.append(["Динамика w2w общая (%)", w2w_total if w2w_total is not None else "—"])
-
-    # формат %
-    if w2w_total is not None:
-        ws2.cell(3, 2).value = w2w_total/100.0
-        ws2.cell(3, 2).number_format = numbers.FORMAT_PERCENTAGE_00
-
-    # чисто служебный лист со ссылками на файлы (удобно для дебага)
-    ws3 = wb.create_sheet("Tech")
-    ws3.append(["app_id","Название приложения","Период","source_file"])
-    for _, r in df_form.iterrows():
-        ws3.append([r["app_id"], r["Название приложения"], r["Период"], r["source_file"]])
-
-    wb.save(path)
+    with StreamingWorkbook(path) as wb:
+        # --- Лист "Отчёт" --- (w2w в процентах -> формат % ставится при записи строки)
+        ws = wb.sheet("Отчёт", [
+            Column("Название приложения", 28),
+            Column("Тематика", 18),
+            Column("Кол-во инсталлов за прошлую неделю", 24),
+            Column("Динамика w2w (%)", 16, percent=True),
+            Column("Команды (по префиксу кампании)", 44),
+            Column("Период", 18),
+        ])
+        ws.append_frame(df_form)
+
+        # --- Лист "Summary" ---
+        ws2 = wb.sheet("Summary", header=False)
+        ws2.append(["Всего инсталлов (текущая неделя)", totals_curr])
+        w2w_total = wow_pct(totals_curr, totals_prev)
+        ws2.append(["Всего инсталлов (пред. неделя)", totals_prev if totals_prev else "—"])
+        if w2w_total is not None:
+            ws2.append(["Динамика w2w общая (%)", w2w_total], percent=[1])
+        else:
+            ws2.append(["Динамика w2w общая (%)", "—"])
+
+        # чисто служебный лист со ссылками на файлы (удобно для дебага)
+        ws3 = wb.sheet("Tech", [Column("app_id"), Column("Название приложения"), Column("Период"), Column("source_file")],
+                       auto_filter=False)
+        ws3.append_frame(df_form)
 
 def main():
     df_form, total_curr_dict, total_prev_dict = build_report_rows()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# скрипты папки импортируются по имени модуля, как друг из друга: import metrics, ...
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
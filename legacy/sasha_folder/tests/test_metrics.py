@@ -0,0 +1,101 @@
+import math
+from datetime import date
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from metrics import AppDayMatrix, pct_change, rolling_kpis, rolling_sum, safe_div, safe_ratio, shift, wow_pct  # noqa: E402
+
+nan = float("nan")
+
+
+def same(actual, expected):
+    np.testing.assert_allclose(np.asarray(actual, dtype=float), np.asarray(expected, dtype=float), equal_nan=True)
+
+
+def test_safe_div_nan_on_zero_or_nan_denominator():
+    with np.errstate(all="raise"):  # ни предупреждений, ни inf
+        out = safe_div([10, 10, 10, 0, nan], [4, 0, nan, 0, 2], scale=100.0)
+    same(out, [250.0, nan, nan, nan, nan])
+
+
+def test_safe_div_broadcasts():
+    same(safe_div([[2, 4], [6, 8]], [2, 0]), [[1, nan], [3, nan]])
+
+
+def test_pct_change():
+    same(pct_change([110, 50, 5, 0], [100, 100, 0, 0]), [10.0, -50.0, nan, nan])
+
+
+@pytest.mark.parametrize(
+    "num, den, kwargs, expected",
+    [
+        (1, 4, {}, 0.25),
+        (1, 3, {"scale": 100.0, "digits": 2}, 33.33),
+        (1, 0, {}, None),
+        (1, None, {}, None),
+        (None, 5, {}, None),
+        (1, nan, {}, None),
+    ],
+)
+def test_safe_ratio(num, den, kwargs, expected):
+    assert safe_ratio(num, den, **kwargs) == expected
+
+
+def test_wow_pct():
+    assert wow_pct(120, 100) == 20.0
+    assert wow_pct(1, 3) == -66.67
+    assert wow_pct(5, 0) is None
+    assert wow_pct(5, None) is None
+    assert isinstance(wow_pct(0, 4), float)
+
+
+def test_shift_and_rolling_sum():
+    x = np.array([[1.0, 2.0, 3.0, 4.0]])
+    same(shift(x, 1), [[nan, 1, 2, 3]])
+    same(shift(x, -2), [[3, 4, nan, nan]])
+    same(shift(x, 4), [[nan] * 4])
+    same(rolling_sum(x, 2), [[nan, 3, 5, 7]])
+    same(rolling_sum(np.array([[1.0, nan, 3.0]]), 2), [[nan, 1, 3]])  # NaN в окне = 0
+    same(rolling_sum(x, 5), [[nan] * 4])
+
+
+def test_matrix_fills_missing_days_and_sums_repeats():
+    df = pd.DataFrame({
+        "app": ["b", "a", "a", "a"],
+        "date": [date(2025, 1, 1), date(2025, 1, 1), date(2025, 1, 3), date(2025, 1, 3)],
+        "installs": [5, 1, 2, "x"],
+    })
+    m = AppDayMatrix.from_frame(df, ["installs", "clicks"])
+
+    assert m.apps == ["a", "b"]
+    assert m.days.tolist() == [date(2025, 1, 1), date(2025, 1, 2), date(2025, 1, 3)]
+    same(m["installs"], [[1, 0, 2], [5, 0, 0]])
+    same(m["clicks"], np.zeros((2, 3)))
+    same(m.dod("installs"), [[nan, -100, nan], [nan, -100, nan]])
+
+
+def test_ratio_of_rolling_sums_and_zero_denominator():
+    m = AppDayMatrix(["a"], np.array(["2025-01-01", "2025-01-02"], dtype="datetime64[D]"), {
+        "total_cost": np.array([[10.0, 30.0]]),
+        "installs": np.array([[0.0, 4.0]]),
+    })
+    same(m.ratio("total_cost", "installs", window=1), [[nan, 7.5]])
+    # отношение сумм, а не среднее дневных отношений
+    same(m.ratio("total_cost", "installs", window=2), [[nan, 10.0]])
+
+
+def test_rolling_kpis_wow():
+    days = pd.date_range("2025-01-01", periods=14).date
+    df = pd.DataFrame({"app": "a", "date": days, "installs": [1.0] * 7 + [2.0] * 7, "clicks": 10.0})
+    kpi = rolling_kpis(df, windows=(7,), app_col="app", date_col="date")
+
+    last = kpi.iloc[-1]
+    assert last["installs_7d"] == 14
+    assert last["w2w_pct_7d"] == 100.0
+    assert last["cr_pct_7d"] == 20.0
+    assert "ecpi_7d" not in kpi.columns
+    assert kpi["w2w_pct_7d"].iloc[:13].isna().all()
+    assert math.isnan(kpi["installs_7d"].iloc[5])
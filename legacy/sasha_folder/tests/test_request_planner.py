@@ -0,0 +1,85 @@
+from datetime import date
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from request_planner import Need, fetch_planned, plan_requests  # noqa: E402
+
+
+def d(day: int) -> date:
+    return date(2025, 11, day)
+
+
+def spans(plan):
+    return [(r.app_id, r.report, r.d_from.day, r.d_to.day) for r in plan]
+
+
+def test_adjacent_and_overlapping_ranges_merge():
+    needs = [
+        Need("app", "daily", d(8), d(14)),   # текущая неделя
+        Need("app", "daily", d(1), d(7)),    # предыдущая — встык
+        Need("app", "daily", d(10), d(12)),  # внутри
+    ]
+    plan = plan_requests(needs)
+    assert spans(plan) == [("app", "daily", 1, 14)]
+    assert sorted(plan[0].needs) == sorted(needs)
+
+
+def test_gap_and_other_keys_stay_separate():
+    needs = [
+        Need("app", "daily", d(1), d(3)),
+        Need("app", "daily", d(5), d(6)),    # пропущен 4-й — отдельный запрос
+        Need("app", "geo", d(1), d(3)),
+        Need("other", "daily", d(4), d(4)),
+    ]
+    assert spans(plan_requests(needs)) == [
+        ("app", "daily", 1, 3),
+        ("app", "daily", 5, 6),
+        ("app", "geo", 1, 3),
+        ("other", "daily", 4, 4),
+    ]
+
+
+def test_max_days_limits_merged_length():
+    weeks = [Need("app", "daily", d(1 + 7 * i), d(7 + 7 * i)) for i in range(4)]  # 1..28
+    assert spans(plan_requests(weeks, max_days=14)) == [("app", "daily", 1, 14), ("app", "daily", 15, 28)]
+    assert spans(plan_requests(weeks, max_days=13)) == [("app", "daily", 1 + 7 * i, 7 + 7 * i) for i in range(4)]
+    assert spans(plan_requests(weeks)) == [("app", "daily", 1, 28)]
+
+
+def test_max_days_contained_range_still_merges():
+    needs = [Need("app", "daily", d(1), d(7)), Need("app", "daily", d(2), d(3))]
+    assert spans(plan_requests(needs, max_days=7)) == [("app", "daily", 1, 7)]
+
+
+def test_duplicates_and_empty_range():
+    need = Need("app", "daily", d(1), d(7))
+    plan = plan_requests([need, need])
+    assert len(plan) == 1 and plan[0].needs == [need]
+    with pytest.raises(ValueError):
+        plan_requests([Need("app", "daily", d(7), d(1))])
+
+
+def test_fetch_planned_slices_by_date():
+    calls = []
+
+    def fetch(app_id, report, d_from, d_to):
+        calls.append((d_from, d_to))
+        days = pd.date_range(d_from, d_to).date
+        return pd.DataFrame({"date": days, "installs": range(len(days))})
+
+    prev, curr = Need("app", "daily", d(1), d(7)), Need("app", "daily", d(8), d(14))
+    result = fetch_planned([prev, curr], fetch)
+
+    assert calls == [(d(1), d(14))]
+    assert result[prev]["date"].tolist() == [d(i) for i in range(1, 8)]
+    assert result[curr]["installs"].tolist() == list(range(7, 14))
+
+
+def test_fetch_error_gives_empty_frames():
+    def fetch(*args):
+        raise RuntimeError("boom")
+
+    need = Need("app", "daily", d(1), d(2))
+    assert fetch_planned([need], fetch)[need].empty
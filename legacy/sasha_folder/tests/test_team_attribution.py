@@ -0,0 +1,72 @@
+import importlib.util
+import re
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from team_attribution import TEAM_SEPARATORS, UNATTRIBUTED, team_prefix, team_series  # noqa: E402
+
+CAMPAIGNS = [
+    "alpha_ios_us",
+    "Beta-Android|DE",
+    "gamma:tier1/RU",
+    "delta (v2)",
+    "eps[test]",
+    "  zeta_pad  ",
+    "eta\tnew",
+    "Команда_кампания",
+    "solo",
+    "_leading_separator",
+    "|pipe",
+    "(brackets) x",
+    "a.b.c_d",
+    "x--y",
+]
+
+
+# TEAM_SPLIT отчётов до выноса в team_attribution
+OLD_TEAM_SPLIT = re.compile(r"[\s_\-\|:/\[\]\(\)]+")
+
+
+def reference(campaign):
+    # как считали отчёты до векторизации
+    team = OLD_TEAM_SPLIT.split(campaign.strip())[0]
+    return team or None
+
+
+@pytest.mark.parametrize("campaign", CAMPAIGNS)
+def test_prefix_matches_team_split(campaign):
+    assert team_prefix(campaign) == reference(campaign)
+
+
+def test_series_matches_team_split_and_fills_default():
+    campaigns = pd.Series(CAMPAIGNS + [None, float("nan"), "", "alpha_ios_us"], index=range(100, 118))
+    teams = team_series(campaigns, default=UNATTRIBUTED)
+
+    assert list(teams.index) == list(campaigns.index)
+    expected = [reference(c) or UNATTRIBUTED for c in CAMPAIGNS] + [UNATTRIBUTED] * 3 + ["alpha"]
+    assert teams.tolist() == expected
+
+
+def test_numeric_campaign_column():
+    # campaign id из read_csv приходит числами — без команды, а не AttributeError
+    campaigns = pd.Series([123, 456, None])
+    assert team_series(campaigns, default=UNATTRIBUTED).tolist() == [UNATTRIBUTED] * 3
+    assert team_series(pd.Series([7.0, "alpha_x", 8.5])).tolist() == [None, "alpha", None]
+
+
+@pytest.mark.parametrize("value", [None, "", "   ", 42])
+def test_prefix_without_campaign(value):
+    assert team_prefix(value) is None
+
+
+def test_separators_match_project_integration():
+    # SQL-агрегаты и связка кампаний project_integration строятся из src/teams.py
+    path = Path(__file__).resolve().parents[2] / "project_integration" / "src" / "teams.py"
+    spec = importlib.util.spec_from_file_location("pi_teams", path)
+    teams = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(teams)
+    assert teams.TEAM_SEPARATORS == TEAM_SEPARATORS
+    assert teams.UNATTRIBUTED == UNATTRIBUTED
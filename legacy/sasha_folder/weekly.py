@@ -1,17 +1,23 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import json
 import re
+import sqlite3
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, Tuple, Dict, List
 
 import pandas as pd
 
+from metrics import pct_change, safe_ratio
+from xlsx_stream import Column, StreamingWorkbook
+
 # === Настройки ===
 INPUT_DIRS = [Path("../report"), Path("..")]   # папки с daily_report*.csv
 OUT_XLSX = Path("./summary_readable.xlsx")   # читаемый Excel
 OUT_CSV  = Path("./summary.csv")             # сводный CSV (по желанию)
+CACHE_DB = Path("./summary_cache.sqlite")    # кэш итогов по файлам (путь + размер + mtime)
 
 # === Вспомогательные ===
 def parse_filename(p: Path) -> Tuple[Optional[datetime], Optional[datetime], Optional[str]]:
@@ -55,12 +61,12 @@ def summarize_week(df: pd.DataFrame) -> Dict[str, float]:
     installs = int(df.get("installs", pd.Series(dtype=float)).sum())
     loyal_users = int(df.get("loyal_users", pd.Series(dtype=float)).sum())
     total_cost = float(df.get("total_cost", pd.Series(dtype=float)).sum())
-    ecpi = (total_cost / installs) if installs and total_cost else None
-    loyal_ratio = (100 * loyal_users / installs) if installs else None
+    ecpi = safe_ratio(total_cost, installs) if total_cost else None
+    loyal_ratio = safe_ratio(loyal_users, installs, 100)
     clicks = float(df.get("clicks", pd.Series(dtype=float)).sum())
     impressions = float(df.get("impressions", pd.Series(dtype=float)).sum())
-    ctr_pct = (100 * clicks / impressions) if impressions else None
-    cr_pct = (100 * installs / clicks) if clicks else None
+    ctr_pct = safe_ratio(clicks, impressions, 100)
+    cr_pct = safe_ratio(installs, clicks, 100)
     sessions = int(df.get("sessions", pd.Series(dtype=float)).sum())
     return {
         "installs": installs,
@@ -75,28 +81,67 @@ def summarize_week(df: pd.DataFrame) -> Dict[str, float]:
         "sessions": sessions,
     }
 
-def compute_summary(csv_files: List[Path]) -> pd.DataFrame:
-    rows, index_map = [], {}
+# === Кэш итогов по файлам ===
+def _open_cache(cache_path: Path) -> sqlite3.Connection:
+    con = sqlite3.connect(cache_path)
+    con.execute(
+        """CREATE TABLE IF NOT EXISTS file_stats (
+               path TEXT PRIMARY KEY,
+               size INTEGER NOT NULL,
+               mtime_ns INTEGER NOT NULL,
+               app TEXT NOT NULL,
+               start_date TEXT NOT NULL,
+               end_date TEXT NOT NULL,
+               stats TEXT NOT NULL
+           )"""
+    )
+    return con
+
+def _file_rows(csv_files: List[Path], cache_path: Path) -> List[Dict]:
+    """
+    Итоги summarize_week по каждому файлу. Файл перечитывается, только если он
+    новый или у него поменялись размер/mtime, остальное берётся из SQLite-кэша.
+    """
+    con = _open_cache(cache_path)
+    cached = {
+        path: (size, mtime_ns, stats)
+        for path, size, mtime_ns, stats in con.execute("SELECT path, size, mtime_ns, stats FROM file_stats")
+    }
+    rows, parsed = [], 0
     for p in csv_files:
         d1, d2, app = parse_filename(p)
         if not app:
             continue
-        df = normalize_df(pd.read_csv(p))
-        stats = summarize_week(df)
-        rows.append({
-            "app": app, "start_date": d1, "end_date": d2, **stats, "source_file": p.name
-        })
-        index_map[(app, d2)] = stats["installs"]
+        st = p.stat()
+        key = str(p.resolve())
+        hit = cached.get(key)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            stats = json.loads(hit[2])
+        else:
+            stats = summarize_week(normalize_df(pd.read_csv(p)))
+            con.execute(
+                "INSERT OR REPLACE INTO file_stats VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, st.st_size, st.st_mtime_ns, app, d1.isoformat(), d2.isoformat(), json.dumps(stats)),
+            )
+            parsed += 1
+        rows.append({"app": app, "start_date": d1, "end_date": d2, **stats, "source_file": p.name})
+    con.commit()
+    con.close()
+    print(f"Файлов: {len(rows)}, перечитано: {parsed}, из кэша: {len(rows) - parsed}")
+    return rows
+
+def compute_summary(csv_files: List[Path], cache_path: Path = CACHE_DB) -> pd.DataFrame:
+    rows = _file_rows(csv_files, cache_path)
     summary = pd.DataFrame(rows).sort_values(["app","end_date"]).reset_index(drop=True)
-    prev_vals = []
-    for _, r in summary.iterrows():
-        app, end_d = r["app"], r["end_date"]
-        prev_end = end_d - timedelta(days=7) if pd.notna(end_d) else None
-        prev_inst = index_map.get((app, prev_end))
-        w2w_pct = round(100.0 * (r["installs"] - prev_inst) / prev_inst, 2) if prev_inst else None
-        prev_vals.append((prev_inst, w2w_pct))
-    summary["prev_installs"] = [v[0] for v in prev_vals]
-    summary["w2w_pct"]       = [v[1] for v in prev_vals]
+    # w2w: та же таблица, сдвинутая на неделю вперёд; при повторе (app, end_date) берётся последний файл
+    prev = (
+        pd.DataFrame(rows)[["app", "end_date", "installs"]]
+        .drop_duplicates(["app", "end_date"], keep="last")
+        .rename(columns={"installs": "prev_installs"})
+    )
+    prev["end_date"] = prev["end_date"] + timedelta(days=7)
+    summary = summary.merge(prev, on=["app", "end_date"], how="left")
+    summary["w2w_pct"] = pct_change(summary["installs"], summary["prev_installs"]).round(2)
     # порядок колонок
     summary = summary[
         ["app","start_date","end_date","installs","prev_installs","w2w_pct",
@@ -115,8 +160,8 @@ def main():
         return
     summary = compute_summary(csvs)
     summary.to_csv(OUT_CSV, index=False, encoding="utf-8-sig")
-    with pd.ExcelWriter(OUT_XLSX, engine="openpyxl") as w:
-        summary.to_excel(w, index=False, sheet_name="Summary")
+    with StreamingWorkbook(OUT_XLSX) as wb:
+        wb.sheet("Summary", [Column(c) for c in summary.columns], auto_filter=False).append_frame(summary)
     # Краткий вывод
     for _, r in summary.sort_values(["app","end_date"]).iterrows():
         print(f"{r['app']} {r['start_date']}–{r['end_date']} | installs={r['installs']} | prev={r['prev_installs']} | w2w={r['w2w_pct']}%")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+weekly_db.py
+Зависимости: psycopg2
+
+Недельный отчёт по уже загруженной таблице appsflyer (project_integration),
+без похода в API и без разбора CSV. Один запрос считает по каждому приложению:
+- paid installs за текущую и предыдущую неделю (paid = непустой campaign, как в test1.py);
+- команды текущей недели (префикс campaign до первого разделителя, как TEAM_SPLIT)
+  по убыванию installs.
+test1.py собирает из них те же строки, что и из CSV, т.е. тот же файл "Отчёт"/"Summary".
+
+Используется из test1.py: python test1.py --db postgresql://... [--table appsflyer]
+"""
+
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import psycopg2
+from psycopg2 import sql
+
+from team_attribution import TEAM_SEPARATORS
+
+# органика приходит из CSV пустым campaign или текстом "None" (pandas в test1 читает его как NaN)
+_PAID = "nullif(btrim(a.campaign), '') IS NOT NULL AND btrim(a.campaign) NOT IN ('None', 'none', 'null', 'NULL', 'nan')"
+# разделители команды из team_attribution.py; кампания, начинающаяся с разделителя, команды не даёт
+_TEAM = f"substring(btrim(a.campaign) from '^[^{TEAM_SEPARATORS}]+')"
+
+WEEKLY_SQL = """
+WITH paid AS (
+    SELECT a.app_id,
+           """ + _TEAM + """ AS team,
+           coalesce(a.installs, 0) AS installs,
+           a.date >= %(c_s)s AS is_curr
+    FROM {table} a
+    WHERE a.app_id = ANY(%(app_ids)s)
+      AND a.date >= %(p_s)s AND a.date < %(c_end)s
+      AND """ + _PAID + """
+),
+totals AS (
+    SELECT app_id,
+           sum(installs) FILTER (WHERE is_curr)     AS installs_curr,
+           sum(installs) FILTER (WHERE NOT is_curr) AS installs_prev
+    FROM paid
+    GROUP BY app_id
+),
+teams AS (
+    SELECT app_id, team,
+           row_number() OVER (PARTITION BY app_id ORDER BY sum(installs) DESC, team) AS rn
+    FROM paid
+    WHERE is_curr AND team IS NOT NULL
+    GROUP BY app_id, team
+    HAVING sum(installs) > 0
+)
+SELECT t.app_id,
+       coalesce(t.installs_curr, 0),
+       coalesce(t.installs_prev, 0),
+       coalesce(array_agg(tm.team ORDER BY tm.rn)
+                FILTER (WHERE tm.team IS NOT NULL AND (%(top_n)s::int IS NULL OR tm.rn <= %(top_n)s::int)),
+                '{{}}')
+FROM totals t
+         LEFT JOIN teams tm ON tm.app_id = t.app_id
+GROUP BY t.app_id, t.installs_curr, t.installs_prev
+"""
+
+
+def weekly_installs_from_db(
+    dsn: str,
+    app_ids: List[str],
+    p_s: date, p_e: date, c_s: date, c_e: date,
+    top_n: Optional[int] = None,
+    table: str = "appsflyer",
+) -> Dict[str, Tuple[int, int, List[str]]]:
+    """
+    app_id -> (installs текущей недели, installs предыдущей, команды текущей недели).
+    Приложения без paid-строк в результат не попадают. Недели должны идти встык.
+    """
+    if p_e + timedelta(days=1) != c_s:
+        raise ValueError(f"Недели не встык: {p_s}—{p_e} и {c_s}—{c_e}")
+
+    params = {
+        "app_ids": list(app_ids),
+        "p_s": p_s,
+        "c_s": c_s,
+        "c_end": c_e + timedelta(days=1),  # date — timestamp, берём весь последний день
+        "top_n": top_n,
+    }
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            # имя таблицы из CLI — только как идентификатор; "schema.table" тоже допустимо
+            query = sql.SQL(WEEKLY_SQL).format(table=sql.Identifier(*table.split(".")))
+            cur.execute(query, params)
+            return {
+                app_id: (int(curr), int(prev), list(teams) if curr else [])
+                for app_id, curr, prev, teams in cur.fetchall()
+            }
+    finally:
+        conn.close()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+xlsx_stream.py
+Зависимости: openpyxl (pandas — только для append_frame)
+
+Потоковая запись отчётов в XLSX: openpyxl write_only. Строки уходят во временный
+файл листа сразу при append, память не растёт с числом строк, листов может быть
+сколько угодно. Формат задаётся колонками заранее и применяется при записи строки,
+второго прохода по ws.max_row нет (в write_only его и быть не может).
+
+    with StreamingWorkbook(path) as wb:
+        sh = wb.sheet("Отчёт", [Column("Приложение", 30), Column("w2w", 16, percent=True)])
+        sh.append(["Alpha", 12.5])   # w2w в процентах -> ячейка 0.125 в формате 0.00%
+"""
+
+from pathlib import Path
+from typing import Any, Iterable, List, NamedTuple, Optional, Sequence
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, numbers
+from openpyxl.utils import get_column_letter
+
+
+class Column(NamedTuple):
+    name: str
+    width: Optional[float] = None
+    percent: bool = False          # значение в процентах (12.5) -> доля в формате 0.00%
+    number_format: Optional[str] = None
+
+
+def _clean(v: Any) -> Any:
+    # NaN/NaT из pandas в xlsx не пишем — пустая ячейка
+    if v is None:
+        return None
+    try:
+        if v != v:
+            return None
+    except (TypeError, ValueError):  # pd.NA и прочее без сравнения
+        return None
+    return v
+
+
+class SheetWriter:
+    def __init__(self, ws, columns: Sequence[Column], header: bool = True, auto_filter: bool = True):
+        self.ws = ws
+        self.columns = list(columns)
+        self.rows = 0
+        self._auto_filter = auto_filter and header and bool(self.columns)
+        # ширины в write_only задаются до первой строки
+        for j, col in enumerate(self.columns, start=1):
+            if col.width:
+                ws.column_dimensions[get_column_letter(j)].width = col.width
+        if header and self.columns:
+            cells = []
+            for col in self.columns:
+                c = WriteOnlyCell(ws, value=col.name)
+                c.font = Font(bold=True)
+                c.alignment = Alignment(horizontal="center")
+                cells.append(c)
+            ws.append(cells)
+            self.rows += 1
+
+    def _cell(self, v: Any, col: Optional[Column], percent: bool) -> Any:
+        v = _clean(v)
+        if v is None or v == "":
+            return None
+        if percent:
+            try:
+                v = float(v) / 100.0
+            except (TypeError, ValueError):
+                return v
+            c = WriteOnlyCell(self.ws, value=v)
+            c.number_format = numbers.FORMAT_PERCENTAGE_00
+            return c
+        if col is not None and col.number_format:
+            c = WriteOnlyCell(self.ws, value=v)
+            c.number_format = col.number_format
+            return c
+        return v
+
+    def append(self, values: Sequence[Any], percent: Iterable[int] = ()) -> None:
+        """Одна строка. percent — номера ячеек (с 0), которые в процентах, сверх заданных колонками."""
+        extra = set(percent)
+        row = []
+        for i, v in enumerate(values):
+            col = self.columns[i] if i < len(self.columns) else None
+            row.append(self._cell(v, col, i in extra or (col is not None and col.percent)))
+        self.ws.append(row)
+        self.rows += 1
+
+    def append_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        for values in rows:
+            self.append(values)
+
+    def append_frame(self, df, columns: Optional[List[str]] = None) -> None:
+        """Строки DataFrame по порядку колонок (по умолчанию — имена Column)."""
+        names = columns or [c.name for c in self.columns]
+        self.append_rows(df[names].itertuples(index=False, name=None))
+
+    def close(self) -> None:
+        if self._auto_filter and self.rows > 1:
+            self.ws.auto_filter.ref = f"A1:{get_column_letter(len(self.columns))}{self.rows}"
+
+
+class StreamingWorkbook:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.wb = Workbook(write_only=True)
+        self._sheets: List[SheetWriter] = []
+
+    def sheet(self, title: str, columns: Sequence[Column] = (), header: bool = True,
+              auto_filter: bool = True) -> SheetWriter:
+        sh = SheetWriter(self.wb.create_sheet(title), columns, header=header, auto_filter=auto_filter)
+        self._sheets.append(sh)
+        return sh
+
+    def save(self) -> None:
+        for sh in self._sheets:
+            sh.close()
+        self.wb.save(self.path)
+
+    def __enter__(self) -> "StreamingWorkbook":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.save()
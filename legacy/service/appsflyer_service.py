@@ -1,6 +1,9 @@
 from __future__ import annotations
 
 import os
+import re
+import shutil
+import urllib.parse
 
 import requests
 import csv
@@ -10,7 +13,8 @@ import time
 import logging
 from dataclasses import dataclass
 from enum import Enum
-from typing import Optional, Dict, Any, List
+from datetime import date
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 
 from sqlalchemy.testing import rowset
 
@@ -40,6 +44,207 @@ class AppsFlyerError(RuntimeError):
         self.url = url
 
 
+# ===== Parquet =====
+
+# метрики агрегированных отчётов (daily/partners/geo) — и исходные имена, и после
+# columns_mapping: сравниваются в виде "loyal_users_installs", "average_ecpi"
+_METRIC_COLUMNS = frozenset({
+    "impressions", "clicks", "ctr", "installs", "conversion_rate", "sessions",
+    "loyal_users", "loyal_users_installs", "total_revenue", "total_cost",
+    "roi", "arpu", "average_ecpi",
+})
+
+
+# общая схема датасета (все колонки всех приложений) — рядом с партициями
+COMMON_METADATA = "_common_metadata"
+
+
+def _column_key(name: str) -> str:
+    return re.sub(r"[^0-9a-z]+", "_", name.lower()).strip("_")
+
+
+def read_parquet_report(root: str, columns: Optional[List[str]] = None):
+    """
+    Parquet-датасет выгрузки как один DataFrame. Схема берётся из _common_metadata:
+    без неё pyarrow берёт схему первого файла и теряет колонки, появившиеся
+    только у следующих приложений.
+    """
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    schema = pq.read_schema(os.path.join(root, COMMON_METADATA))
+    return pd.read_parquet(root, schema=schema, columns=columns)
+
+
+class _ParquetPartitionWriter:
+    """
+    Пишет строки отчёта в Parquet-датасет, партиционированный по app_id и дате.
+
+    Схема задаётся заранее, а не по данным: известные метрики AppsFlyer -> float64,
+    колонка даты -> date32, остальные (и неизвестные, и пустые) -> строка со словарным
+    кодированием. Тип колонки фиксируется при первой встрече и дальше не меняется.
+    Каждый файл пишется со всеми уже известными колонками, а общая схема после
+    каждого приложения сохраняется в <root>/_common_metadata (и подхватывается
+    следующим запуском). Колонку, которая впервые появилась у более позднего
+    приложения, в ранних файлах взять неоткуда, поэтому читать датасет нужно
+    с общей схемой — read_parquet_report(root, columns=["date", "installs"]).
+    Значение метрики, которое не разбирается как число, пишется null с предупреждением в лог.
+
+    replace_days=(с, по): перед записью приложения удаляются его партиции day= за этот
+    период — повторная выгрузка не оставляет дни, которых в новом ответе нет.
+    Партиции вне периода (прошлые выгрузки) сохраняются.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        *,
+        compression: str = "zstd",
+        date_column: Optional[str] = None,
+        replace_days: Optional[Tuple[date, date]] = None,
+    ):
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("output_format='parquet' requires pyarrow") from e
+        self.root = root
+        self.compression = compression
+        self.date_column = date_column
+        self.replace_days = replace_days
+        self.types: Dict[str, str] = {}  # колонка -> "float" | "date" | "string"
+        self._load_schema()
+
+    def _load_schema(self) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.root, COMMON_METADATA)
+        if not os.path.exists(path):
+            return
+        # типы прошлых запусков не меняем — иначе части датасета разойдутся
+        for field in pq.read_schema(path):
+            if field.name in ("app_id", "day"):
+                continue
+            if pa.types.is_floating(field.type):
+                self.types[field.name] = "float"
+            elif pa.types.is_date(field.type):
+                self.types[field.name] = "date"
+            else:
+                self.types[field.name] = "string"
+
+    def _drop_days(self, app_id: str) -> None:
+        if self.replace_days is None:
+            return
+        # имя каталога — как у write_to_dataset (значение партиции URI-кодируется)
+        app_dir = os.path.join(self.root, "app_id=" + urllib.parse.quote(app_id, safe=""))
+        if not os.path.isdir(app_dir):
+            return
+        d_from, d_to = self.replace_days
+        for entry in os.scandir(app_dir):
+            if not entry.name.startswith("day="):
+                continue
+            try:
+                day = date.fromisoformat(entry.name[len("day="):])
+            except ValueError:
+                continue
+            if d_from <= day <= d_to:
+                shutil.rmtree(entry.path)
+
+    @staticmethod
+    def _float(v: Any) -> Optional[float]:
+        if v is None:
+            return None
+        try:
+            return float(str(v).replace(",", "").rstrip("%"))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _date(v: Any) -> Optional[date]:
+        if v is None:
+            return None
+        try:
+            return date.fromisoformat(str(v)[:10])
+        except ValueError:
+            return None
+
+    def _kind(self, name: str) -> str:
+        if name == self.date_column:
+            return "date"
+        if _column_key(name) in _METRIC_COLUMNS:
+            return "float"
+        return "string"
+
+    def _floats(self, app_id: str, name: str, values: List[Any]) -> List[Optional[float]]:
+        out = [self._float(v) for v in values]
+        bad = [v for v, f in zip(values, out) if v is not None and f is None]
+        if bad:
+            log.warning("Parquet: %s: %d non-numeric values in %s written as null (e.g. %r)",
+                        app_id, len(bad), name, bad[0])
+        return out
+
+    def write_app(self, app_id: str, rows: List[Dict[str, Any]]) -> int:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not rows:
+            return 0
+        # колонки прошлых приложений, которых тут нет, пишем пустыми — схема частей одна
+        columns: Dict[str, List[Any]] = {k: [] for k in self.types}
+        for i, r in enumerate(rows):
+            for k in r:
+                if k not in columns:
+                    columns[k] = [None] * i
+            for k, col in columns.items():
+                col.append(r.get(k))
+        if "app_id" in columns:
+            raise ValueError("Rows already have app_id column")
+
+        if self.date_column is None:
+            self.date_column = next((c for c in ("date", "Date") if c in columns), None)
+        if self.date_column is None:
+            raise ValueError("No date column to partition by, pass date_column")
+
+        string = pa.dictionary(pa.int32(), pa.string())
+        arrays, fields = [], []
+        for name, values in columns.items():
+            kind = self.types.setdefault(name, self._kind(name))
+            if kind == "float":
+                arrays.append(pa.array(self._floats(app_id, name, values), type=pa.float64()))
+                fields.append(pa.field(name, pa.float64()))
+            elif kind == "date":
+                arrays.append(pa.array([self._date(v) for v in values], type=pa.date32()))
+                fields.append(pa.field(name, pa.date32()))
+            else:
+                strings = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+                arrays.append(strings.dictionary_encode())
+                fields.append(pa.field(name, string))
+
+        # партиции: app_id и день (строкой, как в пути)
+        days = [self._date(v) for v in columns[self.date_column]]
+        arrays += [
+            pa.array([app_id] * len(rows), type=pa.string()),
+            pa.array([d.isoformat() if d else None for d in days], type=pa.string()),
+        ]
+        fields += [pa.field("app_id", pa.string()), pa.field("day", pa.string())]
+
+        table = pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+        self._drop_days(app_id)
+        pq.write_to_dataset(
+            table,
+            root_path=self.root,
+            partition_cols=["app_id", "day"],
+            basename_template=f"{app_id}-{{i}}.parquet",  # повторная выгрузка перезаписывает свои файлы
+            existing_data_behavior="overwrite_or_ignore",
+            compression=self.compression,
+            use_dictionary=True,
+        )
+        # колонки этого файла — все известные на сейчас, т.е. общая схема датасета
+        pq.write_metadata(table.schema, os.path.join(self.root, COMMON_METADATA))
+        return len(rows)
+
+
 # ===== Клиент =====
 
 class AppsFlyerClient:
@@ -168,14 +373,21 @@ class AppsFlyerClient:
         retargeting: bool | str = False,
         extra_params: Optional[Dict[str, Any]] = None,
         columns_mapping: Optional[Dict[str, Optional[str]]] = None,
-
-
+        output_format: str = "csv",
+        compression: str = "zstd",
+        date_column: Optional[str] = None,
     ) -> None:
-        row = []
-        """Скачивает отчёт и сохраняет в файл (целиком)."""
-        rows = self.fetch_agg_report_rows(
-            apps=apps,
-            report=report,
+        """
+        Скачивает отчёт и сохраняет в файл (целиком).
+
+        output_format="parquet": file_path — корень датасета, строки пишутся по мере
+        выгрузки каждого приложения в app_id=<id>/day=<YYYY-MM-DD>/*.parquet
+        (типизированные колонки, словарное кодирование строк, сжатие compression).
+        Партиции приложения за [date_from, date_to] перезаписываются целиком.
+        Читать — read_parquet_report(file_path): общая схема в _common_metadata.
+        date_column — колонка даты для партиций, по умолчанию "date" или "Date".
+        """
+        fetch_kwargs = dict(
             date_from=date_from,
             date_to=date_to,
             timezone=timezone,
@@ -183,6 +395,21 @@ class AppsFlyerClient:
             extra_params=extra_params,
             columns_mapping=columns_mapping,
         )
+        if output_format == "parquet":
+            writer = _ParquetPartitionWriter(
+                str(file_path),
+                compression=compression,
+                date_column=date_column,
+                replace_days=(date.fromisoformat(date_from[:10]), date.fromisoformat(date_to[:10])),
+            )
+            for app_id, app_rows in self.iter_agg_report_rows(apps, report, **fetch_kwargs):
+                n = writer.write_app(app_id, app_rows)
+                log.info("Parquet: %s rows for %s -> %s", n, app_id, file_path)
+            return
+        if output_format != "csv":
+            raise ValueError(f"Unsupported output_format: {output_format}")
+
+        rows = self.fetch_agg_report_rows(apps, report, **fetch_kwargs)
         if not rows:
             return
 
@@ -192,7 +419,7 @@ class AppsFlyerClient:
             writer.writeheader()
             writer.writerows(rows)
 
-    def fetch_agg_report_rows(
+    def iter_agg_report_rows(
         self,
         apps,  # list[AppInfo] или list[dict] с ключами id/name/platform
         report: ReportType | str,
@@ -207,8 +434,8 @@ class AppsFlyerClient:
         encoding: str = "utf-8",
         null_tokens: Optional[List[str]] = None,
         empty_as_null: bool = True,
-    ) -> List[Dict[str, Any]]:
-        """Собирает единый датасет по списку приложений и возвращает список словарей."""
+    ) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """То же, что fetch_agg_report_rows, но отдаёт строки по мере выгрузки: (app_id, строки приложения)."""
 
         if not date_from or not date_to:
             raise ValueError("date_from/date_to are required")
@@ -230,7 +457,6 @@ class AppsFlyerClient:
 
         report_type = report.value if isinstance(report, ReportType) else str(report)
 
-        all_rows: list[Dict[str, Any]] = []
         drop_set = {"id", "name"} if drop_default else set()
         tokens = {t.lower() for t in (null_tokens or ["nan", "na", "n/a", "null", "none", "-", "—"])}
 
@@ -277,6 +503,8 @@ class AppsFlyerClient:
                 # пустой отчёт для этого приложения
                 continue
 
+            app_rows: list[Dict[str, Any]] = []
+
             for raw_row in reader:
                 # маппинг/дроп колонок
                 out: Dict[str, Any] = {}
@@ -298,6 +526,18 @@ class AppsFlyerClient:
                 out["app_name"] = app_name
                 out["device"] = app_platform
 
-                all_rows.append(out)
+                app_rows.append(out)
+
+            yield app_id, app_rows
 
-        return all_rows
\ No newline at end of file
+    def fetch_agg_report_rows(
+        self,
+        apps,  # list[AppInfo] или list[dict] с ключами id/name/platform
+        report: ReportType | str,
+        **kwargs: Any,
+    ) -> List[Dict[str, Any]]:
+        """Собирает единый датасет по списку приложений и возвращает список словарей."""
+        all_rows: list[Dict[str, Any]] = []
+        for _, app_rows in self.iter_agg_report_rows(apps, report, **kwargs):
+            all_rows.extend(app_rows)
+        return all_rows